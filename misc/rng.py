@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Per-instance random number generators.
+
+Models take an `rnd_seed` argument and keep their own generator
+(`self.rng`) instead of seeding and drawing from numpy's global RNG, so
+models in one process don't interfere.  `rnd_seed` may be:
+
+  + None - fresh entropy from the OS
+  + an int (or list of ints) - a reproducible RandomState; an int gives
+    the same stream as numpy.random.seed(int) did
+  + a numpy RandomState or Generator - used as is (shared, not copied)
+  + a numpy SeedSequence (numpy >= 1.17) - a new Generator
+
+For parallel work, spawn_seeds(seed, N) gives N independent, picklable
+seeds (one per worker or chunk); the same seed always gives the same
+children, so results don't depend on how work is scheduled:
+
+    >>> seeds = spawn_seeds(12345, 4)
+    >>> pool.map(run_chunk, [(s, ...) for s in seeds])  # get_rng(s) inside
+
+Models only use methods shared by RandomState and Generator (choice,
+shuffle, permutation, uniform, binomial, standard_normal,
+standard_exponential).
+"""
+
+import os
+import numpy as np
+
+try:
+    from numpy.random import Generator, SeedSequence, default_rng
+except ImportError:  # numpy < 1.17
+    Generator = SeedSequence = default_rng = None
+
+ENTROPY_WORDS = 4  # 32-bit words of entropy drawn for an unseeded stream
+
+
+def get_rng(seed=None):
+    """ Return a random generator for `seed` (see module docstring) """
+    if isinstance(seed, np.random.RandomState):
+        return seed
+    if Generator is not None and isinstance(seed, Generator):
+        return seed
+    if SeedSequence is not None and isinstance(seed, SeedSequence):
+        return default_rng(seed)
+    return np.random.RandomState(seed)
+
+
+def _entropy(seed):
+    """ Root entropy (list of 32-bit ints) for spawning child streams """
+    if seed is None:
+        return [int(x) for x in np.frombuffer(os.urandom(4 * ENTROPY_WORDS),
+                                              dtype=np.uint32)]
+    if isinstance(seed, (np.random.RandomState,) +
+                  ((Generator,) if Generator is not None else ())):
+        words = seed.uniform(0, 2 ** 32, ENTROPY_WORDS).astype(np.uint32)
+        return [int(x) for x in words]
+    if isinstance(seed, (int, long, np.integer)):
+        return [int(seed)]
+    return [int(x) for x in seed]
+
+
+def _words(x):
+    """ Non-negative int as 32-bit words, least significant first (a
+        RandomState seed list only takes 32-bit values)
+    """
+    if x < 0:
+        raise ValueError('Seeds must be non-negative: %d' % x)
+    words = [x & 0xffffffff]
+    x >>= 32
+    while x:
+        words.append(x & 0xffffffff)
+        x >>= 32
+    return words
+
+
+def spawn_seeds(seed, n):
+    """ N independent child seeds derived from `seed`, suitable for
+        get_rng() in worker processes.  With SeedSequence available
+        these are spawned SeedSequences; otherwise they are RandomState
+        seeds [entropy..., child index].  Child i doesn't depend on n.
+    """
+    if SeedSequence is not None:
+        if isinstance(seed, SeedSequence):
+            # spawn() is stateful; spawn from a fresh copy so repeated
+            # calls give the same children
+            seed = SeedSequence(seed.entropy, spawn_key=seed.spawn_key,
+                                pool_size=seed.pool_size)
+        else:
+            seed = SeedSequence(_entropy(seed))
+        return seed.spawn(n)
+    root = [w for x in _entropy(seed) for w in _words(x)]
+    return [root + [i] for i in xrange(n)]
+
+
+def spawn_rngs(seed, n):
+    """ N independent generators derived from `seed` """
+    return [get_rng(s) for s in spawn_seeds(seed, n)]
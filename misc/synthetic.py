@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Synthetic (but realistically shaped) input files for testing and
+benchmarking the parsers without the private data.
+
+  + institution vertex lists - ranked institutions with pi scores
+  + faculty record files - people with education and faculty histories;
+    PhDs come mostly from highly ranked places and people mostly move
+    down the ranking for their first job, as in the real data
+  + Scholar publication directories - a faculty list plus one <n>.txt
+    file of publications per person
+
+    >>> from university_network.misc.synthetic import write_dataset
+    >>> paths = write_dataset('/tmp/synthetic', num_people=10000)
+    >>> paths['faculty'], paths['institutions'], paths['fac_list'], \\
+    ...     paths['pub_dir']
+
+Files are written incrementally, so 10^6 people need very little memory.
+All output is determined by `seed`.
+"""
+
+import os
+import numpy as np
+
+FIRST_NAMES = ['Aaron', 'Ann', 'Bob', 'Carla', 'Daniel', 'Elena', 'Feng',
+               'Grace', 'Hiro', 'Ines', 'Jamal', 'Kim', 'Lars', 'Maria',
+               'Nikhil', 'Olga', 'Pedro', 'Qing', 'Rosa', 'Sam', 'Tara',
+               'Umar', 'Vera', 'Wei', 'Xavier', 'Yuki', 'Zoe']
+LAST_NAMES = ['Adams', 'Brown', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia',
+              'Huang', 'Ivanov', 'Jones', 'Kumar', 'Lee', 'Miller', 'Nguyen',
+              'Okafor', 'Patel', 'Quinn', 'Rossi', 'Smith', 'Tanaka', 'Ueda',
+              'Virtanen', 'Wang', 'Xu', 'Yilmaz', 'Zhang']
+DEPARTMENTS = ['Computer Science', 'History', 'Business']
+FIELDS = ['Computer Science', 'Mathematics', 'Physics',
+          'Electrical Engineering', 'History', 'Economics']
+REGIONS = ['Northeast', 'Midwest', 'South', 'West']
+RANKS = ['Assistant Professor', 'Associate Professor', 'Full Professor']
+VENUES = ['NATURE', 'SCIENCE', 'ACM Transactions on Computing',
+          'Physical Review E', 'Journal of Machine Learning Research']
+PEOPLE_PER_INSTITUTION = 25
+
+
+def institution_names(num_institutions):
+    """ Names of the synthetic institutions, best ranked first """
+    return ['University %d' % (i + 1) for i in xrange(num_institutions)]
+
+
+def default_num_institutions(num_people):
+    return int(min(max(num_people // PEOPLE_PER_INSTITUTION, 10), 5000))
+
+
+def write_institutions(fp, num_institutions, seed=0):
+    """ Write an institution vertex list (the format read by
+        parse_institution_records) for `num_institutions` institutions.
+    """
+    rng = np.random.RandomState(seed)
+    # pi: roughly evenly spaced, noisy prestige scores (lower is better)
+    pi = np.cumsum(rng.uniform(0.5, 1.5, num_institutions)) + 1.
+    usn = np.minimum(np.arange(num_institutions) +
+                     rng.randint(-3, 4, num_institutions), 500).clip(1)
+    nrc = np.arange(num_institutions) + rng.randint(0, 5, num_institutions) + 1
+    regions = rng.randint(0, len(REGIONS), num_institutions)
+    fp.write('# u\tpi\tUSN2010\tNRC95\tRegion\tinstitution\n')
+    for i, name in enumerate(institution_names(num_institutions)):
+        fp.write('%d\t%.2f\t%d\t%d\t%s\t%s\n' % (i + 1, pi[i], usn[i], nrc[i],
+                                                 REGIONS[regions[i]], name))
+
+
+def _years(start, end):
+    return '%s-%s' % (start if start else '????', end if end else '????')
+
+
+def _person_lines(i, rng, names):
+    """ Lines of one synthetic faculty record """
+    m = len(names)
+    first = FIRST_NAMES[rng.randint(len(FIRST_NAMES))]
+    # The person index keeps names unique (records are keyed by name)
+    last = '%s%d' % (LAST_NAMES[rng.randint(len(LAST_NAMES))], i + 1)
+    sex = 'F' if rng.uniform() < 0.2 else 'M'
+
+    # Prestige: PhDs concentrate at the top; jobs are mostly lower
+    phd = min(int(rng.pareto(1.2) * m / 20.), m - 1)
+    if rng.uniform() < 0.1:
+        job = rng.randint(0, phd + 1)
+    else:
+        job = min(phd + int(rng.exponential(m / 5.)), m - 1)
+    field = FIELDS[rng.randint(len(FIELDS))]
+    phd_year = rng.randint(1960, 2008)
+
+    lines = ['>>> record %d' % (i + 1),
+             '# facultyName : %s %s' % (first, last),
+             '# email       : %s.%s@u%d.edu' % (first.lower(), last.lower(),
+                                                job + 1),
+             '# sex         : %s' % sex,
+             '# department  : %s' % DEPARTMENTS[i % len(DEPARTMENTS)]]
+    education = []
+    if rng.uniform() < 0.8:
+        bs = rng.randint(0, m)
+        education.append(('BS', bs, phd_year - 6 - rng.randint(0, 3)))
+    if rng.uniform() < 0.3:
+        education.append(('MS', rng.randint(0, m), phd_year - 3))
+    education.append(('PhD', phd, phd_year))
+
+    faculty = []
+    year = phd_year
+    if rng.uniform() < 0.4:
+        postdoc = rng.randint(0, m)
+        faculty.append(('PostDoc', postdoc, year, year + 2))
+        year += 2
+    hired = year
+    num_ranks = 1 + min(int((2011 - year) / 6), rng.randint(0, 3))
+    for k in xrange(num_ranks):
+        end = year + rng.randint(4, 8) if k < num_ranks - 1 else 2011
+        faculty.append((RANKS[k], job, year, min(end, 2011)))
+        year = end
+    current = faculty[-1][0]
+    if rng.uniform() < 0.05 and current == 'Full Professor':
+        faculty.append(('Emeritus', job, 2008, 2011))
+        current = 'Emeritus'
+
+    lines += ['# place       : %s' % names[job],
+              '# current     : %s' % current]
+    for degree, place, end in education:
+        unknown_start = rng.uniform() < 0.5
+        lines += ['# [Education]',
+                  '# degree      : %s' % degree,
+                  '# place       : %s' % names[place],
+                  '# field       : %s' % field,
+                  '# years       : %s' % _years(None if unknown_start else
+                                                end - 5, end)]
+    for rank, place, start, end in faculty:
+        lines += ['# [Faculty]',
+                  '# rank        : %s' % rank,
+                  '# place       : %s' % names[place],
+                  '# years       : %s' % _years(start, end)]
+    lines.append('# recordDate  : %d/%d/2011' % (rng.randint(1, 13),
+                                                  rng.randint(1, 29)))
+    return '%s %s' % (first, last), names[job], hired, lines
+
+
+def write_faculty_records(fp, num_people, num_institutions=None, seed=0,
+                          fac_list=None):
+    """ Write `num_people` faculty records to fp (the format read by
+        parse_faculty_records).  If `fac_list` is an open file, the
+        matching Scholar faculty list (<name>|<place>|<year>) is written
+        to it as well.
+    """
+    if num_institutions is None:
+        num_institutions = default_num_institutions(num_people)
+    names = institution_names(num_institutions)
+    rng = np.random.RandomState(seed)
+    for i in xrange(num_people):
+        name, place, year, lines = _person_lines(i, rng, names)
+        fp.write('\n'.join(lines))
+        fp.write('\n\n')
+        if fac_list is not None:
+            fac_list.write('%s|%s|%d\n' % (name, place, year))
+
+
+def write_pub_file(fp, num_pubs, rng):
+    """ Write `num_pubs` Scholar records (the format read by
+        parse_pub_file).
+    """
+    for k in xrange(num_pubs):
+        cluster = int(rng.randint(1, 1 << 62)) * 3  # may exceed 2**63
+        citations = int(rng.pareto(1.5) * 5)
+        fp.write('          Title Synthetic paper %d on topic %d\n'
+                 '            URL http://example.org/paper?id=%d\n'
+                 '           Year %d\n'
+                 '      Citations %d\n'
+                 '       Versions %d\n'
+                 '     Cluster ID %d\n'
+                 ' Citations list http://scholar.google.com/scholar?cites=%d\n'
+                 '  Versions list http://scholar.google.com/scholar?cluster=%d\n'
+                 '    Author line A Author,B Author- %s, %d\n\n' %
+                 (k, rng.randint(1000), cluster, rng.randint(1970, 2012),
+                  citations, 1 + rng.randint(20), cluster, cluster, cluster,
+                  VENUES[rng.randint(len(VENUES))], rng.randint(1970, 2012)))
+
+
+def write_pub_dir(pub_dir, fac_list_file, pubs_per_person=20, seed=0):
+    """ Write one publication file per line of `fac_list_file` into
+        pub_dir (<n>.txt for the n-th line).  The number of publications
+        per person is geometric with mean `pubs_per_person`.
+    """
+    rng = np.random.RandomState(seed)
+    if not os.path.isdir(pub_dir):
+        os.makedirs(pub_dir)
+    n = 0
+    for line in open(fac_list_file, 'rU'):
+        if not line.strip():
+            continue
+        num_pubs = rng.geometric(1. / (pubs_per_person + 1)) - 1
+        with open(os.path.join(pub_dir, '%d.txt' % n), 'w') as fp:
+            write_pub_file(fp, num_pubs, rng)
+        n += 1
+    return n
+
+
+def write_dataset(directory, num_people, num_institutions=None,
+                  pubs_per_person=20, pub_people=None, seed=0):
+    """ Write a complete synthetic dataset into `directory`.
+
+        Inputs:
+          + num_people - number of faculty records
+          + num_institutions - defaults to one per 25 people (10 - 5000)
+          + pubs_per_person - mean number of publications per person
+          + pub_people - write publication files only for the first
+                         this many people (default: everybody)
+          + seed - random seed
+
+        Returns:
+          + dict with the paths of the 'faculty', 'institutions',
+            'fac_list' and 'pub_dir' files.
+    """
+    if num_institutions is None:
+        num_institutions = default_num_institutions(num_people)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    paths = {'faculty': os.path.join(directory, 'faculty.txt'),
+             'institutions': os.path.join(directory, 'institutions.txt'),
+             'fac_list': os.path.join(directory, 'faclist.txt'),
+             'pub_dir': os.path.join(directory, 'pubs')}
+
+    with open(paths['institutions'], 'w') as fp:
+        write_institutions(fp, num_institutions, seed)
+    with open(paths['faculty'], 'w') as fp:
+        with open(paths['fac_list'], 'w') as fac_list:
+            write_faculty_records(fp, num_people, num_institutions, seed,
+                                  fac_list)
+    if pub_people is not None and pub_people < num_people:
+        # Keep the faculty list consistent with the files written
+        with open(paths['fac_list'], 'rU') as fp:
+            lines = [fp.readline() for _ in xrange(pub_people)]
+        with open(paths['fac_list'], 'w') as fp:
+            fp.writelines(lines)
+    write_pub_dir(paths['pub_dir'], paths['fac_list'], pubs_per_person, seed)
+    return paths
@@ -8,9 +8,12 @@ __email__ = "samfway@gmail.com"
 __status__ = "Development"
 
 
-from numpy import zeros, ones
-from numpy.random import shuffle, seed
-from scipy.sparse import csc_matrix
+from numpy import ones, zeros, arange, broadcast_to, concatenate, int64, \
+    outer, sqrt, asarray, errstate
+from scipy.sparse import csr_matrix
+from university_network.models.stubs import build_stubs
+from university_network.misc.rng import get_rng
+from university_network.models.edges import adjacency, as_edges
 
 
 class ConfigurationModel:
@@ -26,15 +29,26 @@ class ConfigurationModel:
         countd appropriately by csc_matrix, so the resulting adjacency matrix will
         be weighted.  Convert to binary as needed.   
 
+        The output format is chosen with `output`: 'csc' (default), 'csr',
+        'coo' (duplicates not summed) or 'edges' for the raw (rows, cols)
+        arrays; see models.edges.adjacency().
+
         FUNCTIONS 
         - generate_adjacency_matrix() : Returns a (sparse) adjacency matrix.
 
+        - generate_ensemble(k) : Returns k networks at once, drawn in batches.
+
+        - expected_adjacency(), variance(), zscores(observed) : Exact mean,
+                        variance and z-scores of the generated networks,
+                        without sampling.
+
         - yield_edges() : Calls generate_adjacency_matrix(), then iterates over the
                         edges, returning 
     """
 
 
-    def __init__(self, in_degree_seq, out_degree_seq, n=None, rnd_seed=None): 
+    def __init__(self, in_degree_seq, out_degree_seq, n=None, rnd_seed=None,
+                 output='csc'): 
         """ Prepare model for generating networks """ 
         if len(in_degree_seq) != len(out_degree_seq):
             raise ValueError("In-degree and out-degree sequences must "
@@ -44,25 +58,16 @@ class ConfigurationModel:
         else:
             self.n = n
 
-        seed(rnd_seed)
+        self.rng = get_rng(rnd_seed)
+        self.output = output
         self.in_degrees = in_degree_seq
         self.out_degrees = out_degree_seq
 
-        # Prep in-stubs
-        p = 0
-        self.total_in = sum(in_degree_seq)
-        self.in_stubs = zeros(self.total_in)
-        for i, d in enumerate(in_degree_seq):
-            self.in_stubs[p:p+d] = i
-            p += d
-
-        # Prep out-stubs
-        p = 0
-        self.total_out = sum(out_degree_seq)
-        self.out_stubs = zeros(self.total_out)
-        for i, d in enumerate(out_degree_seq):
-            self.out_stubs[p:p+d] = i
-            p +=d 
+        # Prep stubs (copied, since they are shuffled in place)
+        self.in_stubs = build_stubs(in_degree_seq, self.n).copy()
+        self.out_stubs = build_stubs(out_degree_seq, self.n).copy()
+        self.total_in = len(self.in_stubs)
+        self.total_out = len(self.out_stubs)
 
         self.total_edges = min(self.total_in, self.total_out)
 
@@ -71,15 +76,143 @@ class ConfigurationModel:
         """ Generate an adjacency matrix from the 
             expanded degree sequence arrays (in_stubs & out_stubs).
         """ 
-        shuffle(self.in_stubs)
-        shuffle(self.out_stubs)
-        A = csc_matrix((ones(self.total_edges),
-                       (self.in_stubs[:self.total_edges],
-                        self.out_stubs[:self.total_edges])),
-                        shape=(self.n, self.n))
-        return A
+        self.rng.shuffle(self.in_stubs)
+        self.rng.shuffle(self.out_stubs)
+        return adjacency(self.in_stubs[:self.total_edges],
+                         self.out_stubs[:self.total_edges],
+                         self.n, self.output)
         
     
+    def _ensemble_batches(self, k, batch_size):
+        """ Generator of (batch_start, rows, cols) for k networks, where
+            rows and cols are (batch x total_edges) arrays of edges.
+
+            Every stub of the shorter stub list is used in every network,
+            so only the longer list is permuted: each row of a batch is
+            the argsort of fresh uniform keys.
+        """
+        swap = self.total_in < self.total_out
+        longer = self.out_stubs if swap else self.in_stubs
+        shorter = self.in_stubs if swap else self.out_stubs
+        E = self.total_edges
+        if batch_size is None:
+            batch_size = max(1, (1 << 22) // max(len(longer), 1))
+
+        for start in xrange(0, k, batch_size):
+            b = min(batch_size, k - start)
+            keys = self.rng.uniform(size=(b, len(longer)))
+            chosen = longer[keys.argsort(axis=1)[:, :E]]
+            fixed = broadcast_to(shorter[:E], (b, E))
+            if swap:
+                yield start, fixed, chosen
+            else:
+                yield start, chosen, fixed
+
+
+    def generate_ensemble(self, k, batch_size=None, as_iterator=False):
+        """ Generate k networks with as few numpy calls as possible.
+
+            Inputs:
+              + k - number of networks
+              + batch_size - networks drawn per batched permutation
+                             (default: about 4M stubs per batch)
+              + as_iterator - see below
+
+            Returns:
+              + (default) a k x n*n csr_matrix; row s is network s, with
+                edge (r, c) in column r*n + c (i.e. the adjacency matrix
+                flattened row by row).
+              + with as_iterator=True, a generator of (rows, cols) COO
+                arrays, one pair per network.
+
+            Rows and columns follow generate_adjacency_matrix().  Multi-
+            edges appear as repeated entries: they are summed by any
+            arithmetic, by toarray() and by coo/csr conversion (or call
+            sum_duplicates() on the stacked matrix).
+        """
+        if as_iterator:
+            return self._iter_ensemble(k, batch_size)
+        n = int64(self.n)
+        E = self.total_edges
+        keys = []
+        for start, rows, cols in self._ensemble_batches(k, batch_size):
+            keys.append((rows.astype(int64) * n + cols).ravel())
+        keys = concatenate(keys) if keys else zeros(0, dtype=int64)
+        return csr_matrix((ones(len(keys)), keys, arange(k + 1) * E),
+                          shape=(k, n * n))
+
+
+    def _iter_ensemble(self, k, batch_size):
+        for start, rows, cols in self._ensemble_batches(k, batch_size):
+            for i in xrange(len(rows)):
+                yield rows[i], cols[i]
+
+
+    def _degree_vectors(self):
+        """ In- and out-degrees as float arrays of length n """
+        a, b = zeros(self.n), zeros(self.n)
+        a[:len(self.in_degrees)] = asarray(self.in_degrees, dtype=float)
+        b[:len(self.out_degrees)] = asarray(self.out_degrees, dtype=float)
+        return a, b
+
+
+    def expected_adjacency(self, factored=False):
+        """ Exact E[A] over generate_adjacency_matrix(): with a, b the
+            in- and out-degrees and E = total_edges,
+
+                E[A_rc] = E * a_r * b_c / (total_in * total_out)
+
+            (k_out * k_in / m when both sequences have m stubs).  This is
+            what averaging an ensemble converges to.
+
+            With factored=True returns (u, v) with E[A] = outer(u, v),
+            so a row, column or entry costs O(1) each.
+        """
+        a, b = self._degree_vectors()
+        scale = float(self.total_edges) / max(self.total_in * self.total_out, 1)
+        u = a * scale
+        if factored:
+            return u, b
+        return outer(u, b)
+
+
+    def variance(self):
+        """ Exact per-entry variance of A (dense n x n).  Position t of
+            the matched stub lists is an edge r <- c with probability
+            p_r * q_c (p = a / total_in, q = b / total_out), and two
+            positions are drawn without replacement, so
+
+                E[A_rc^2] = E p_r q_c
+                            + E (E-1) a_r (a_r-1) b_c (b_c-1)
+                                / (T_in (T_in-1) T_out (T_out-1))
+
+            and var = E[A_rc^2] - E[A_rc]^2; a sum of three outer
+            products.
+        """
+        a, b = self._degree_vectors()
+        E, Ti, To = float(self.total_edges), self.total_in, self.total_out
+        u, v = self.expected_adjacency(factored=True)
+        pairs = E * (E - 1) / max(Ti * (Ti - 1.) * To * (To - 1.), 1.)
+        var = outer(u, v) + pairs * outer(a * (a - 1), b * (b - 1)) - \
+              outer(u * u, v * v)
+        var[var < 0] = 0.  # Round-off where the variance is zero
+        return var
+
+
+    def zscores(self, observed):
+        """ (observed - E[A]) / sqrt(var(A)) for every entry, as
+            EnsembleAccumulator.zscores() would give for an infinite
+            ensemble (NaN/inf where the variance is zero).  `observed`
+            is a sparse or dense matrix in this model's layout (rows =
+            destinations).
+        """
+        observed = observed.toarray() if hasattr(observed, 'toarray') \
+                   else asarray(observed, dtype=float)
+        with errstate(divide='ignore', invalid='ignore'):
+            return (observed - self.expected_adjacency()) / \
+                   sqrt(self.variance())
+
+
     def yield_edges(self):
         """ Generates a random network, then yields (generator) the 
             edges one by one as a tuple:
@@ -87,7 +220,6 @@ class ConfigurationModel:
         """ 
 
         A = self.generate_adjacency_matrix()
-        rows, cols = A.nonzero()
-        for r,c in zip(rows, cols):
-            yield(r, c, A[r,c])
+        for r, c, w in zip(*as_edges(A)):
+            yield(r, c, w)
 
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Degree-preserving null model by double edge swaps.
+
+ConfigurationModel matches stubs at random, so its networks have multi-
+edges and self-loops.  EdgeSwapModel instead starts from a network with
+the right degrees (an observed one, or one built from degree sequences)
+and rewires it: a swap takes two edges a->b and c->d and replaces them
+with a->d and c->b, which keeps every in- and out-degree.  Swaps that
+would create a multi-edge (or move a self-loop, see below) are rejected.
+
+    >>> model = EdgeSwapModel.from_matrix(observed, rows='in', rnd_seed=1)
+    >>> for rows, cols in model.generate_ensemble(1000, as_iterator=True):
+    ...     acc.add((rows, cols))
+
+Edges are kept as parallel source/destination arrays and swaps are
+attempted in large batches of disjoint edge pairs, so each batch is a
+handful of numpy calls.  Existing edges are looked up in a direct-
+address table of n*n flags (a perfect hash on source*n + destination),
+so checking a candidate edge is O(1).
+
+A batch (of random size, from one swap up) only accepts swaps that share
+no edge (removed or created) with any other swap proposed in it; each of
+those is judged exactly as a lone swap would be.  This keeps the batch
+move symmetric, so the samples are uniform over the networks the swaps
+can reach.
+
+Double edge swaps can't reverse a directed 3-cycle: with loops
+forbidden, EdgeSwapModel([0, 1, 2], [1, 2, 0], self_loops='forbid')
+accepts no swap and never reaches 0->2->1->0.  Networks that differ by
+reversing such cycles are in different components of the swap chain, so
+only the component of the start network is sampled (uniformly).
+
+Self-loops (self_loops=...):
+  + 'fixed' - loops are set aside and returned unchanged in every sample
+              (e.g. self-hires kept exactly as observed); swaps never
+              create new ones
+  + 'allow' - loops are ordinary edges and may appear or disappear
+  + 'forbid' - no loops, in the start network or the samples
+
+Mixing is measured in attempted swaps per (swappable) edge: `mixing`
+swaps per edge are attempted before the first sample and `thinning`
+swaps per edge between consecutive samples.
+"""
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+from university_network.misc.rng import get_rng
+from university_network.models.stubs import stub_dtype
+from university_network.models.edges import edge_arrays, adjacency, \
+    as_edges
+
+SELF_LOOP_MODES = ['fixed', 'allow', 'forbid']
+BATCH_FRACTION = 0.25  # Share of the edges touched by one batch of swaps
+MAX_TABLE_SIZE = 1 << 28  # Largest n*n edge table allowed (bytes)
+
+
+def digraph_edges(in_degree_seq, out_degree_seq):
+    """ (sources, destinations) of a simple directed network without
+        self-loops with the given degrees (Kleitman-Wang construction).
+        Raises ValueError if no such network exists.
+    """
+    import networkx as nx
+    try:
+        G = nx.directed_havel_hakimi_graph([int(k) for k in in_degree_seq],
+                                           [int(k) for k in out_degree_seq])
+    except nx.NetworkXError as e:
+        raise ValueError('No simple network with these degrees: %s' % e)
+    edges = np.array(list(G.edges()), dtype=np.int64).reshape(-1, 2)
+    return edges[:, 0], edges[:, 1]
+
+
+class EdgeSwapModel:
+    """ Class for generating degree-preserving random networks by double
+        edge swaps (see module docstring).
+
+        Adjacency matrices follow ConfigurationModel: rows are
+        destinations (in-degree = row sums), columns are sources.
+
+        FUNCTIONS
+        - generate_adjacency_matrix() : Rewires, then returns a (sparse)
+                        adjacency matrix.
+
+        - generate_ensemble(k) : Returns k consecutive samples at once.
+
+        - yield_edges() : Calls generate_adjacency_matrix(), then iterates
+                        over the edges, returning (row, column, weight).
+    """
+
+    def __init__(self, sources, destinations, n=None, self_loops='fixed',
+                 multi_edges=False, mixing=10., thinning=1., rnd_seed=None,
+                 output='csc', batch_fraction=BATCH_FRACTION):
+        """ Prepare the model from the edges of a starting network (one
+            entry per edge; repeat an edge for each unit of weight).
+
+            Inputs:
+              + sources, destinations - edge arrays of the start network
+              + n - number of nodes (default: largest node id + 1)
+              + self_loops - 'fixed', 'allow' or 'forbid'
+              + multi_edges - allow parallel edges (no duplicate checks)
+              + mixing - swaps per edge attempted before the first sample
+              + thinning - swaps per edge attempted between samples
+              + rnd_seed - seed (see misc.rng)
+              + output - format of generate_adjacency_matrix(), see
+                         models.edges.adjacency()
+              + batch_fraction - share of the edges swapped per batch
+                                 (0 for one swap at a time)
+        """
+        if self_loops not in SELF_LOOP_MODES:
+            raise ValueError('self_loops must be one of %s' % SELF_LOOP_MODES)
+        sources = np.asarray(sources, dtype=np.int64)
+        destinations = np.asarray(destinations, dtype=np.int64)
+        if len(sources) != len(destinations):
+            raise ValueError('Sources and destinations must be of equal '
+                             'length!')
+        if n is None:
+            n = int(max(sources.max(), destinations.max())) + 1 \
+                if len(sources) else 0
+        self.n = n
+        self.self_loops = self_loops
+        self.multi_edges = multi_edges
+        self.mixing = mixing
+        self.thinning = thinning
+        self.batch_fraction = batch_fraction
+        self.rng = get_rng(rnd_seed)
+        self.output = output
+
+        is_loop = sources == destinations
+        if self_loops == 'forbid' and is_loop.any():
+            raise ValueError('Start network has self-loops')
+        if self_loops == 'fixed':
+            self.loops = np.bincount(sources[is_loop], minlength=n)
+            sources, destinations = sources[~is_loop], destinations[~is_loop]
+        else:
+            self.loops = np.zeros(n, dtype=np.int64)
+
+        dtype = stub_dtype(max(n, 1))
+        self.sources = sources.astype(dtype)
+        self.destinations = destinations.astype(dtype)
+        self._loop_nodes = np.repeat(np.arange(n, dtype=dtype), self.loops)
+
+        self.table = None
+        if not multi_edges:
+            if n * n > MAX_TABLE_SIZE:
+                raise ValueError('Too many nodes for the edge table: %d' % n)
+            self.table = np.zeros(n * n, dtype=bool)
+            keys = self._keys(self.sources, self.destinations)
+            if len(np.unique(keys)) < len(keys):
+                raise ValueError('Start network has multi-edges; pass '
+                                 'multi_edges=True or use from_degrees()')
+            self.table[keys] = True
+
+        self.total_edges = len(self.sources) + len(self._loop_nodes)
+        self.attempted = 0
+        self.accepted = 0
+        self._mixed = False
+
+    @classmethod
+    def from_matrix(cls, A, rows='in', **kwargs):
+        """ Model starting from an observed (weighted) adjacency matrix.
+            rows='in' if rows are destinations (as in ConfigurationModel),
+            'out' if rows are sources.  Integer weights become parallel
+            edges, so with multi_edges=False only self-loops may have
+            weight > 1 (and only with self_loops='fixed').
+        """
+        if rows not in ('in', 'out'):
+            raise ValueError("rows must be 'in' or 'out'")
+        r, c, w = edge_arrays(csc_matrix(A))
+        w = w.astype(np.int64)
+        r, c = np.repeat(r, w), np.repeat(c, w)
+        sources, destinations = (c, r) if rows == 'in' else (r, c)
+        kwargs.setdefault('n', A.shape[0])
+        return cls(sources, destinations, **kwargs)
+
+    @classmethod
+    def from_degrees(cls, in_degree_seq, out_degree_seq, loops=None,
+                     **kwargs):
+        """ Model starting from a simple network with the given degree
+            sequences.  `loops` (per-node self-loop counts, included in
+            the degrees) are kept as they are with self_loops='fixed'.
+        """
+        in_deg = np.asarray(in_degree_seq, dtype=np.int64)
+        out_deg = np.asarray(out_degree_seq, dtype=np.int64)
+        if len(in_deg) != len(out_deg):
+            raise ValueError("In-degree and out-degree sequences must "
+                             "be of equal length!")
+        n = kwargs.setdefault('n', len(in_deg))
+        if loops is None:
+            loops = np.zeros(len(in_deg), dtype=np.int64)
+        loops = np.asarray(loops, dtype=np.int64)
+        sources, destinations = digraph_edges(in_deg - loops, out_deg - loops)
+        nodes = np.repeat(np.arange(len(loops)), loops)
+        return cls(np.concatenate([sources, nodes]),
+                   np.concatenate([destinations, nodes]), **kwargs)
+
+    def _keys(self, sources, destinations):
+        return sources.astype(np.int64) * self.n + destinations
+
+    def swap(self, attempts):
+        """ Attempt `attempts` double edge swaps (in batches of disjoint
+            edge pairs).  Returns the number accepted.
+        """
+        m = len(self.sources)
+        if m < 2:
+            return 0
+        batch = max(1, min(int(self.batch_fraction * m), m // 2))
+        accepted = 0
+        remaining = int(attempts)
+        while remaining > 0:
+            b = min(batch, remaining)
+            if b > 1:
+                # A random size, down to a lone swap: batches that always
+                # pair up every edge could only make paired moves
+                b = self.rng.randint(1, b + 1)
+            remaining -= b
+            picked = self.rng.permutation(m)[:2 * b]
+            i, j = picked[:b], picked[b:]
+            a, bb = self.sources[i], self.destinations[i]
+            c, d = self.sources[j], self.destinations[j]
+
+            ok = (a != c) & (bb != d)
+            if self.self_loops != 'allow':
+                ok &= (a != d) & (c != bb)
+            if self.table is not None:
+                old1, old2 = self._keys(a, bb), self._keys(c, d)
+                new1, new2 = self._keys(a, d), self._keys(c, bb)
+                ok &= ~self.table[new1] & ~self.table[new2]
+                ok &= self._isolated([old1, old2, new1, new2])
+                self.table[old1[ok]] = False
+                self.table[old2[ok]] = False
+                self.table[new1[ok]] = True
+                self.table[new2[ok]] = True
+            self.destinations[i[ok]] = d[ok]
+            self.destinations[j[ok]] = bb[ok]
+            accepted += int(ok.sum())
+
+        self.attempted += int(attempts)
+        self.accepted += accepted
+        return accepted
+
+    def _isolated(self, keys):
+        """ Mask of the proposed swaps none of whose edges (removed or
+            created, given as a list of key arrays) is an edge of another
+            proposal in the batch.  Only these may be accepted: each is
+            then judged against the table alone, exactly as a lone swap,
+            and the reverse batch accepts the same swaps, so batches keep
+            detailed balance.
+        """
+        b = len(keys[0])
+        owners = np.tile(np.arange(b, dtype=np.int64), len(keys))
+        # Distinct (key, proposal) pairs, then keys with several owners
+        pairs = np.unique(np.concatenate(keys) * b + owners)
+        uniq, inverse, counts = np.unique(pairs // b, return_inverse=True,
+                                          return_counts=True)
+        isolated = np.ones(b, dtype=bool)
+        isolated[pairs[counts[inverse] > 1] % b] = False
+        return isolated
+
+    def acceptance_rate(self):
+        """ Share of attempted swaps accepted so far """
+        return float(self.accepted) / max(self.attempted, 1)
+
+    def _advance(self):
+        """ Rewire to the next sample: burn in first, then thin """
+        per_edge = self.thinning if self._mixed else self.mixing
+        self.swap(int(np.ceil(per_edge * len(self.sources))))
+        self._mixed = True
+
+    def _edges(self):
+        """ (rows, cols) of the current network (fresh arrays) """
+        return (np.concatenate([self.destinations, self._loop_nodes]),
+                np.concatenate([self.sources, self._loop_nodes]))
+
+    def generate_adjacency_matrix(self):
+        """ Rewire, then return the current network as an adjacency
+            matrix (rows = destinations).
+        """
+        self._advance()
+        rows, cols = self._edges()
+        return adjacency(rows, cols, self.n, self.output)
+
+    def generate_ensemble(self, k, as_iterator=False):
+        """ Generate k consecutive samples (each `thinning` swaps per edge
+            after the previous one).
+
+            Returns, as ConfigurationModel.generate_ensemble():
+              + (default) a k x n*n csr_matrix; row s is network s, with
+                edge (r, c) in column r*n + c.
+              + with as_iterator=True, a generator of (rows, cols) arrays,
+                one pair per network.
+        """
+        if as_iterator:
+            return self._iter_ensemble(k)
+        n = np.int64(self.n)
+        keys = [rows.astype(np.int64) * n + cols
+                for rows, cols in self._iter_ensemble(k)]
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        return csr_matrix((np.ones(len(keys)), keys,
+                           np.arange(k + 1) * self.total_edges),
+                          shape=(k, n * n))
+
+    def _iter_ensemble(self, k):
+        for s in xrange(k):
+            self._advance()
+            yield self._edges()
+
+    def yield_edges(self):
+        """ Generates a random network, then yields (generator) the
+            edges one by one as a tuple:
+                (row_index, column_index, edge_weight)
+        """
+        A = self.generate_adjacency_matrix()
+        for r, c, w in zip(*as_edges(A)):
+            yield(r, c, w)
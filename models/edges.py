@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Edge export for generated networks.
+
+edge_arrays() reads (row, col, weight) arrays straight out of a sparse
+matrix's internals -- no per-edge indexing -- with duplicate entries
+summed, so multi-edges are counted once with their total weight.  The
+writers stream those arrays to disk in chunks:
+
+    >>> rows, cols, weights = edge_arrays(model.generate_adjacency_matrix())
+    >>> write_edge_list(open('net.txt', 'w'), A, names=institution_names)
+    >>> write_gml(open('net.gml', 'w'), A, names=institution_names)
+
+Edges are written source -> target.  The ranking models put sources on
+the matrix rows (rows='out', the default); ConfigurationModel and
+EdgeSwapModel put destinations there, so export them with rows='in':
+
+    >>> write_gml(open('cm.gml', 'w'), cm.generate_adjacency_matrix(),
+    ...           rows='in')
+
+Every writer accepts either a sparse matrix, a (rows, cols, weights)
+tuple of arrays, or raw (rows, cols) pairs such as those yielded by
+ConfigurationModel.generate_ensemble(k, as_iterator=True), whose
+repeated pairs are merged first.
+
+adjacency() is how the models build their output: a 'csc' (default),
+'csr' or 'coo' matrix with int32 indices and integer weights, or the raw
+(rows, cols) edge arrays with output='edges'.  'coo' and 'edges' skip
+the summation of duplicate edges, so multi-edges stay repeated entries.
+"""
+
+import numpy as np
+from scipy.sparse import issparse, coo_matrix
+
+WRITE_CHUNK = 1 << 16  # Edges formatted per write() call
+OUTPUT_FORMATS = ['csc', 'csr', 'coo', 'edges']
+INDEX_DTYPE = np.int32
+WEIGHT_DTYPE = np.int32
+
+
+def adjacency(rows, cols, n, output='csc'):
+    """ n x n network from edge arrays (one entry per edge), in one of
+        OUTPUT_FORMATS.  The arrays are always copied, so callers may
+        reuse their buffers.
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError('output must be one of %s' % OUTPUT_FORMATS)
+    rows = np.array(rows, dtype=INDEX_DTYPE)
+    cols = np.array(cols, dtype=INDEX_DTYPE)
+    if output == 'edges':
+        return rows, cols
+    A = coo_matrix((np.ones(len(rows), dtype=WEIGHT_DTYPE), (rows, cols)),
+                   shape=(n, n))
+    if output == 'coo':
+        return A
+    return A.asformat(output)
+
+
+def edge_arrays(A):
+    """ (rows, cols, weights) of the nonzero entries of sparse matrix A,
+        with duplicate entries summed.  CSC matrices come out sorted by
+        column, then row (CSR: by row, then column).
+    """
+    if A.format in ('csc', 'csr'):
+        if not A.has_canonical_format:
+            A = A.copy()
+            A.sum_duplicates()
+        major = np.repeat(np.arange(len(A.indptr) - 1, dtype=A.indices.dtype),
+                          np.diff(A.indptr))
+        rows, cols = (A.indices, major) if A.format == 'csc' else \
+                     (major, A.indices)
+        data = A.data
+    else:
+        A = A.tocoo(copy=True)
+        A.sum_duplicates()
+        rows, cols, data = A.row, A.col, A.data
+    nonzero = data != 0
+    if not nonzero.all():
+        return rows[nonzero], cols[nonzero], data[nonzero]
+    return rows, cols, data
+
+
+def merge_edges(rows, cols, weights=None):
+    """ Sum repeated (row, col) pairs of raw edge arrays.  Returns
+        (rows, cols, weights) as edge_arrays() does.
+    """
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    if weights is None:
+        weights = np.ones(len(rows))
+    n = max(rows.max() if len(rows) else 0, cols.max() if len(cols) else 0) + 1
+    return edge_arrays(coo_matrix((weights, (rows, cols)), shape=(n, n)))
+
+
+def as_edges(edges):
+    """ (rows, cols, weights) of a sparse matrix, of raw (rows, cols)
+        pairs (merged), or of (rows, cols, weights) arrays (as is)
+    """
+    if issparse(edges):
+        return edge_arrays(edges)
+    if len(edges) == 2:
+        return merge_edges(*edges)
+    return edges
+
+
+def _labels(ids, names):
+    if names is None:
+        return ids.tolist()
+    return np.asarray(names, dtype=object)[ids].tolist()
+
+
+def _weights(weights):
+    """ Weights as a list (and its format); whole numbers are written
+        without decimals.
+    """
+    weights = np.asarray(weights)
+    if weights.dtype.kind in 'iu' or (weights == np.round(weights)).all():
+        return weights.astype(np.int64).tolist(), '%d'
+    return weights.tolist(), '%r'
+
+
+def _format(template, columns):
+    """ Apply `template` (one record's format) to parallel columns """
+    k = len(columns)
+    flat = [None] * (k * len(columns[0]))
+    for i, col in enumerate(columns):
+        flat[i::k] = col
+    return (template * len(columns[0])) % tuple(flat)
+
+
+def _endpoints(edges, rows):
+    """ (sources, targets, weights) of `edges`, whose rows are sources
+        (rows='out') or destinations (rows='in')
+    """
+    if rows not in ('in', 'out'):
+        raise ValueError("rows must be 'in' or 'out'")
+    r, c, w = as_edges(edges)
+    return (r, c, w) if rows == 'out' else (c, r, w)
+
+
+def write_edge_list(fp, edges, names=None, delimiter='\t', weights=True,
+                    header=None, rows='out'):
+    """ Write one "source<TAB>target<TAB>weight" line per edge.
+        Inputs:
+          + fp - an *open* file pointer
+          + edges - sparse matrix or (rows, cols, weights) arrays
+          + rows - 'out' if rows are sources (ranking models), 'in' if
+                   rows are destinations (ConfigurationModel,
+                   EdgeSwapModel)
+          + names - (optional) node labels, indexed by node id
+          + weights - include the weight column
+          + header - (optional) first line, written as "# header"
+        Returns the number of edges written.
+    """
+    sources, targets, w = _endpoints(edges, rows)
+    node_format = '%d' if names is None else '%s'
+    if header is not None:
+        fp.write('# %s\n' % header)
+    for start in xrange(0, len(sources), WRITE_CHUNK):
+        end = start + WRITE_CHUNK
+        columns = [_labels(sources[start:end], names),
+                   _labels(targets[start:end], names)]
+        fields = [node_format, node_format]
+        if weights:
+            values, weight_format = _weights(w[start:end])
+            columns.append(values)
+            fields.append(weight_format)
+        fp.write(_format(delimiter.join(fields) + '\n', columns))
+    return len(sources)
+
+
+def _gml_string(s):
+    return '"%s"' % str(s).replace('&', '&amp;').replace('"', '&quot;')
+
+
+def write_gml(fp, edges, names=None, n=None, directed=True, rows='out'):
+    """ Write a (directed, weighted) network in GML, the format written
+        by networkx.write_gml().  Nodes are 0..n-1, labelled with `names`
+        if given; every node is written, including isolated ones.
+        rows is as in write_edge_list().
+        Returns the number of edges written.
+    """
+    sources, targets, w = _endpoints(edges, rows)
+    if n is None:
+        if issparse(edges):
+            n = edges.shape[0]
+        elif names is not None:
+            n = len(names)
+        else:
+            n = max(sources.max() if len(sources) else -1,
+                    targets.max() if len(targets) else -1) + 1
+
+    fp.write('graph [\n  directed %d\n' % (1 if directed else 0))
+    for start in xrange(0, n, WRITE_CHUNK):
+        ids = range(start, min(n, start + WRITE_CHUNK))
+        labels = [_gml_string(i if names is None else names[i]) for i in ids]
+        fp.write(_format('  node [\n    id %d\n    label %s\n  ]\n',
+                         [ids, labels]))
+    for start in xrange(0, len(sources), WRITE_CHUNK):
+        end = start + WRITE_CHUNK
+        values, weight_format = _weights(w[start:end])
+        fp.write(_format('  edge [\n    source %d\n    target %d\n'
+                         '    weight ' + weight_format + '\n  ]\n',
+                         [sources[start:end].tolist(),
+                          targets[start:end].tolist(),
+                          values]))
+    fp.write(']\n')
+    return len(sources)
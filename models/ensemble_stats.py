@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Online statistics over ensembles of generated networks.
+
+An EnsembleAccumulator consumes networks one at a time, so memory stays
+O(n^2) (or O(nnz) with sparse=True) however many samples are drawn:
+
+    >>> acc = EnsembleAccumulator(cm.n, rows='in',
+    ...                           statistics={'self_loops': self_loops})
+    >>> for i in xrange(10000):
+    ...     acc.add(cm.generate_adjacency_matrix())
+    >>> acc.mean, acc.variance(), acc.zscores(observed)
+    >>> acc.node_mean('out'), acc.stat_quantile('self_loops', 0.95)
+
+Kept per sample:
+  + the adjacency matrix - running mean/variance (Welford; in sparse mode
+    exact running sums of A and A^2, which only touch nonzero entries)
+  + per-institution in-degree, out-degree and self-loop counts
+  + any scalar statistics (functions of the adjacency matrix), with an
+    optional reservoir sample of each for quantiles
+
+Accumulators built with the same settings can be merge()d, e.g. after
+accumulating chunks of an ensemble in different processes.
+"""
+
+import numpy as np
+from scipy.sparse import issparse, csr_matrix, coo_matrix
+from university_network.misc.rng import get_rng
+
+NODE_STATS = ['in', 'out', 'self']
+
+
+def self_loops(A):
+    """ Total weight of self-loops (e.g. schools hiring their own PhDs) """
+    return float(A.diagonal().sum())
+
+
+def num_edges(A):
+    """ Number of distinct (nonzero) edges """
+    return float((A != 0).sum())
+
+
+def node_statistics(A, rows='out'):
+    """ Per-institution 'in', 'out' and 'self' (loop) counts of sparse
+        matrix A, whose rows are sources (rows='out') or destinations
+        (rows='in').
+    """
+    ones = np.ones(A.shape[0])
+    row_sums = A.dot(ones)
+    col_sums = A.T.dot(ones)
+    out_deg, in_deg = (row_sums, col_sums) if rows == 'out' else \
+                      (col_sums, row_sums)
+    return {'in': in_deg, 'out': out_deg, 'self': A.diagonal()}
+
+
+class Welford:
+    """ Running mean and sum of squared deviations of arrays (or
+        scalars) of a fixed shape.
+    """
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        """ Combine with another Welford (Chan et al.'s pairwise update) """
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (float(other.count) / total)
+        self.m2 = self.m2 + other.m2 + \
+                  delta ** 2 * (float(self.count) * other.count / total)
+        self.count = total
+
+    def variance(self, ddof=1):
+        if self.count - ddof <= 0:
+            return np.zeros_like(self.m2) * np.nan
+        return self.m2 / (self.count - ddof)
+
+
+class Reservoir:
+    """ Fixed-size uniform sample of a stream of scalars (for quantiles) """
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.count = 0
+        self.values = []
+
+    def add(self, x):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(x)
+        else:
+            k = int(self.rng.uniform() * self.count)
+            if k < self.size:
+                self.values[k] = x
+
+    def merge(self, other):
+        """ Approximately uniform sample of both streams """
+        total = self.count + other.count
+        if total == 0:
+            return
+        pools = [list(self.values), list(other.values)]
+        for pool in pools:
+            self.rng.shuffle(pool)
+        values = []
+        p = float(self.count) / total
+        while len(values) < self.size and (pools[0] or pools[1]):
+            take = 0 if (pools[0] and (not pools[1] or
+                                       self.rng.uniform() < p)) else 1
+            values.append(pools[take].pop())
+        self.values = values
+        self.count = total
+
+    def quantile(self, q):
+        if not self.values:
+            return np.nan
+        return np.percentile(self.values, 100. * np.asarray(q))
+
+
+class EnsembleAccumulator:
+    """ Running statistics of an ensemble of n x n networks.
+
+        Inputs:
+          + n - number of nodes
+          + rows - 'out' if matrix rows are sources (the ranking models;
+                   out-degree = row sums) or 'in' if rows are
+                   destinations (ConfigurationModel)
+          + sparse - keep sums of A and A^2 as sparse matrices instead of
+                     dense Welford arrays
+          + statistics - dict name -> function(A) -> float, evaluated on
+                         every sample (A as given to add(), converted to
+                         a sparse matrix if needed)
+          + sketch_size - reservoir size per scalar statistic for
+                          quantiles (0 to disable)
+          + rnd_seed - seed for the reservoirs
+    """
+    def __init__(self, n, rows='out', sparse=False, statistics=None,
+                 sketch_size=1000, rnd_seed=None):
+        if rows not in ('in', 'out'):
+            raise ValueError("rows must be 'in' or 'out'")
+        self.n = n
+        self.rows = rows
+        self.sparse = sparse
+        self.count = 0
+        if sparse:
+            self.total = csr_matrix((n, n))
+            self.total_sq = csr_matrix((n, n))
+        else:
+            self.matrix = Welford((n, n))
+        self.nodes = dict((s, Welford(n)) for s in NODE_STATS)
+        self.statistics = dict(statistics or {})
+        self.stats = dict((s, Welford()) for s in self.statistics)
+        self.rng = get_rng(rnd_seed)
+        self.sketch_size = sketch_size
+        self.sketches = dict((s, Reservoir(sketch_size, self.rng))
+                             for s in self.statistics) if sketch_size else {}
+
+    def _as_matrix(self, A):
+        if issparse(A):
+            return A.tocsr()
+        if isinstance(A, tuple):
+            rows, cols = A[0], A[1]
+            weights = A[2] if len(A) > 2 else np.ones(len(rows))
+            return coo_matrix((weights, (rows, cols)),
+                              shape=(self.n, self.n)).tocsr()
+        return csr_matrix(np.asarray(A))
+
+    def measure(self, A):
+        """ (node statistics, statistic values) of a matrix from
+            _as_matrix(), as used by add()
+        """
+        values = dict((name, func(A))
+                      for name, func in self.statistics.iteritems())
+        return node_statistics(A, self.rows), values
+
+    def add(self, A, measured=None, dense=None):
+        """ Add one network: a sparse or dense matrix, or COO arrays
+            (rows, cols[, weights]) as yielded by generate_ensemble().
+            A caller that already has measure(A) or A.toarray() can pass
+            them as measured / dense to skip recomputing them.
+        """
+        A = self._as_matrix(A)
+        self.count += 1
+        if self.sparse:
+            self.total = self.total + A
+            self.total_sq = self.total_sq + A.multiply(A)
+        else:
+            self.matrix.add(A.toarray() if dense is None else dense)
+
+        if measured is None:
+            measured = self.measure(A)
+        nodes, values = measured
+        for s, x in nodes.iteritems():
+            self.nodes[s].add(x)
+
+        for name, value in values.iteritems():
+            self.stats[name].add(value)
+            if name in self.sketches:
+                self.sketches[name].add(value)
+
+    def add_stacked(self, ensemble):
+        """ Add every network of a stacked k x n*n ensemble (see
+            ConfigurationModel.generate_ensemble)
+        """
+        ensemble = ensemble.tocsr()
+        for s in xrange(ensemble.shape[0]):
+            row = ensemble.getrow(s).tocoo()
+            self.add((row.col // self.n, row.col % self.n, row.data))
+
+    def merge(self, other):
+        """ Fold another accumulator (same settings) into this one """
+        if (other.n, other.rows, other.sparse) != \
+           (self.n, self.rows, self.sparse):
+            raise ValueError('Accumulators have different settings')
+        if self.sparse:
+            self.total = self.total + other.total
+            self.total_sq = self.total_sq + other.total_sq
+        else:
+            self.matrix.merge(other.matrix)
+        for s in NODE_STATS:
+            self.nodes[s].merge(other.nodes[s])
+        for name in self.stats:
+            self.stats[name].merge(other.stats[name])
+            if name in self.sketches:
+                self.sketches[name].merge(other.sketches[name])
+        self.count += other.count
+        return self
+
+    @property
+    def mean(self):
+        """ Mean adjacency matrix (sparse in sparse mode) """
+        if self.sparse:
+            return self.total / max(self.count, 1)
+        return self.matrix.mean
+
+    def variance(self, ddof=1):
+        """ Per-entry variance of the adjacency matrix """
+        if not self.sparse:
+            return self.matrix.variance(ddof)
+        if self.count - ddof <= 0:
+            raise ValueError('Not enough samples for the variance')
+        mean = self.total / float(self.count)
+        var = (self.total_sq - self.total.multiply(mean)) / \
+              float(self.count - ddof)
+        return csr_matrix(var)
+
+    def zscores(self, observed):
+        """ (observed - mean) / std for every entry of the adjacency
+            matrix (dense array; NaN/inf where the ensemble has zero
+            variance).
+        """
+        observed = self._as_matrix(observed).toarray()
+        mean = self.mean
+        var = self.variance()
+        if self.sparse:
+            mean, var = mean.toarray(), var.toarray()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (observed - mean) / np.sqrt(var)
+
+    def node_mean(self, which):
+        """ Mean per-institution 'in', 'out' or 'self' (loop) counts """
+        return self.nodes[which].mean
+
+    def node_variance(self, which, ddof=1):
+        return self.nodes[which].variance(ddof)
+
+    def stat_mean(self, name):
+        return float(self.stats[name].mean)
+
+    def stat_variance(self, name, ddof=1):
+        return float(self.stats[name].variance(ddof))
+
+    def stat_quantile(self, name, q):
+        """ Approximate quantile(s) q of a scalar statistic """
+        return self.sketches[name].quantile(q)
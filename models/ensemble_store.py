@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Out-of-core storage of network ensembles.
+
+An EnsembleStore is a directory of flat, memory-mapped arrays: the
+(row, col, weight) edge arrays of every sample, appended end to end, and
+an offset index (sample s is edges offsets[s]:offsets[s+1]).  Files are
+preallocated and grown geometrically, so appending a sample is a copy
+into the maps, and reading one is a slice -- nothing is pickled and the
+ensemble never has to fit in memory.
+
+    >>> with EnsembleStore('ensemble/', 'w', n=model.n) as store:
+    ...     for i in xrange(100000):
+    ...         store.add(model.generate_adjacency_matrix())
+
+and later, possibly in another process:
+
+    >>> store = EnsembleStore('ensemble/')
+    >>> rows, cols, weights = store[17]
+    >>> for edges in store:
+    ...     acc.add(edges)             # see ensemble_stats
+
+A reader only sees samples that were written before it opened the
+store, or before its last refresh(); the sample count in meta.json is
+updated after a sample's edges, and written atomically, so a reader
+running alongside the writer never sees a partial sample.
+"""
+
+import os
+import json
+import numpy as np
+from scipy.sparse import csc_matrix
+from university_network.models.stubs import stub_dtype
+from university_network.models.edges import as_edges
+
+META_FILE = 'meta.json'
+ARRAYS = ['rows', 'cols', 'weights']
+EDGE_CAPACITY = 1 << 20  # Initial edges preallocated
+SAMPLE_CAPACITY = 1 << 12  # Initial samples preallocated
+STORE_VERSION = 1
+
+
+class EnsembleStore:
+    """ Memory-mapped ensemble of networks (see module docstring).
+
+        Inputs:
+          + directory - where the store's files live
+          + mode - 'r' read, 'w' create (replacing an existing store),
+                   'a' append to an existing store
+          + n - number of nodes (required for mode 'w')
+          + rows - layout of the stored matrices, 'out' if rows are
+                   sources (ranking models) or 'in' (ConfigurationModel);
+                   only recorded for readers
+          + weight_dtype - type of the stored weights (float32 holds
+                           edge counts exactly up to 2^24)
+          + flush_every - samples between updates of meta.json while
+                          writing (readers see new samples after this)
+    """
+    def __init__(self, directory, mode='r', n=None, rows='out',
+                 weight_dtype=np.float32, flush_every=100):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError("mode must be 'r', 'w' or 'a'")
+        self.directory = directory
+        self.mode = mode
+        self.flush_every = flush_every
+        if mode == 'w':
+            if n is None:
+                raise ValueError('Number of nodes required for a new store')
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self.meta = {'version': STORE_VERSION, 'n': n, 'rows': rows,
+                         'index_dtype': np.dtype(stub_dtype(max(n, 1))).str,
+                         'weight_dtype': np.dtype(weight_dtype).str,
+                         'count': 0, 'edges': 0}
+            for name in ARRAYS + ['offsets']:
+                open(self._path(name), 'wb').close()
+            self._write_meta()
+        else:
+            self._read_meta()
+        self.n = self.meta['n']
+        self.rows = self.meta['rows']
+        self.dtypes = {'rows': np.dtype(self.meta['index_dtype']),
+                       'cols': np.dtype(self.meta['index_dtype']),
+                       'weights': np.dtype(self.meta['weight_dtype']),
+                       'offsets': np.dtype(np.int64)}
+        self.maps = {}
+        self._open_maps()
+        if mode != 'r' and self.meta['count'] == 0:
+            self.maps['offsets'][0] = 0
+
+    def _path(self, name):
+        if name == 'meta':
+            return os.path.join(self.directory, META_FILE)
+        return os.path.join(self.directory, name + '.dat')
+
+    def _read_meta(self):
+        with open(self._path('meta')) as fp:
+            self.meta = json.load(fp)
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError('Unsupported ensemble store version %s' %
+                             self.meta['version'])
+
+    def _write_meta(self):
+        tmp = self._path('meta') + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(self.meta, fp)
+        os.rename(tmp, self._path('meta'))
+
+    def _capacity(self, name):
+        return os.path.getsize(self._path(name)) // self.dtypes[name].itemsize
+
+    def _map(self, name, length):
+        """ Map the first `length` items of one array file """
+        if length == 0:
+            return np.zeros(0, dtype=self.dtypes[name])
+        return np.memmap(self._path(name), dtype=self.dtypes[name],
+                         mode='r' if self.mode == 'r' else 'r+',
+                         shape=(length,))
+
+    def _open_maps(self):
+        """ (Re)map every array file: all of it when writing, only the
+            completed samples when reading.
+        """
+        self.maps.clear()
+        if self.mode == 'r':
+            lengths = dict((name, self.meta['edges']) for name in ARRAYS)
+            lengths['offsets'] = self.meta['count'] + 1
+        else:
+            self._reserve('offsets', self.meta['count'] + 1, SAMPLE_CAPACITY)
+            for name in ARRAYS:
+                self._reserve(name, self.meta['edges'], EDGE_CAPACITY)
+            lengths = dict((name, self._capacity(name))
+                           for name in ARRAYS + ['offsets'])
+        for name, length in lengths.iteritems():
+            self.maps[name] = self._map(name, length)
+
+    def _reserve(self, name, needed, minimum):
+        """ Grow an array file (geometrically) to hold `needed` items """
+        capacity = self._capacity(name)
+        if capacity >= needed and capacity > 0:
+            return False
+        capacity = max(minimum, 2 * capacity, needed)
+        with open(self._path(name), 'r+b') as fp:
+            fp.truncate(capacity * self.dtypes[name].itemsize)
+        return True
+
+    def add(self, A):
+        """ Append one network: a sparse matrix, (rows, cols, weights)
+            arrays, or raw (rows, cols) pairs (repeats are merged).
+        """
+        if self.mode == 'r':
+            raise IOError('Ensemble store is open read-only')
+        edges = as_edges(A)
+        start, count = self.meta['edges'], self.meta['count']
+        end = start + len(edges[0])
+
+        grown = self._reserve('offsets', count + 2, SAMPLE_CAPACITY)
+        for name in ARRAYS:
+            grown |= self._reserve(name, end, EDGE_CAPACITY)
+        if grown:
+            self._flush_maps()
+            self._open_maps()
+        for name, values in zip(ARRAYS, edges):
+            self.maps[name][start:end] = values
+        self.maps['offsets'][count + 1] = end
+
+        self.meta['edges'] = end
+        self.meta['count'] = count + 1
+        if self.flush_every and self.meta['count'] % self.flush_every == 0:
+            self.flush()
+
+    def _flush_maps(self):
+        for values in self.maps.itervalues():
+            if isinstance(values, np.memmap):
+                values.flush()
+
+    def flush(self):
+        """ Write pending samples to disk and publish them to readers """
+        if self.mode == 'r':
+            return
+        self._flush_maps()
+        self._write_meta()
+
+    def close(self):
+        """ Flush, and trim the preallocated files to their contents """
+        if self.mode != 'r':
+            self.flush()
+            self.maps.clear()
+            used = {'offsets': self.meta['count'] + 1}
+            for name in ARRAYS:
+                used[name] = self.meta['edges']
+            for name, length in used.iteritems():
+                with open(self._path(name), 'r+b') as fp:
+                    fp.truncate(length * self.dtypes[name].itemsize)
+        self.maps.clear()
+        self.mode = 'r'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def refresh(self):
+        """ Reader: pick up samples written since the store was opened """
+        if self.mode == 'r':
+            self._read_meta()
+            self._open_maps()
+
+    def __len__(self):
+        return self.meta['count']
+
+    def edge_range(self, s):
+        """ (start, end) of sample s in the edge arrays """
+        if s < 0:
+            s += len(self)
+        if not 0 <= s < len(self):
+            raise IndexError('Sample %d out of range' % s)
+        if not self.maps:
+            self._open_maps()
+        offsets = self.maps['offsets']
+        return int(offsets[s]), int(offsets[s + 1])
+
+    def __getitem__(self, s):
+        """ (rows, cols, weights) of sample s, as read-only views of the
+            maps (copy them to keep them past close())
+        """
+        start, end = self.edge_range(s)
+        return tuple(self.maps[name][start:end] for name in ARRAYS)
+
+    def matrix(self, s):
+        """ Sample s as an n x n sparse matrix """
+        rows, cols, weights = self[s]
+        return csc_matrix((weights, (rows, cols)), shape=(self.n, self.n))
+
+    def samples(self, start=0, stop=None):
+        """ Stream (rows, cols, weights) of samples start..stop-1 """
+        if stop is None or stop > len(self):
+            stop = len(self)
+        for s in xrange(start, stop):
+            yield self[s]
+
+    def __iter__(self):
+        return self.samples()
+
+
+def write_ensemble(model, directory, k, rows='out', **kwargs):
+    """ Draw k networks from `model` (generate_adjacency_matrix()) into a
+        new store at `directory`.  Returns the closed store.
+    """
+    store = EnsembleStore(directory, 'w', n=model.n, rows=rows, **kwargs)
+    with store:
+        for i in xrange(k):
+            store.add(model.generate_adjacency_matrix())
+    return store
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Common engine of the ranking (hiring) models.
+
+Every ranking model turns the same inputs -- in-degrees (jobs), out-
+degrees (candidates) and a ranking of the institutions -- into a network
+by filling jobs one at a time with remaining candidates.  They differ
+only in the order the jobs are filled and in how a candidate is chosen
+for a job.  HiringModel owns everything else: validation, rank
+normalization, the integer stub arrays, the random generator and the
+output format.  What is model-specific lives in a small kernel object:
+
+    >>> model = HiringModel(in_degrees, out_degrees, ranking,
+    ...                     SigmoidKernel(alpha=5., self_bonus=1.),
+    ...                     rnd_seed=1)
+    >>> A = model.generate_adjacency_matrix()
+
+A kernel has
+  + job_order - 'ranked' (best-ranked jobs first), 'shuffled' (uniform
+                random order) or 'weighted' (each next job drawn with
+                probability proportional to job_weights(ranking) of its
+                institution)
+  + hire(model, jobs) - the institution that fills each job, drawn from
+                        model.out_counts() with model.rng
+
+The kernels below cover the models in this package; they sample with
+the structures in models.sampling, so a new model that fits one of them
+only needs the kernel's parameters:
+
+  + ThresholdKernel - uniform among the candidates ranked at least as
+                      well as the job (less alpha), or flagged
+                      (PickBelowModel, PickBelowSpecialModel)
+  + SigmoidKernel - proportional to sigmoid(alpha * (candidate rank -
+                    job rank + beta)), plus a bonus for candidates from
+                    the hiring school (PickSigmoidModel in sig,
+                    sig_twop, pick_sigmoid, sigmoid_model and
+                    pick_sigmoid_self)
+  + WeightedKernel - proportional to a weight of the candidate alone,
+                     independent of the job (BestRemainingModel)
+
+Rankings are shifted and scaled into the range (0, 1) where 1 is the
+*BEST* ranking.  Adjacency matrices have sources (hired from) on the
+rows and destinations (hired by) on the columns.
+"""
+
+from numpy import array, exp, bincount, repeat, zeros, searchsorted
+from university_network.models.stubs import build_stubs
+from university_network.misc.rng import get_rng
+from university_network.models.edges import adjacency, as_edges
+from university_network.models.sampling import FenwickTree, kernel_hires, \
+    rank_order, weighted_order
+
+JOB_ORDERS = ['ranked', 'shuffled', 'weighted']
+
+
+def sigmoid(x):
+    return 1 / (1 + exp(-x))
+
+
+class HiringKernel:
+    """ Base class of the hiring kernels (see module docstring) """
+    job_order = 'ranked'
+
+    def job_weights(self, ranking):
+        """ Weight of each institution's jobs, for job_order 'weighted' """
+        return ranking
+
+    def hire(self, model, jobs):
+        raise NotImplementedError
+
+
+class ThresholdKernel(HiringKernel):
+    """ Each job is filled by a candidate drawn uniformly from the
+        remaining ones that are flagged or ranked at least as well as the
+        job (less alpha), or by the best remaining candidate if there are
+        none.
+
+        Inputs:
+          + alpha - rank slack of an eligible candidate
+          + flag_rate - probability that a candidate is flagged (eligible
+                        for any job)
+          + job_order - see module docstring
+
+        Candidates are counted per institution, with the institutions
+        sorted by rank, so the eligible unflagged ones are a prefix: a
+        Fenwick tree over the remaining counts (and one over the flagged
+        counts) picks from them in O(log n) per hire.
+    """
+    def __init__(self, alpha=0, flag_rate=0, job_order='ranked'):
+        self.alpha = alpha
+        self.flag_rate = flag_rate
+        self.job_order = job_order
+
+    def hire(self, model, jobs):
+        ranking = model.ranking
+        order = rank_order(ranking)
+        out_counts = model.out_counts()[order]
+        if self.flag_rate:
+            flagged = model.rng.binomial(out_counts, self.flag_rate)
+        else:
+            flagged = zeros(len(out_counts), dtype=out_counts.dtype)
+        plain = FenwickTree(out_counts - flagged)
+        special = FenwickTree(flagged)
+        num_special = int(flagged.sum())
+
+        # bounds[i]: number of sorted institutions eligible for job i
+        bounds = searchsorted(-(ranking[order] + self.alpha), -ranking[jobs],
+                              side='right').tolist()
+        sources = zeros(len(jobs), dtype=model.out_stubs.dtype)
+
+        for i in xrange(len(jobs)):
+            eligible = plain.prefix_sum(bounds[i])
+            total = eligible + num_special
+            if not total:
+                tree, selected_out = plain, plain.find(0)
+            else:
+                k = model.rng.choice(total)
+                if k < eligible:
+                    tree, selected_out = plain, plain.find(k)
+                else:
+                    tree, selected_out = special, special.find(k - eligible)
+                    num_special -= 1
+            tree.add(selected_out, -1)
+            sources[i] = order[selected_out]  # hired from
+        return sources
+
+
+class SigmoidKernel(HiringKernel):
+    """ Each job is filled by a remaining candidate drawn with probability
+        proportional to sigmoid(alpha * (candidate rank - job rank +
+        beta)), plus self_bonus for candidates from the hiring school.
+
+        Inputs:
+          + alpha - steepness of the sigmoid
+          + beta - rank offset
+          + self_bonus - extra weight of self-hires
+          + job_order - see module docstring; with 'weighted', jobs are
+                        drawn in proportion to their school's rank
+
+        Candidates are grouped by institution in a sum tree
+        (models.sampling), so a hire costs O(log n), plus O(n) when the
+        job's weights change.
+    """
+    def __init__(self, alpha, beta=0, self_bonus=0, job_order='ranked'):
+        self.alpha = alpha
+        self.beta = beta
+        self.self_bonus = self_bonus
+        self.job_order = job_order
+
+    def weights(self, ranking, v):
+        """ Candidate weights for a job at institution v """
+        w = sigmoid(self.alpha * (ranking - ranking[v] + self.beta))
+        if self.self_bonus:
+            w[v] += self.self_bonus
+        return w
+
+    def hire(self, model, jobs):
+        ranking = model.ranking
+        if self.job_order == 'ranked':
+            kernel = lambda v: self.weights(ranking, v)
+        else:
+            rows = {}  # Weights of each hiring school, built on first use
+
+            def kernel(v):
+                if v not in rows:
+                    rows[v] = self.weights(ranking, v)
+                return rows[v]
+        # Without the self bonus, jobs of equal rank share their weights
+        key = None if self.self_bonus else (lambda v: ranking[v])
+        return kernel_hires(jobs, model.out_counts(), kernel, model.rng, key)
+
+
+class WeightedKernel(HiringKernel):
+    """ Each hire draws a remaining job and a remaining candidate, each
+        with probability proportional to rank + alpha.  The two draws are
+        independent, so the whole sequence of candidates is one weighted
+        ordering of the stubs, drawn at once with exponential keys (see
+        models.sampling).
+    """
+    job_order = 'weighted'
+
+    def __init__(self, alpha=0.001):
+        self.alpha = alpha
+
+    def job_weights(self, ranking):
+        return ranking + self.alpha
+
+    def hire(self, model, jobs):
+        weights = model.ranking + self.alpha
+        candidates = weighted_order(weights[model.out_stubs], model.rng)
+        return model.out_stubs[candidates[:len(jobs)]]
+
+
+class HiringModel:
+    """ Class for generating networks by filling jobs with candidates
+        according to a hiring kernel (see module docstring).
+
+        FUNCTIONS
+        - generate_adjacency_matrix() : Returns a (sparse) adjacency
+                        matrix, rows = sources (hired from).
+
+        - yield_edges() : Calls generate_adjacency_matrix(), then iterates
+                        over the edges, returning (row, column, weight).
+    """
+
+    def __init__(self, in_degree_seq, out_degree_seq, ranking_seq, kernel,
+                 n=None, rnd_seed=None, output='csc'):
+        """ Prepare model for generating networks
+
+            Inputs:
+              + in_degree_seq - jobs of each institution
+              + out_degree_seq - candidates of each institution
+              + ranking_seq - rank of each institution, lower is better
+              + kernel - a HiringKernel
+              + n - number of institutions (default: len(in_degree_seq))
+              + rnd_seed - seed (see misc.rng)
+              + output - format of generate_adjacency_matrix(), see
+                         models.edges.adjacency()
+
+            Crucial info:
+            - self.in_stubs is a vector denoting the in-degrees of each
+              node. If v has in-degree == k_v, v appears in the in_stubs
+              vector k_v times.
+            - self.out_stubs works the same as in_stubs except for
+              out-degree.
+        """
+        if len(in_degree_seq) != len(out_degree_seq):
+            raise ValueError("In-degree and out-degree sequences must "
+                             "be of equal length!")
+        if kernel.job_order not in JOB_ORDERS:
+            raise ValueError('job_order must be one of %s' % JOB_ORDERS)
+        if n is None:
+            self.n = len(in_degree_seq)
+        else:
+            self.n = n
+
+        self.kernel = kernel
+        self.rng = get_rng(rnd_seed)
+        self.output = output
+        self.in_degrees = in_degree_seq
+        self.out_degrees = out_degree_seq
+
+        # Preprocess ranking
+        self.raw_ranking = ranking_seq
+        ranking = array(ranking_seq, dtype=float)
+        ranking -= ranking.min()
+        ranking /= ranking.max()
+        ranking = 1.0 - ranking # 1.0 is now the highest, 0. the lowest
+        self.ranking = ranking
+
+        # Prep stubs
+        self.in_stubs = build_stubs(in_degree_seq, self.n)
+        self.out_stubs = build_stubs(out_degree_seq, self.n)
+        self.total_in = len(self.in_stubs)
+        self.total_out = len(self.out_stubs)
+
+        self.total_edges = min(self.total_in, self.total_out)
+
+    def in_counts(self):
+        """ Jobs per institution (a fresh array) """
+        return bincount(self.in_stubs, minlength=len(self.ranking))
+
+    def out_counts(self):
+        """ Candidates per institution (a fresh array) """
+        return bincount(self.out_stubs, minlength=len(self.ranking))
+
+    def jobs(self, kernel):
+        """ Institutions of the jobs to fill, in the order filled """
+        if kernel.job_order == 'ranked':
+            order = rank_order(self.ranking)
+            jobs = repeat(order, self.in_counts()[order])
+        elif kernel.job_order == 'shuffled':
+            jobs = self.in_stubs.copy()
+            self.rng.shuffle(jobs)
+        else:
+            weights = kernel.job_weights(self.ranking)
+            jobs = self.in_stubs[weighted_order(weights[self.in_stubs],
+                                                self.rng)]
+        return jobs[:self.total_edges]
+
+    def generate_adjacency_matrix(self, kernel=None):
+        """ Generate an adjacency matrix (with the model's kernel, unless
+            another is given)
+        """
+        if kernel is None:
+            kernel = self.kernel
+        destinations = self.jobs(kernel)  # hired by
+        sources = kernel.hire(self, destinations)  # hired from
+        return adjacency(sources, destinations, self.n, self.output)
+
+    def yield_edges(self):
+        """ Generates a random network, then yields (generator) the
+            edges one by one as a tuple:
+                (row_index, column_index, edge_weight)
+        """
+        A = self.generate_adjacency_matrix()
+        for r, c, w in zip(*as_edges(A)):
+            yield(r, c, w)
@@ -8,9 +8,11 @@ __email__ = "samfway@gmail.com"
 __status__ = "Development"
 
 
-from numpy import array, exp, mean, delete, inf, dot
-from numpy.random import randn, choice
+from numpy import array, exp, mean, delete, inf, dot, arange, zeros
 from university_network.misc.scoring import sse_rank_diff
+from university_network.misc.rng import get_rng
+from university_network.models.rank_scaling import rank_scale, \
+    scaled_ranks_by_id
 
 
 def sigmoid(x):
@@ -19,14 +21,16 @@ def sigmoid(x):
 
 class LogisticModelSimulator:
     def __init__(self, cand_pools, job_pools, school_info, ranking='pi',
-                 features=[None, 'pi'], weights=[0,1.0], iters=10, reg=0.):
+                 features=[None, 'pi'], weights=[0,1.0], iters=10, reg=0.,
+                 rnd_seed=None):
         self.cand_pools = cand_pools
         self.job_pools = job_pools
         self.school_info = school_info
         self.ranking = ranking
         self.features = features
         self.weights = weights
-        self.model = LogisticModel()
+        self.rng = get_rng(rnd_seed)
+        self.model = LogisticModel(self.rng)
         self.iterations = iters 
         self.num_pools = len(cand_pools)
         self.regularization = reg
@@ -62,8 +66,8 @@ class LogisticModelSimulator:
 
 class LogisticModel:
 
-    def __init__(self):
-        pass
+    def __init__(self, rnd_seed=None):
+        self.rng = get_rng(rnd_seed)
 
     def simulate_hiring(self, candidates, positions, school_info, ranking='pi',
                         features=[None, 'pi'], weights=[0, 1.0]):
@@ -91,26 +95,17 @@ class LogisticModel:
             raise ValueError('Feature/weight vectors must be of equal length.')
         if features[0] is not None:
             raise ValueError('First feature must be None (offset term)')
-        weights = array(weights)
-
-        rankings = array([school_info[s][ranking] for s in school_info])
-        rankings.sort()
-        worst_ranking = rankings[-1]
-        best_ranking = rankings[0]
-        delta = mean(rankings[1:] - rankings[0:-1])
-        scale = lambda x: 1. - (x-best_ranking)/(worst_ranking-best_ranking+delta)
-        # Delta ensures all schools have a positive rank
-        
-        jobs = positions[:]
+
+        scale, worst_ranking = rank_scale(
+            array([school_info[s][ranking] for s in school_info]))
+
         job_ranks = []
-        for j in jobs:
+        for j in positions:
             if j in school_info:
                 job_ranks.append(scale(school_info[j][ranking]))
             else:
                 job_ranks.append(scale(worst_ranking))
-        job_ranks = array(job_ranks)
 
-        candidate_pool = candidates[:]
         candidate_ranks = []
         for f in candidates:
             place, year = f.phd()
@@ -118,30 +113,68 @@ class LogisticModel:
                 candidate_ranks.append(scale(school_info[place][ranking]))
             else:
                 candidate_ranks.append(scale(worst_ranking))
-        candidate_ranks = array(candidate_ranks)
 
-        hires = [] 
+        cand_order, job_order = self._hire(array(candidate_ranks),
+                                           array(job_ranks), weights)
+        return [(candidates[c], positions[j]) for c, j in zip(cand_order, job_order)]
+
+    def simulate_hiring_ids(self, candidate_ids, position_ids, ranks,
+                            features=[None, 'pi'], weights=[0, 1.0]):
+        """ Integer-id version of simulate_hiring().
+
+            Inputs:
+            - 'candidate_ids' is an array of the candidates' PhD institution
+              ids (e.g. CareerEvents.place['phd'] for the pool).
+            - 'position_ids' is an array of the hiring institutions' ids.
+            - 'ranks' is an array of raw rankings indexed by institution id
+              (e.g. InstitutionIndex.rank('pi')); NaN marks unranked schools.
+
+            Returns two integer arrays (candidate_index, position_id):
+            the i-th hire placed candidate_ids[candidate_index[i]] at
+            position_id[i].  Unranked/unknown institutions are tied for
+            last place, as in simulate_hiring().
+        """
+        if len(features) != len(weights):
+            raise ValueError('Feature/weight vectors must be of equal length.')
+        if features[0] is not None:
+            raise ValueError('First feature must be None (offset term)')
 
-        while jobs:
+        position_ids = array(position_ids)
+        candidate_ranks, job_ranks = scaled_ranks_by_id(
+            ranks, [candidate_ids, position_ids])
+        cand_order, job_order = self._hire(candidate_ranks, job_ranks,
+                                           weights)
+        return cand_order, position_ids[job_order]
+
+    def _hire(self, candidate_ranks, job_ranks, weights):
+        """ Hiring loop over scaled rank arrays.  Returns the candidate and
+            job indices (into the input arrays) of each hire, in order.
+        """
+        w0, w1 = weights[0], weights[1]
+        candidates = arange(len(candidate_ranks))
+        jobs = arange(len(job_ranks))
+        num_hires = len(jobs)
+        cand_order = zeros(num_hires, dtype=int)
+        job_order = zeros(num_hires, dtype=int)
+
+        for i in xrange(num_hires):
             # Select job
-            job_p = job_ranks.copy()
-            job_p /= job_p.sum()
-            job_ind = choice(xrange(len(job_p)), p=job_p)
+            job_p = job_ranks / job_ranks.sum()
+            job_ind = self.rng.choice(len(job_p), p=job_p)
             job_rank = job_ranks[job_ind]
 
             # Select candidate
-            cand_p = array([sigmoid(sum(weights * array([1, candidate_rank-job_rank])))
-                            for candidate_rank in candidate_ranks])
+            cand_p = sigmoid(w0 + w1 * (candidate_ranks - job_rank))
             cand_p /= cand_p.sum()
-            cand_ind = choice(xrange(len(cand_p)), p=cand_p)
-
-            # Save then remove from lists
-            hires.append((candidate_pool[cand_ind], jobs[job_ind]))
+            cand_ind = self.rng.choice(len(cand_p), p=cand_p)
 
-            del candidate_pool[cand_ind]
-            del jobs[job_ind]
+            # Save then remove from arrays
+            cand_order[i] = candidates[cand_ind]
+            job_order[i] = jobs[job_ind]
+            candidates = delete(candidates, cand_ind)
+            jobs = delete(jobs, job_ind)
             candidate_ranks = delete(candidate_ranks, cand_ind)
             job_ranks = delete(job_ranks, job_ind)
 
-        return hires
+        return cand_order, job_order
 
@@ -9,21 +9,23 @@ __status__ = "Development"
 
 
 from numpy import array, exp, mean, delete, inf, dot
-from numpy.random import randn, choice
 from university_network.models.logistic_model import LogisticModel
 from university_network.misc.scoring import sse_rank_diff
+from university_network.misc.rng import get_rng
 
 
 class LogisticModelSimulator:
     def __init__(self, cand_pools, job_pools, school_info, model=LogisticModel, ranking='pi',
-                 features=[None, 'pi'], weights=[0,1.0], iters=10, reg=0.):
+                 features=[None, 'pi'], weights=[0,1.0], iters=10, reg=0.,
+                 rnd_seed=None):
         self.cand_pools = cand_pools
         self.job_pools = job_pools
         self.school_info = school_info
         self.ranking = ranking
         self.features = features
         self.weights = weights
-        self.model = model()
+        self.rng = get_rng(rnd_seed)
+        self.model = model(self.rng)
         self.iterations = iters 
         self.num_pools = len(cand_pools)
         self.regularization = reg
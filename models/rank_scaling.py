@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+
+from numpy import array, mean, isfinite, where, sort, zeros
+
+
+def rank_scale(rankings):
+    """ Map raw rankings (lower is better) into (0, 1], best school = 1.
+        Returns the scaling function and the worst ranking.
+        Delta ensures all schools have a positive rank.
+    """
+    rankings = sort(rankings)
+    worst_ranking = rankings[-1]
+    best_ranking = rankings[0]
+    delta = mean(rankings[1:] - rankings[0:-1])
+    scale = lambda x: 1. - (x-best_ranking)/(worst_ranking-best_ranking+delta)
+    return scale, worst_ranking
+
+
+def scaled_ranks_by_id(ranks, ids):
+    """ Scaled ranks (see rank_scale()) of institution ids.
+
+        Inputs:
+        - 'ranks' is an array of raw rankings indexed by institution id
+          (e.g. InstitutionIndex.rank('pi')); NaN marks unranked schools.
+        - 'ids' is a sequence (or a list of sequences) of ids.
+
+        Unranked institutions, and negative ids (MISSING, NOT_FOUND), are
+        tied for last place.  Returns one array per sequence of ids.
+    """
+    ranks = array(ranks, dtype=float)
+    known = isfinite(ranks)
+    scale, worst_ranking = rank_scale(ranks[known])
+    # Last slot: missing and unknown ids (MISSING, NOT_FOUND < 0)
+    scaled = zeros(len(ranks) + 1)
+    scaled[:-1] = scale(where(known, ranks, worst_ranking))
+    scaled[-1] = scale(worst_ranking)
+    return [scaled[where(array(x) < 0, len(ranks), x)] for x in ids]
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Order-statistics structures for sampling without replacement.
+
+The ranking models repeatedly pick one of the remaining stubs and remove
+it.  Keeping the stubs in a Python list makes each pick O(E) (building
+candidate lists, `del` from the middle); a FenwickTree over the stubs'
+weights (1 for present, 0 for removed, or arbitrary non-negative
+weights) makes prefix counts, "find the k-th remaining stub" and
+removal O(log E) each:
+
+    >>> tree = FenwickTree(np.ones(len(stubs)))
+    >>> k = tree.prefix_sum(p)       # remaining stubs among the first p
+    >>> i = tree.find(rng.choice(k)) # a uniform one of them
+    >>> tree.add(i, -1)              # remove it
+
+For weighted draws whose weights all change at once (a new job in the
+sigmoid models), SumTree rebuilds from a weight vector with a few numpy
+calls and draws/updates in O(log n).  kernel_hires() runs a whole hiring
+sequence on one: candidates are grouped by institution, so each draw
+picks an institution with probability proportional to (remaining
+candidates) x kernel(job), and the tree is only rebuilt when the job's
+kernel changes.
+
+All stubs of one institution are interchangeable, so the ranking models
+track remaining capacity per institution rather than per stub: memory
+is O(n) and each hire O(log n), while the draws have exactly the
+distribution of picking among the stubs.
+"""
+
+import numpy as np
+
+
+def weighted_order(weights, rng):
+    """ Random order of positions 0..len(weights)-1 in which each next
+        position is drawn with probability proportional to its weight
+        among those left (successive weighted sampling without
+        replacement).  Uses Efraimidis-Spirakis keys: sorting by
+        Exp(1) / weight gives exactly that order in one vectorized draw
+        and sort.  Zero-weight positions come last, in uniform order.
+    """
+    weights = np.asarray(weights, dtype=float)
+    with np.errstate(divide='ignore'):
+        keys = rng.standard_exponential(len(weights)) / weights
+    order = np.argsort(keys)
+    zero = int((weights <= 0).sum())
+    if zero:
+        order[-zero:] = rng.permutation(order[-zero:])
+    return order
+
+
+def rank_order(ranking):
+    """ Institutions best-ranked first, ties by id, highest first (the
+        order of sorting (rank, id) tuples in reverse)
+    """
+    ranking = np.asarray(ranking)
+    return np.lexsort((np.arange(len(ranking)), ranking))[::-1]
+
+
+class FenwickTree:
+    """ Binary indexed tree over a fixed-length array of non-negative
+        weights (ints or floats).
+
+        Inputs:
+          + weights - initial weight of each position
+    """
+    def __init__(self, weights):
+        weights = np.asarray(weights)
+        self.n = len(weights)
+        # Linear-time build: tree[i] = sum of weights[i - lowbit(i), i)
+        tree = np.zeros(self.n + 1, dtype=weights.dtype)
+        tree[1:] = weights
+        for i in xrange(1, self.n + 1):
+            j = i + (i & -i)
+            if j <= self.n:
+                tree[j] += tree[i]
+        self.tree = tree.tolist()  # Python scalars are faster to update
+        self.weights = weights.tolist()
+        self.top = 1 << (self.n.bit_length() - 1) if self.n else 0
+
+    def __len__(self):
+        return self.n
+
+    def total(self):
+        return self.prefix_sum(self.n)
+
+    def add(self, i, delta):
+        """ weights[i] += delta """
+        self.weights[i] += delta
+        tree = self.tree
+        i += 1
+        while i <= self.n:
+            tree[i] += delta
+            i += i & -i
+
+    def set(self, i, weight):
+        self.add(i, weight - self.weights[i])
+
+    def prefix_sum(self, i):
+        """ Sum of weights[0:i] """
+        tree = self.tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, value):
+        """ Position i with prefix_sum(i) <= value < prefix_sum(i + 1),
+            i.e. the stub that a draw `value` from [0, total()) lands on;
+            with unit weights, the value-th (0-based) remaining stub.
+        """
+        tree = self.tree
+        pos = 0
+        step = self.top
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and tree[nxt] <= value:
+                pos = nxt
+                value -= tree[nxt]
+            step >>= 1
+        # Float round-off may run past the last positive weight
+        while pos > 0 and (pos >= self.n or self.weights[pos] <= 0):
+            pos -= 1
+        return pos
+
+
+class SumTree:
+    """ Complete binary tree of partial sums over n non-negative float
+        weights, for weighted sampling with updates.
+
+        Inputs:
+          + weights - initial weights
+    """
+    def __init__(self, weights):
+        self.n = len(weights)
+        self.size = 1
+        while self.size < max(self.n, 1):
+            self.size <<= 1
+        self.reset(weights)
+
+    def reset(self, weights):
+        """ Replace every weight (O(n), vectorized per tree level) """
+        size = self.size
+        tree = np.zeros(2 * size)
+        tree[size:size + self.n] = weights
+        level = size
+        while level > 1:
+            tree[level // 2:level] = tree[level:2 * level:2] + \
+                                     tree[level + 1:2 * level:2]
+            level //= 2
+        self.tree = tree.tolist()  # Python scalars are faster to update
+
+    def total(self):
+        return self.tree[1]
+
+    def weight(self, i):
+        return self.tree[self.size + i]
+
+    def update(self, i, weight):
+        """ weights[i] = weight """
+        tree = self.tree
+        i += self.size
+        tree[i] = weight
+        i >>= 1
+        while i:
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            i >>= 1
+
+    def find(self, value):
+        """ Position whose cumulative-weight interval holds `value`, a
+            draw from [0, total())
+        """
+        tree = self.tree
+        i = 1
+        while i < self.size:
+            left = tree[2 * i]
+            if value < left or tree[2 * i + 1] <= 0:
+                i = 2 * i
+            else:
+                value -= left
+                i = 2 * i + 1
+        return i - self.size
+
+    def sample(self, rng):
+        return self.find(rng.uniform() * self.tree[1])
+
+
+def _draw_index(cumulative, rng):
+    """ Index i with cumulative[i-1] <= u < cumulative[i], u uniform in
+        [0, cumulative[-1])
+    """
+    i = int(np.searchsorted(cumulative, rng.uniform() * cumulative[-1],
+                            side='right'))
+    # Round-off may put u at (or past) the total: take the last index
+    # with positive weight instead
+    i = min(i, len(cumulative) - 1)
+    while i > 0 and cumulative[i] <= cumulative[i - 1]:
+        i -= 1
+    return i
+
+
+def draw_and_remove(tree, counts, weights, rng):
+    """ Draw an institution u from a SumTree over counts * weights, then
+        remove one of its members (counts[u] -= 1).  If every remaining
+        member has zero weight, u is drawn in proportion to counts (the
+        limit of vanishingly small weights).
+    """
+    if tree.total() > 0:
+        u = tree.sample(rng)
+    else:
+        u = _draw_index(np.cumsum(counts), rng)
+    counts[u] -= 1
+    tree.update(u, float(weights[u] * counts[u]))
+    return u
+
+
+def kernel_hires(jobs, counts, kernel, rng, key=None):
+    """ Fill jobs one at a time, each by a remaining candidate drawn with
+        probability proportional to kernel(job)[candidate institution].
+
+        Inputs:
+          + jobs - iterable of job institutions, in the order filled
+                   (may be a generator that draws them as it goes)
+          + counts - remaining candidates per institution (updated in
+                     place)
+          + kernel - function(v) -> weights over institutions for a job
+                     at institution v
+          + rng - random generator
+          + key - (optional) function(v) -> hashable; consecutive jobs
+                  with equal keys share a kernel (default: v itself)
+        Returns the list of candidate institutions, one per job.
+
+        The first draw with a new kernel is a single cumulative sum; the
+        sum tree is only built for the second, so jobs whose kernel
+        changes at every hire cost O(n) in numpy rather than a rebuild.
+    """
+    tree = None
+    current = None
+    weights = row = None
+    hired = []
+    for v in jobs:
+        k = v if key is None else key(v)
+        if row is None or k != current:
+            weights = np.asarray(kernel(v), dtype=float)
+            row = weights * counts
+            current = k
+            cumulative = np.cumsum(row)
+            if cumulative[-1] <= 0:
+                cumulative = np.cumsum(counts)
+            u = _draw_index(cumulative, rng)
+            counts[u] -= 1
+            row[u] = weights[u] * counts[u]
+            tree = None
+        else:
+            if tree is None:
+                tree = SumTree(row)
+            u = draw_and_remove(tree, counts, weights, rng)
+        hired.append(u)
+    return hired
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Significance of an observed placement network against a null model.
+
+Draws N networks from a model on a process pool and compares them with
+the observed network: empirical p-values and z-scores for every edge
+weight, for per-institution in-degree, out-degree and self-loop counts,
+and for any user-supplied scalar metrics.
+
+    >>> from functools import partial
+    >>> factory = partial(ConfigurationModel, in_degrees, out_degrees)
+    >>> result = null_model_test(observed, factory, 10000, rows='in',
+    ...                          statistics={'self_loops': self_loops},
+    ...                          workers=8, seed=1, checkpoint='cm.pkl')
+    >>> result.edge_pvalues(), result.node_zscores('self')
+    >>> result.stat_pvalue('self_loops', tail='upper')
+
+The factory is called as factory(rnd_seed=seed) once per chunk of
+samples, in the worker, so it (and every statistic function) must be
+picklable: a model class, a functools.partial of one, or a module-level
+function.  Each chunk gets its own seed from misc.rng.spawn_seeds(),
+and chunks are merged in index order, so results depend on `seed` and
+`chunk_size` but not on the number of workers.
+
+With `checkpoint`, the merged results are pickled after every finished
+chunk; calling null_model_test() again with the same arguments resumes
+from the file instead of starting over.  The checkpoint records the
+settings, the seed and a digest of the observed network, and a run that
+differs in any of them raises ValueError rather than mixing results
+(the factory itself can't be compared: use a new file for a new model).
+
+Empirical p-values count samples at least as extreme as the observed
+value, with the usual +1 correction so they are never zero:
+upper = (#{x >= obs} + 1) / (N + 1), lower likewise with <=, and
+two-sided = min(1, 2 * min(upper, lower)).
+"""
+
+import os
+import cPickle
+import hashlib
+import numpy as np
+from multiprocessing import Pool, cpu_count
+from scipy.sparse import csr_matrix
+from university_network.misc.rng import spawn_seeds
+from university_network.models.ensemble_stats import EnsembleAccumulator, \
+    node_statistics, NODE_STATS
+
+CHECKPOINT_VERSION = 2
+TAILS = ['upper', 'lower', 'two-sided']
+
+
+def network_matrix(G, nodes=None, rows='out'):
+    """ Sparse weighted adjacency matrix of a networkx DiGraph (e.g. from
+        scripts/first_job_network.load), with nodes in the order given
+        (default: sorted).  rows='out' puts sources on the rows, as the
+        ranking models do; rows='in' matches ConfigurationModel.
+    """
+    if nodes is None:
+        nodes = sorted(G.nodes())
+    index = dict((v, i) for i, v in enumerate(nodes))
+    sources, destinations, weights = [], [], []
+    for s, d, data in G.edges(data=True):
+        sources.append(index[s])
+        destinations.append(index[d])
+        weights.append(data.get('weight', 1.))
+    r, c = (sources, destinations) if rows == 'out' else \
+           (destinations, sources)
+    n = len(nodes)
+    return csr_matrix((weights, (r, c)), shape=(n, n))
+
+
+class Exceedances:
+    """ Counts of samples at least as large (ge) / as small (le) as the
+        observed values of an array or scalar.
+    """
+    def __init__(self, observed):
+        self.observed = np.asarray(observed, dtype=float)
+        self.ge = np.zeros(self.observed.shape, dtype=np.int64)
+        self.le = np.zeros(self.observed.shape, dtype=np.int64)
+
+    def add(self, x):
+        self.ge += x >= self.observed
+        self.le += x <= self.observed
+
+    def merge(self, other):
+        self.ge += other.ge
+        self.le += other.le
+
+    def pvalues(self, count, tail='two-sided'):
+        upper = (self.ge + 1.) / (count + 1.)
+        lower = (self.le + 1.) / (count + 1.)
+        if tail == 'upper':
+            return upper
+        if tail == 'lower':
+            return lower
+        if tail == 'two-sided':
+            return np.minimum(1., 2. * np.minimum(upper, lower))
+        raise ValueError('tail must be one of %s' % TAILS)
+
+
+class SignificanceResult:
+    """ Merged null-model statistics of one or more chunks of samples.
+
+        Inputs:
+          + observed - observed adjacency matrix (sparse or dense)
+          + rows - 'out' or 'in' (layout of observed and of the model)
+          + statistics - dict name -> function(A) -> float
+          + sparse, sketch_size, rnd_seed - passed to the
+                                            EnsembleAccumulator
+
+        Attributes:
+          + samples - number of null networks seen
+          + ensemble - EnsembleAccumulator (means, variances, quantiles)
+    """
+    def __init__(self, observed, rows='out', statistics=None, sparse=False,
+                 sketch_size=1000, rnd_seed=None):
+        self.statistics = dict(statistics or {})
+        self.ensemble = EnsembleAccumulator(observed.shape[0], rows, sparse,
+                                            self.statistics, sketch_size,
+                                            rnd_seed)
+        self.observed = self.ensemble._as_matrix(observed)
+        self.edges = Exceedances(self.observed.toarray())
+        self.observed_nodes = node_statistics(self.observed, rows)
+        self.nodes = dict((s, Exceedances(self.observed_nodes[s]))
+                          for s in NODE_STATS)
+        self.observed_stats = dict((name, func(self.observed))
+                                   for name, func in
+                                   self.statistics.iteritems())
+        self.stats = dict((name, Exceedances(value))
+                          for name, value in self.observed_stats.iteritems())
+
+    @property
+    def samples(self):
+        return self.ensemble.count
+
+    def add(self, A):
+        """ Add one null network """
+        A = self.ensemble._as_matrix(A)
+        dense = A.toarray()
+        nodes, values = measured = self.ensemble.measure(A)
+        self.ensemble.add(A, measured, dense)
+        self.edges.add(dense)
+        for s, x in nodes.iteritems():
+            self.nodes[s].add(x)
+        for name, value in values.iteritems():
+            self.stats[name].add(value)
+
+    def merge(self, other):
+        """ Fold in the results of another chunk; returns self """
+        self.ensemble.merge(other.ensemble)
+        self.edges.merge(other.edges)
+        for s in NODE_STATS:
+            self.nodes[s].merge(other.nodes[s])
+        for name in self.stats:
+            self.stats[name].merge(other.stats[name])
+        return self
+
+    def edge_pvalues(self, tail='two-sided'):
+        """ n x n empirical p-values of the observed edge weights """
+        return self.edges.pvalues(self.samples, tail)
+
+    def edge_zscores(self):
+        return self.ensemble.zscores(self.observed)
+
+    def node_pvalues(self, which, tail='two-sided'):
+        """ Per-institution p-values of 'in', 'out' or 'self' counts """
+        return self.nodes[which].pvalues(self.samples, tail)
+
+    def node_zscores(self, which):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.observed_nodes[which] -
+                    self.ensemble.node_mean(which)) / \
+                   np.sqrt(self.ensemble.node_variance(which))
+
+    def stat_pvalue(self, name, tail='two-sided'):
+        return float(self.stats[name].pvalues(self.samples, tail))
+
+    def stat_zscore(self, name):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.observed_stats[name] -
+                    self.ensemble.stat_mean(name)) / \
+                   np.sqrt(self.ensemble.stat_variance(name))
+
+
+def _run_chunk(task):
+    """ Pool worker: draw one chunk of null networks """
+    index, seed, count, factory, args = task
+    model_seed, sketch_seed = spawn_seeds(seed, 2)
+    result = SignificanceResult(*args, rnd_seed=sketch_seed)
+    model = factory(rnd_seed=model_seed)
+    for i in xrange(count):
+        result.add(model.generate_adjacency_matrix())
+    return index, result
+
+
+def _fingerprint(A):
+    """ Digest of a matrix's shape and nonzero entries """
+    A = csr_matrix(A, dtype=float, copy=True)
+    A.sum_duplicates()
+    A.eliminate_zeros()
+    A.sort_indices()
+    digest = hashlib.sha1(repr(A.shape))
+    for values in (A.data, A.indices.astype(np.int64),
+                   A.indptr.astype(np.int64)):
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def _seed_key(seed):
+    """ Comparable description of a root seed (see misc.rng) """
+    if seed is None or isinstance(seed, (int, long, np.integer)):
+        return seed if seed is None else int(seed)
+    if hasattr(seed, 'spawn_key'):  # SeedSequence
+        return (seed.entropy, tuple(seed.spawn_key))
+    try:
+        return tuple(int(x) for x in seed)
+    except TypeError:  # A generator; its state can't be compared
+        return type(seed).__name__
+
+
+def _load_checkpoint(path, settings):
+    with open(path, 'rb') as fp:
+        state = cPickle.load(fp)
+    if state['version'] != CHECKPOINT_VERSION or \
+       state['settings'] != settings:
+        raise ValueError('Checkpoint %s was written for a different run' %
+                         path)
+    return state
+
+
+def _save_checkpoint(path, state):
+    """ Write atomically, so an interrupted save keeps the old file """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fp:
+        cPickle.dump(state, fp, cPickle.HIGHEST_PROTOCOL)
+    os.rename(tmp, path)
+
+
+def null_model_test(observed, factory, samples, rows='out', statistics=None,
+                    workers=None, chunk_size=100, seed=None, sparse=False,
+                    sketch_size=1000, checkpoint=None, progress=None):
+    """ Compare an observed network with `samples` null networks.
+
+        Inputs:
+          + observed - observed adjacency matrix, in the model's layout
+          + factory - callable; factory(rnd_seed=seed) returns a model
+                      with generate_adjacency_matrix()
+          + samples - number of null networks (N)
+          + rows - 'out' if rows are sources (ranking models), 'in' if
+                   rows are destinations (ConfigurationModel)
+          + statistics - dict name -> function(A) -> float
+          + workers - number of processes (default: one per CPU)
+          + chunk_size - networks drawn per task (one seed per chunk)
+          + seed - root seed (see misc.rng); None draws fresh entropy,
+                   which is saved in the checkpoint
+          + sparse, sketch_size - see EnsembleAccumulator
+          + checkpoint - (optional) path of a resumable checkpoint file
+          + progress - (optional) function(done, total) called after
+                       every finished chunk
+
+        Returns a SignificanceResult.
+    """
+    if workers is None:
+        workers = cpu_count()
+    num_chunks = (samples + chunk_size - 1) // chunk_size
+    settings = (samples, chunk_size, rows, sorted(statistics or {}), sparse,
+                sketch_size, _seed_key(seed), _fingerprint(observed))
+
+    state = None
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state = _load_checkpoint(checkpoint, settings)
+    args = (observed, rows, statistics, sparse, sketch_size)
+    if state is None:
+        seeds = spawn_seeds(seed, num_chunks + 1)
+        state = {'version': CHECKPOINT_VERSION, 'settings': settings,
+                 'seeds': seeds[:num_chunks], 'done': set(),
+                 'result': SignificanceResult(*args, rnd_seed=seeds[-1])}
+    result = state['result']
+
+    tasks = [(i, state['seeds'][i],
+              min(chunk_size, samples - i * chunk_size), factory, args)
+             for i in xrange(num_chunks) if i not in state['done']]
+
+    def finish(index, part):
+        result.merge(part)
+        state['done'].add(index)
+        if checkpoint is not None:
+            _save_checkpoint(checkpoint, state)
+        if progress is not None:
+            progress(result.samples, samples)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            finish(*_run_chunk(task))
+    else:
+        pool = Pool(workers)
+        try:
+            # In chunk order, so the merges (float sums, reservoir draws)
+            # don't depend on scheduling
+            for index, part in pool.imap(_run_chunk, tasks):
+                finish(index, part)
+        finally:
+            pool.terminate()
+            pool.join()
+    return result
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Expanded degree sequences ("stubs") shared by the network models.
+
+Node v appears k_v times in the stub array of a degree sequence k, e.g.
+[2, 0, 1] -> [0, 0, 2].  build_stubs() does this with a single repeat
+into the smallest integer type that can hold every node index, and
+keeps recently built arrays in a small cache, so constructing many
+models with the same degree sequences (as in parameter sweeps) does
+not redo the work.
+
+Cached arrays are read-only and shared between models; copy them before
+modifying them in place (as ConfigurationModel does when shuffling).
+"""
+
+import numpy as np
+from collections import OrderedDict
+
+STUB_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+STUB_CACHE_SIZE = 32  # Degree sequences kept in the cache
+
+_stub_cache = OrderedDict()
+
+
+def stub_dtype(n):
+    """ Smallest signed integer type able to index n nodes """
+    for dtype in STUB_DTYPES:
+        if n - 1 <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError('Too many nodes: %d' % n)
+
+
+def build_stubs(degree_seq, n=None):
+    """ Expanded (read-only) stub array of a degree sequence.
+        Inputs:
+          + degree_seq - number of stubs of each node
+          + n - number of nodes (at least len(degree_seq)); only used to
+                pick the dtype
+    """
+    degrees = np.asarray(degree_seq)
+    if len(degrees) and degrees.min() < 0:
+        raise ValueError('Degrees must be non-negative!')
+    if n is None or n < len(degrees):
+        n = len(degrees)
+    dtype = stub_dtype(max(n, 1))
+    degrees = degrees.astype(np.int64)
+
+    key = (dtype, degrees.tostring())
+    stubs = _stub_cache.get(key)
+    if stubs is None:
+        stubs = np.repeat(np.arange(len(degrees), dtype=dtype), degrees)
+        stubs.flags.writeable = False
+        _stub_cache[key] = stubs
+        while len(_stub_cache) > STUB_CACHE_SIZE:
+            _stub_cache.popitem(last=False)
+    else:
+        # Mark as most recently used
+        del _stub_cache[key]
+        _stub_cache[key] = stubs
+    return stubs
+
+
+def clear_stub_cache():
+    """ Drop all cached stub arrays """
+    _stub_cache.clear()
@@ -10,6 +10,39 @@ __status__ = "Development"
 """ Unit tests for faculty network parsing. """
 
 from university_network.models.configuration_models import ConfigurationModel
+from university_network.models.pick_below import PickBelowModel
+from university_network.models.pick_below_special import PickBelowSpecialModel
+from university_network.models.best_remaining import BestRemainingModel
+from university_network.models.stubs import build_stubs
+from university_network.models.edges import edge_arrays, write_edge_list, \
+    write_gml
+from university_network.models.ensemble_stats import EnsembleAccumulator, \
+    self_loops
+from university_network.models.edge_swap import EdgeSwapModel
+from university_network.models.sampling import FenwickTree, SumTree, \
+    kernel_hires, weighted_order
+from university_network.models.sigmoid_model import PickSigmoidModel
+from university_network.models.pick_sigmoid_self import \
+    PickSigmoidModel as PickSigmoidSelfModel
+from university_network.models.sig_twop import \
+    PickSigmoidModel as PickSigmoidTwoParamModel
+from university_network.models.rank_scaling import scaled_ranks_by_id
+from university_network.models.significance import null_model_test, \
+    SignificanceResult
+from university_network.models.hiring import HiringModel, HiringKernel, \
+    SigmoidKernel
+from university_network.models.ensemble_store import EnsembleStore, \
+    write_ensemble
+from university_network.misc.rng import get_rng, spawn_seeds, SeedSequence
+from scipy.sparse import csc_matrix
+from scipy.stats import chisquare
+from StringIO import StringIO
+from functools import partial
+import itertools
+import numpy as np
+import os
+import shutil
+import tempfile
 from unittest import TestCase, main
 
 
@@ -23,5 +56,495 @@ class cm_tests(TestCase):
         A = cm.generate_adjacency_matrix()
         self.assertEqual(A.sum(), 4.0)  # 4 incoming edges, seven out
 
+    def test_ensemble(self):
+        cm = ConfigurationModel([3, 1, 0], [2, 5, 1])
+        ensemble = cm.generate_ensemble(50, batch_size=8)
+        self.assertEqual(ensemble.shape, (50, 9))
+        for s in xrange(50):
+            A = ensemble[s].toarray().reshape(3, 3)
+            self.assertEqual(list(A.sum(axis=1)), [3, 1, 0])  # all in-stubs
+            self.assertTrue((A.sum(axis=0) <= [2, 5, 1]).all())
+
+        networks = list(cm.generate_ensemble(5, as_iterator=True))
+        self.assertEqual(len(networks), 5)
+        rows, cols = networks[0]
+        self.assertEqual(sorted(rows), [0, 0, 0, 1])
+
+    def test_expected_adjacency(self):
+        cm = ConfigurationModel([3, 1, 2], [2, 2, 2], rnd_seed=2)
+        expected = cm.expected_adjacency()
+        self.assertTrue(np.allclose(expected, np.outer([3, 1, 2], [2, 2, 2]) / 6.))
+        u, v = cm.expected_adjacency(factored=True)
+        self.assertTrue(np.allclose(np.outer(u, v), expected))
+
+        samples = cm.generate_ensemble(20000).toarray().reshape(-1, 3, 3)
+        self.assertTrue(np.allclose(samples.mean(axis=0), expected, atol=0.03))
+        self.assertTrue(np.allclose(samples.var(axis=0), cm.variance(),
+                                    atol=0.03))
+        observed = np.array([[2., 1., 0.], [0., 1., 0.], [0., 0., 2.]])
+        self.assertTrue(np.allclose(cm.zscores(observed),
+                                    (observed - expected) /
+                                    np.sqrt(cm.variance())))
+
+    def test_rng(self):
+        a = ConfigurationModel([3, 1, 2], [2, 2, 2], rnd_seed=7)
+        b = ConfigurationModel([3, 1, 2], [2, 2, 2], rnd_seed=7)
+        # Interleaved draws from another model don't disturb the stream
+        A = a.generate_adjacency_matrix().toarray()
+        ConfigurationModel([3, 1, 2], [2, 2, 2]).generate_adjacency_matrix()
+        self.assertTrue((A == b.generate_adjacency_matrix().toarray()).all())
+
+        rng = get_rng(1)
+        self.assertTrue(PickBelowModel([3, 1], [2, 2], [1., 2.],
+                                       rnd_seed=rng).rng is rng)
+
+        seeds = spawn_seeds(5, 3)
+        self.assertEqual(len(seeds), 3)
+        draws = [get_rng(s).uniform() for s in seeds]
+        self.assertEqual(len(set(draws)), 3)
+        self.assertEqual(get_rng(spawn_seeds(5, 2)[1]).uniform(), draws[1])
+        # Large integer seeds, and repeated spawns from one root
+        big = [get_rng(s).uniform() for s in spawn_seeds(2 ** 40 + 3, 2)]
+        self.assertEqual(big, [get_rng(s).uniform()
+                               for s in spawn_seeds(2 ** 40 + 3, 2)])
+        self.assertNotEqual(big[0], big[1])
+        if SeedSequence is not None:
+            root = SeedSequence(7)
+            first = [get_rng(s).uniform() for s in spawn_seeds(root, 2)]
+            self.assertEqual(first, [get_rng(s).uniform()
+                                     for s in spawn_seeds(root, 2)])
+
+    def test_edges(self):
+        # Unsummed duplicate entry at (1, 0)
+        A = csc_matrix(([1., 2., 1., 0.], [1, 1, 2, 0], [0, 2, 4]),
+                       shape=(3, 2))
+        rows, cols, weights = edge_arrays(A)
+        self.assertEqual(zip(rows, cols, weights), [(1, 0, 3.), (2, 1, 1.)])
+
+        fp = StringIO()
+        self.assertEqual(write_edge_list(fp, A, names=['a', 'b', 'c']), 2)
+        self.assertEqual(fp.getvalue(), 'b\ta\t3\nc\tb\t1\n')
+        fp = StringIO()
+        write_edge_list(fp, ([0, 0, 1], [1, 1, 0]), weights=False)
+        self.assertEqual(fp.getvalue(), '1\t0\n0\t1\n')
+
+        fp = StringIO()
+        write_gml(fp, A)
+        self.assertEqual(fp.getvalue().count('node ['), 3)
+        self.assertTrue('source 1\n    target 0\n    weight 3\n' in fp.getvalue())
+
+        cm = ConfigurationModel([3, 1], [2, 5])
+        self.assertEqual(sum(w for r, c, w in cm.yield_edges()), 4)
+
+        # Direction: node 1 sends both edges to node 0; ConfigurationModel
+        # has destinations on the rows
+        A = ConfigurationModel([2, 0], [0, 2]).generate_adjacency_matrix()
+        fp = StringIO()
+        write_edge_list(fp, A, rows='in')
+        self.assertEqual(fp.getvalue(), '1\t0\t2\n')
+        fp = StringIO()
+        write_gml(fp, A, rows='in')
+        self.assertTrue('source 1\n    target 0\n' in fp.getvalue())
+        fp = StringIO()
+        write_edge_list(fp, A.T)  # Sources on the rows
+        self.assertEqual(fp.getvalue(), '1\t0\t2\n')
+        self.assertRaises(ValueError, write_edge_list, fp, A, rows='up')
+
+    def test_output_formats(self):
+        A = ConfigurationModel([3, 1], [2, 5], rnd_seed=1).generate_adjacency_matrix()
+        self.assertEqual((A.format, A.indices.dtype, A.dtype),
+                         ('csc', np.int32, np.int32))
+        for output in ('csr', 'coo'):
+            B = ConfigurationModel([3, 1], [2, 5], rnd_seed=1,
+                                   output=output).generate_adjacency_matrix()
+            self.assertEqual(B.format, output)
+            self.assertTrue((B.toarray() == A.toarray()).all())
+        cm = ConfigurationModel([3, 1], [2, 5], rnd_seed=1, output='edges')
+        rows, cols = cm.generate_adjacency_matrix()
+        self.assertEqual(sorted(rows), [0, 0, 0, 1])
+        self.assertEqual(rows.dtype, np.int32)
+        cm.generate_adjacency_matrix()  # Reshuffles the stubs, not our copy
+        self.assertEqual(sorted(rows), [0, 0, 0, 1])
+        self.assertEqual(sum(w for r, c, w in cm.yield_edges()), 4)
+
+        pb = PickBelowModel([3, 1], [2, 2], [1., 2.], output='csr')
+        self.assertEqual(pb.generate_adjacency_matrix().format, 'csr')
+
+    def test_accumulator(self):
+        cm = ConfigurationModel([3, 1, 2], [2, 2, 2], rnd_seed=3)
+        samples = [cm.generate_adjacency_matrix() for i in xrange(60)]
+        dense = np.array([A.toarray() for A in samples])
+        loops = np.array([np.trace(A) for A in dense])
+
+        stats = {'self_loops': self_loops}
+        acc = EnsembleAccumulator(3, rows='in', statistics=stats)
+        sparse = EnsembleAccumulator(3, rows='in', sparse=True)
+        parts = [EnsembleAccumulator(3, rows='in', statistics=stats)
+                 for i in xrange(2)]
+        for i, A in enumerate(samples):
+            acc.add(A)
+            sparse.add(A)
+            parts[i % 2].add(A)
+        merged = parts[0].merge(parts[1])
+
+        for a in (acc, merged):
+            self.assertTrue(np.allclose(a.mean, dense.mean(axis=0)))
+            self.assertTrue(np.allclose(a.variance(), dense.var(axis=0, ddof=1)))
+            self.assertAlmostEqual(a.stat_mean('self_loops'), loops.mean())
+        self.assertTrue(np.allclose(sparse.mean.toarray(), dense.mean(axis=0)))
+        self.assertTrue(np.allclose(sparse.variance().toarray(),
+                                    dense.var(axis=0, ddof=1)))
+        self.assertEqual(list(acc.node_mean('in')), [3, 1, 2])
+        self.assertEqual(list(acc.node_mean('out')), [2, 2, 2])
+        self.assertEqual(acc.stat_quantile('self_loops', 1.), loops.max())
+
+    def test_ensemble_store(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'ensemble')
+            cm = ConfigurationModel([3, 1, 2], [2, 2, 2], rnd_seed=5)
+            samples = [cm.generate_adjacency_matrix() for i in xrange(30)]
+            store = EnsembleStore(path, 'w', n=3, rows='in', flush_every=10)
+            for A in samples[:25]:
+                store.add(A)
+            reader = EnsembleStore(path)
+            self.assertEqual(len(reader), 20)  # last flush
+            store.close()
+            reader.refresh()
+            self.assertEqual(len(reader), 25)
+
+            with EnsembleStore(path, 'a') as store:
+                for A in samples[25:]:
+                    store.add(A)
+            reader = EnsembleStore(path)
+            self.assertEqual((len(reader), reader.n, reader.rows), (30, 3, 'in'))
+            for A, B in zip(samples, [reader.matrix(s) for s in xrange(30)]):
+                self.assertTrue((A.toarray() == B.toarray()).all())
+            rows, cols, weights = reader[-1]
+            self.assertEqual(weights.sum(), 6)
+            self.assertEqual(len(list(reader.samples(10, 15))), 5)
+
+            acc = EnsembleAccumulator(3, rows='in')
+            for edges in reader:
+                acc.add(edges)
+            self.assertEqual(list(acc.node_mean('in')), [3, 1, 2])
+
+            store = write_ensemble(cm, os.path.join(tmp, 'more'), 4, rows='in')
+            self.assertEqual(len(EnsembleStore(store.directory)), 4)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_fenwick(self):
+        tree = FenwickTree([1, 0, 2, 1, 3])
+        self.assertEqual([tree.prefix_sum(i) for i in xrange(6)],
+                         [0, 1, 1, 3, 4, 7])
+        self.assertEqual([tree.find(v) for v in xrange(7)],
+                         [0, 2, 2, 3, 4, 4, 4])
+        tree.add(2, -2)
+        tree.set(0, 0)
+        self.assertEqual(tree.total(), 4)
+        self.assertEqual([tree.find(v) for v in xrange(4)], [3, 4, 4, 4])
+
+    def test_sum_tree(self):
+        tree = SumTree([1., 0., 2., 1., 0.5])
+        self.assertEqual(tree.total(), 4.5)
+        self.assertEqual([tree.find(v) for v in (0., 0.99, 1., 2.9, 3.2, 4.4)],
+                         [0, 0, 2, 2, 3, 4])
+        tree.update(2, 0.)
+        self.assertEqual(tree.total(), 2.5)
+        self.assertEqual(tree.find(1.2), 3)
+        tree.reset([0., 0., 0., 0., 3.])
+        self.assertEqual(tree.find(0.), 4)
+
+        # Single draws follow counts * kernel
+        rng = get_rng(3)
+        draws = [kernel_hires([0], np.array([2, 1, 1]),
+                              lambda v: np.array([1., 4., 0.]), rng)[0]
+                 for i in xrange(3000)]
+        self.assertEqual(draws.count(2), 0)
+        self.assertAlmostEqual(draws.count(1) / 3000., 4. / 6., delta=0.03)
+
+        # Exponential keys: first position drawn in proportion to weight
+        firsts = [weighted_order([1., 0., 3.], rng)[0] for i in xrange(3000)]
+        self.assertEqual(firsts.count(1), 0)
+        self.assertAlmostEqual(firsts.count(2) / 3000., 0.75, delta=0.03)
+        self.assertEqual(sorted(weighted_order([0., 2., 0.], rng)), [0, 1, 2])
+
+        # Candidates with zero weight are still used once the rest are gone
+        self.assertEqual(sorted(kernel_hires([0, 0, 0], np.array([1, 2]),
+                                             lambda v: np.array([1., 0.]),
+                                             rng)), [0, 1, 1])
+
+        # A draw that round-off puts at the total picks the last
+        # candidate with positive weight, not one past the end
+        class Top:
+            def uniform(self):
+                return 1.
+        self.assertEqual(kernel_hires([0], np.array([1, 1, 1]),
+                                      lambda v: np.array([1., 1., 0.]),
+                                      Top()), [1])
+
+    def test_sigmoid_models(self):
+        args = ([2, 0, 3, 2], [3, 2, 2, 2], [4., 3., 1., 2.])
+        for model in (PickSigmoidModel(*args, alpha=3., rnd_seed=1),
+                      PickSigmoidSelfModel(*args, alpha=3., rnd_seed=1)):
+            for i in xrange(5):
+                A = model.generate_adjacency_matrix().toarray()
+                self.assertEqual(list(A.sum(axis=0)), [2, 0, 3, 2])  # jobs
+                self.assertTrue((A.sum(axis=1) <= [3, 2, 2, 2]).all())
+                self.assertEqual(A.sum(), 7)
+
+    def test_sigmoid_distribution(self):
+        def reference(model, rng, beta=0, bonus=0, weighted_jobs=False):
+            # The original per-stub sampler
+            sigmoid = lambda x: 1 / (1 + np.exp(-x))
+            jobs = sorted([(model.ranking[x], x) for x in model.in_stubs],
+                          reverse=True)
+            left = sorted([(model.ranking[x], x) for x in model.out_stubs],
+                          reverse=True)
+            A = np.zeros((model.n, model.n))
+            for i in xrange(model.total_edges):
+                j = 0
+                if weighted_jobs:
+                    p = np.array([r for r, x in jobs])
+                    j = rng.choice(len(jobs), p=p / p.sum())
+                rank, v = jobs.pop(j)
+                p = np.array([sigmoid(model.alpha * (r - rank + beta)) +
+                              (bonus if x == v else 0) for r, x in left])
+                r, u = left.pop(rng.choice(len(left), p=p / p.sum()))
+                A[u, v] += 1
+            return A
+
+        args = ([2, 2, 2, 0], [2, 3, 1, 2], [1., 2., 3., 4.])
+        cases = [(PickSigmoidModel(*args, alpha=3., rnd_seed=1), {}),
+                 (PickSigmoidTwoParamModel(*args, alpha=3., beta=-0.3,
+                                           rnd_seed=2), {'beta': -0.3}),
+                 (PickSigmoidSelfModel(*args, alpha=3., self_consideration=2.,
+                                       rnd_seed=3),
+                  {'bonus': 2., 'weighted_jobs': True})]
+        rng = get_rng(4)
+        for model, options in cases:
+            mean = np.zeros((4, 4))
+            expected = np.zeros((4, 4))
+            for i in xrange(2000):
+                mean += model.generate_adjacency_matrix().toarray() / 2000.
+                expected += reference(model, rng, **options) / 2000.
+            self.assertTrue(np.allclose(mean, expected, atol=0.07))
+
+    def test_pick_below(self):
+        def reference(model, alpha, rng):
+            # The original list-based sampler
+            rank = model.ranking
+            jobs = sorted([(rank[x], x) for x in model.in_stubs], reverse=True)
+            left = sorted([(rank[x], x) for x in model.out_stubs], reverse=True)
+            edges = []
+            for job in jobs[:model.total_edges]:
+                candidates = [j for j in xrange(len(left))
+                              if left[j][0] + alpha >= job[0]]
+                selected = rng.choice(candidates) if candidates else 0
+                edges.append((left[selected][1], job[1]))
+                del left[selected]
+            return sorted(edges)
+
+        args = ([3, 0, 2, 4, 1], [1, 4, 2, 2, 3], [5., 1., 4., 1., 2.])
+        for alpha in (0, 0.3):
+            for seed in xrange(5):
+                A = PickBelowModel(*args, rnd_seed=seed) \
+                    .generate_adjacency_matrix(alpha)
+                r, c, w = edge_arrays(A)
+                edges = sorted(sum([[(x, y)] * k for x, y, k in zip(r, c, w)],
+                                   []))
+                model = PickBelowModel(*args)
+                self.assertEqual(edges, reference(model, alpha, get_rng(seed)))
+        # More candidates than jobs (the old sampler failed here)
+        A = PickBelowModel([1, 1], [3, 2], [1., 2.]).generate_adjacency_matrix()
+        self.assertEqual(A.sum(), 2)
+
+    def test_institution_sampling(self):
+        def reference(model, rng):
+            # Stub-level best-remaining sampler
+            jobs = list(model.in_stubs)
+            left = list(model.out_stubs)
+            edges = []
+            for i in xrange(model.total_edges):
+                picked = []
+                for stubs in (jobs, left):
+                    p = np.array([model.ranking[x] + model.alpha
+                                  for x in stubs])
+                    picked.append(stubs.pop(rng.choice(len(stubs),
+                                                       p=p / p.sum())))
+                edges.append((picked[1], picked[0]))
+            return sorted(edges)
+
+        args = ([3, 1, 2, 2], [2, 2, 2, 1], [2., 4., 1., 3.])
+        model = BestRemainingModel(*args, alpha=0.2, rnd_seed=1)
+        rng = get_rng(1)
+        mean = np.zeros((4, 4))
+        expected = np.zeros((4, 4))
+        for i in xrange(2000):
+            mean += model.generate_adjacency_matrix().toarray() / 2000.
+            for r, c in reference(model, rng):
+                expected[r, c] += 1 / 2000.
+        self.assertTrue(np.allclose(mean, expected, atol=0.07))
+
+        model = PickBelowSpecialModel(*args, alpha=0.3, rnd_seed=2)
+        for i in xrange(10):
+            A = model.generate_adjacency_matrix().toarray()
+            self.assertTrue((A.sum(axis=0) <= [3, 1, 2, 2]).all())  # jobs
+            self.assertEqual(list(A.sum(axis=1)), [2, 2, 2, 1])
+
+    def test_hiring_engine(self):
+        class SelfHires(HiringKernel):
+            # Every job goes to a candidate of the hiring school if any
+            job_order = 'shuffled'
+
+            def hire(self, model, jobs):
+                return jobs
+
+        args = ([2, 0, 3, 1], [2, 1, 3, 1], [3., 1., 2., 4.])
+        model = HiringModel(*args, kernel=SelfHires(), rnd_seed=1,
+                            output='edges')
+        rows, cols = model.generate_adjacency_matrix()
+        self.assertEqual(list(rows), list(cols))
+        self.assertEqual(sorted(cols), [0, 0, 2, 2, 2, 3])
+
+        # Same kernel, same seed: same network as the model class
+        model = HiringModel(*args, kernel=SigmoidKernel(3.), rnd_seed=4)
+        self.assertTrue((model.generate_adjacency_matrix() !=
+                         PickSigmoidModel(*args, alpha=3., rnd_seed=4)
+                         .generate_adjacency_matrix()).nnz == 0)
+
+        kernel = SigmoidKernel(3.)
+        kernel.job_order = 'random'
+        self.assertRaises(ValueError, HiringModel, *args, kernel=kernel)
+
+    def test_scaled_ranks_by_id(self):
+        # Unknown (NOT_FOUND, -2), missing (-1) and unranked ids all rank
+        # last, not as the last institution in the array
+        candidates, jobs = scaled_ranks_by_id([4., 1., np.nan, 3.],
+                                              [[0, -1, -2, 2], [1, 3]])
+        self.assertEqual(len(set(candidates)), 1)
+        self.assertTrue(candidates[0] < jobs[1] < jobs[0] == 1.)
+
+    def test_stubs(self):
+        stubs = build_stubs([2, 0, 3])
+        self.assertEqual(list(stubs), [0, 0, 2, 2, 2])
+        self.assertEqual(stubs.dtype.itemsize, 1)
+        self.assertEqual(build_stubs([1] * 300).dtype.itemsize, 2)
+        self.assertTrue(build_stubs([2, 0, 3]) is stubs)  # cached
+        self.assertFalse(stubs.flags.writeable)
+
+        # Models share the cached arrays; the CM shuffles its own copy
+        pb = PickBelowModel([3, 1], [2, 5], [1., 2.])
+        cm = ConfigurationModel([3, 1], [2, 5])
+        self.assertTrue(pb.in_stubs is build_stubs([3, 1]))
+        self.assertFalse(cm.in_stubs is pb.in_stubs)
+        cm.generate_adjacency_matrix()
+        self.assertEqual(list(pb.in_stubs), [0, 0, 0, 1])
+
+    def test_edge_swap(self):
+        # Rows are destinations, as in the configuration model
+        observed = csc_matrix(np.array([[2, 1, 0, 1],
+                                        [1, 0, 1, 0],
+                                        [0, 1, 1, 1],
+                                        [1, 0, 1, 0]]))
+        model = EdgeSwapModel.from_matrix(observed, rnd_seed=4)
+        self.assertEqual(list(model.loops), [2, 0, 1, 0])
+        for A in [model.generate_adjacency_matrix() for i in xrange(20)]:
+            A = A.toarray()
+            self.assertEqual(list(A.sum(axis=1)), [4, 2, 3, 2])
+            self.assertEqual(list(A.sum(axis=0)), [4, 2, 3, 2])
+            self.assertEqual(list(A.diagonal()), [2, 0, 1, 0])
+            off = A - np.diag(A.diagonal())
+            self.assertTrue(off.max() <= 1)
+        self.assertTrue(model.accepted > 0)
+
+        model = EdgeSwapModel.from_degrees([2, 1, 1, 2], [1, 2, 2, 1],
+                                           self_loops='forbid', rnd_seed=4)
+        ensemble = model.generate_ensemble(10)
+        for s in xrange(10):
+            A = ensemble[s].toarray().reshape(4, 4)
+            self.assertEqual(list(A.sum(axis=1)), [2, 1, 1, 2])
+            self.assertEqual(np.trace(A), 0)
+            self.assertTrue(A.max() <= 1)
+        self.assertRaises(ValueError, EdgeSwapModel, [0, 0], [1, 1])
+
+    def test_edge_swap_uniform(self):
+        # Loop-free 1-regular digraphs on 4 nodes are the 9 derangements;
+        # large batches must still visit them uniformly
+        states = [p for p in itertools.permutations(range(4))
+                  if all(p[v] != v for v in xrange(4))]
+        model = EdgeSwapModel([0, 1, 2, 3], [1, 0, 3, 2],
+                              self_loops='forbid', thinning=3.,
+                              batch_fraction=0.5, rnd_seed=1)
+        counts = dict((p, 0) for p in states)
+        for rows, cols in model.generate_ensemble(900, as_iterator=True):
+            counts[tuple(rows[np.argsort(cols)])] += 1
+        self.assertEqual(len(counts), 9)
+        self.assertTrue(chisquare(counts.values())[1] > 0.001)
+
+        # Double edge swaps can't reverse a directed 3-cycle
+        cycle = EdgeSwapModel([0, 1, 2], [1, 2, 0], self_loops='forbid')
+        self.assertEqual(cycle.swap(100), 0)
+
+    def test_null_model_test(self):
+        observed = csc_matrix(np.array([[3., 0., 0.],
+                                        [0., 1., 0.],
+                                        [0., 1., 1.]]))
+        factory = partial(ConfigurationModel, [3, 1, 2], [3, 2, 1])
+        stats = {'self_loops': self_loops}
+        kwargs = dict(rows='in', statistics=stats, chunk_size=10, seed=11)
+        serial = null_model_test(observed, factory, 45, workers=1, **kwargs)
+        pooled = null_model_test(observed, factory, 45, workers=2, **kwargs)
+        self.assertEqual(serial.samples, 45)
+        self.assertTrue((serial.edge_pvalues() == pooled.edge_pvalues()).all())
+        np.testing.assert_array_equal(serial.edge_zscores(),
+                                      pooled.edge_zscores())
+        self.assertEqual(serial.ensemble.stat_quantile('self_loops', 0.9),
+                         pooled.ensemble.stat_quantile('self_loops', 0.9))
+        self.assertTrue(0 < serial.stat_pvalue('self_loops', 'upper') < 0.1)
+        self.assertTrue(serial.stat_zscore('self_loops') > 0)
+        self.assertTrue((serial.node_pvalues('in') == 1.).all())  # fixed
+
+        # Each statistic is evaluated once per sample
+        calls = []
+        def counted(A):
+            calls.append(1)
+            return self_loops(A)
+        result = SignificanceResult(observed, 'in', {'loops': counted})
+        del calls[:]
+        result.add(factory(rnd_seed=1).generate_adjacency_matrix())
+        self.assertEqual(len(calls), 1)
+
+        # Interrupt after two chunks, then resume from the checkpoint
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'null.pkl')
+            def interrupt(done, total):
+                if done >= 20:
+                    raise KeyboardInterrupt
+            self.assertRaises(KeyboardInterrupt, null_model_test, observed,
+                              factory, 45, workers=1, checkpoint=path,
+                              progress=interrupt, **kwargs)
+            seen = []
+            resumed = null_model_test(observed, factory, 45, workers=1,
+                                      checkpoint=path,
+                                      progress=lambda d, t: seen.append(d),
+                                      **kwargs)
+            self.assertEqual(seen, [30, 40, 45])
+            self.assertTrue((resumed.edge_pvalues() ==
+                             serial.edge_pvalues()).all())
+            self.assertRaises(ValueError, null_model_test, observed, factory,
+                              50, workers=1, checkpoint=path, **kwargs)
+            # A different seed or observed network doesn't resume it
+            other = dict(kwargs, seed=12)
+            self.assertRaises(ValueError, null_model_test, observed, factory,
+                              45, workers=1, checkpoint=path, **other)
+            self.assertRaises(ValueError, null_model_test, 2 * observed,
+                              factory, 45, workers=1, checkpoint=path,
+                              **kwargs)
+        finally:
+            shutil.rmtree(tmp)
+
 if __name__ == '__main__':
     main()
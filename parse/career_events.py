@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Single-pass extraction of career events from a FacultyCorpus.
+
+Instead of calling phd(), first_job(), current_job(), ... on every record
+(each of which rescans that person's education/faculty lists), all events
+are computed at once with array operations over the corpus tables.  The
+result is a set of parallel arrays with one entry per person.
+
+    >>> from university_network.parse.career_events import extract_career_events
+    >>> events = extract_career_events(corpus)
+    >>> events.place['phd'][:3], events.year['phd'][:3]   # ids, years
+    >>> events.get('first_job', 0)
+        ('MIT', 2000)
+
+Events (and the faculty_record method each one reproduces):
+    phd             - phd()
+    first_job       - first_job()
+    first_asst_prof - first_asst_prof()
+    full_professor  - full_professor()   (tenure)
+    current_job     - current_job()
+    alma_mater      - alma_mater()
+"""
+
+import numpy as np
+from university_network.parse.faculty_corpus import MISSING, CODE_DTYPE, \
+    YEAR_DTYPE
+
+EVENTS = ['phd', 'first_job', 'first_asst_prof', 'full_professor',
+          'current_job', 'alma_mater']
+
+
+class CareerEvents:
+    """ Parallel arrays of career events.
+        place[event] holds institution ids (see `institutions`) and
+        year[event] holds years; both use MISSING where the event
+        doesn't apply.
+    """
+    def __init__(self, place, year, institutions):
+        self.place = place
+        self.year = year
+        self.institutions = institutions
+
+    def __len__(self):
+        return len(self.place['phd'])
+
+    def get(self, event, i):
+        """ (place, year) tuple for person i, as returned by the
+            matching faculty_record method.
+        """
+        place = self.institutions.decode(self.place[event][i])
+        year = self.year[event][i]
+        return place, None if year == MISSING else int(year)
+
+
+def _first_rows(mask, owners, n):
+    """ Row index of the first True entry owned by each person
+        (-1 if a person has none).
+    """
+    rows = np.flatnonzero(mask)
+    first = np.empty(n, dtype=np.int64)
+    first.fill(-1)
+    people, pos = np.unique(owners[rows], return_index=True)
+    first[people] = rows[pos]
+    return first
+
+
+def _gather(column, rows):
+    """ column[rows], with MISSING where rows == -1 """
+    if len(column) == 0:
+        result = np.empty(len(rows), dtype=column.dtype)
+        result.fill(MISSING)
+        return result
+    return np.where(rows >= 0, column[np.maximum(rows, 0)], MISSING)
+
+
+def extract_career_events(corpus, ignore=['PostDoc', 'Emeritus'],
+                          titles=['Associate Professor', 'Full Professor']):
+    """ Compute every career event for every person in one pass.
+
+        Inputs:
+          + corpus - FacultyCorpus
+          + ignore - current ranks for which current_job is None
+          + titles - ranks counted as tenure (full_professor)
+
+        Returns:
+          + CareerEvents
+    """
+    n = len(corpus)
+    edu, fac = corpus.education, corpus.faculty
+    edu_owner = corpus.owners('education')
+    fac_owner = corpus.owners('faculty')
+    place, year = {}, {}
+
+    def record(event, table, rows, year_field):
+        place[event] = _gather(table['place'], rows).astype(CODE_DTYPE)
+        year[event] = _gather(table[year_field], rows).astype(YEAR_DTYPE)
+
+    rows = _first_rows(edu['degree'] == corpus.code('PhD'), edu_owner, n)
+    record('phd', edu, rows, 'end_year')
+
+    rows = _first_rows(np.ones(len(edu_owner), dtype=bool), edu_owner, n)
+    record('alma_mater', edu, rows, 'end_year')
+
+    rows = _first_rows(fac['rank'] != corpus.code('PostDoc'), fac_owner, n)
+    record('first_job', fac, rows, 'start_year')
+
+    title_codes = [corpus.code(t) for t in titles]
+    rows = _first_rows(np.in1d(fac['rank'], title_codes), fac_owner, n)
+    record('full_professor', fac, rows, 'start_year')
+
+    # Earliest (known, pre-3000) assistant professorship; ties go to the
+    # entry listed first.
+    start = fac['start_year']
+    mask = (fac['rank'] == corpus.code('Assistant Professor')) & \
+           (start > 0) & (start < 3000)
+    candidates = np.flatnonzero(mask)
+    order = np.lexsort((candidates, start[candidates], fac_owner[candidates]))
+    candidates = candidates[order]
+    rows = np.empty(n, dtype=np.int64)
+    rows.fill(-1)
+    people, pos = np.unique(fac_owner[candidates], return_index=True)
+    rows[people] = candidates[pos]
+    record('first_asst_prof', fac, rows, 'start_year')
+
+    # Current job: the faculty entry matching the person's place and rank
+    person_place = corpus.people['place']
+    person_rank = corpus.people['current']
+    mask = (fac['place'] == person_place[fac_owner]) & \
+           (fac['rank'] == person_rank[fac_owner]) & \
+           (person_place[fac_owner] != MISSING)
+    rows = _first_rows(mask, fac_owner, n)
+    ignore_codes = [corpus.code(r) for r in (ignore or [])]
+    rows[np.in1d(person_rank, ignore_codes)] = -1
+    record('current_job', fac, rows, 'start_year')
+
+    return CareerEvents(place, year, corpus.institutions)
+
+
+def placement_edges(events):
+    """ Edges of the faculty placement network (PhD -> first job) for
+        people with a valid current job.
+
+        Returns:
+          + (sources, destinations, counts) - institution ids of the PhD
+            and first-job institutions and the number of people on each
+            path.
+    """
+    phd = events.place['phd']
+    job = events.place['first_job']
+    dot = events.institutions.get('.')
+    valid = (events.place['current_job'] != MISSING) & \
+            (phd != MISSING) & (phd != dot) & \
+            (job != MISSING) & (job != dot)
+    width = np.int64(max(len(events.institutions), 1))
+    keys = phd[valid].astype(np.int64) * width + job[valid]
+    keys, counts = np.unique(keys, return_counts=True)
+    return keys // width, keys % width, counts
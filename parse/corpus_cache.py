@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+On-disk binary cache of parsed faculty record files.
+
+The first time a record file is loaded with `load_faculty_corpus()` it is
+parsed into a FacultyCorpus, which is then written next to the source
+file as a directory of .npy arrays plus a string table:
+
+    allFaculty_CS.txt
+    allFaculty_CS.txt.cache/
+        meta.json       - source size/mtime/sha1 + column names
+        people.npy      - (num_columns x num_people) int32
+        education.npy   - (num_columns x num_entries) int32
+        faculty.npy     - (num_columns x num_entries) int32
+        edu_offsets.npy, fac_offsets.npy
+        strings.txt     - newline-separated string table
+        institutions.txt - newline-separated institution names (place ids)
+
+Later loads memory-map the arrays (no copy, no parsing).  The cache is
+rebuilt automatically whenever the source file changes: size and mtime
+are checked first, and the SHA-1 of the contents settles the case where
+only the mtime differs (e.g. the file was touched or copied).
+
+Example:
+
+    >>> from university_network.parse.corpus_cache import load_faculty_corpus
+    >>> corpus = load_faculty_corpus('allFaculty_CS.txt')
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from os.path import join as path_join, exists
+from university_network.parse.faculty_corpus import FacultyCorpus, \
+    parse_faculty_corpus
+from university_network.parse.string_table import StringTable
+from university_network.parse.institution_index import InstitutionIndex
+
+CACHE_VERSION = 2
+CACHE_SUFFIX = '.cache'
+TABLES = ['people', 'education', 'faculty']
+OFFSETS = ['edu_offsets', 'fac_offsets']
+
+
+def file_sha1(path, block_size=1 << 20):
+    """ SHA-1 hex digest of a file's contents """
+    h = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        block = fp.read(block_size)
+        while block:
+            h.update(block)
+            block = fp.read(block_size)
+    return h.hexdigest()
+
+
+def save_corpus(corpus, directory, meta=None):
+    """ Write a FacultyCorpus to `directory` in the cache format.
+        The directory is replaced atomically (written under a temporary
+        name, then renamed).
+    """
+    tmp_dir = '%s.tmp%d' % (directory, os.getpid())
+    if exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    meta = dict(meta or {})
+    meta['version'] = CACHE_VERSION
+    meta['num_people'] = len(corpus)
+    meta['num_strings'] = len(corpus.strings)
+    meta['num_institutions'] = len(corpus.institutions)
+    for name in TABLES:
+        table = getattr(corpus, name)
+        columns = sorted(table)
+        meta[name] = columns
+        stacked = np.vstack([table[c] for c in columns])
+        np.save(path_join(tmp_dir, name + '.npy'), stacked)
+    for name in OFFSETS:
+        np.save(path_join(tmp_dir, name + '.npy'), getattr(corpus, name))
+
+    _write_lines(path_join(tmp_dir, 'strings.txt'), corpus.strings.strings)
+    _write_lines(path_join(tmp_dir, 'institutions.txt'),
+                 corpus.institutions.names)
+    with open(path_join(tmp_dir, 'meta.json'), 'w') as fp:
+        json.dump(meta, fp)
+
+    if exists(directory):
+        shutil.rmtree(directory)
+    os.rename(tmp_dir, directory)
+
+
+def _write_lines(path, strings):
+    with open(path, 'wb') as fp:
+        fp.write('\n'.join(strings))
+
+
+def _read_lines(path, count):
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    lines = data.split('\n') if count else []
+    if len(lines) != count:
+        raise ValueError('Corrupt corpus cache file %s' % path)
+    return lines
+
+
+def read_meta(directory):
+    """ Return the metadata of a saved corpus (None if absent/unreadable) """
+    try:
+        with open(path_join(directory, 'meta.json')) as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def load_corpus(directory, mmap=True, institutions=None):
+    """ Load a FacultyCorpus written by `save_corpus()`.
+        With mmap=True the columns are read-only memory-mapped views.
+        If an InstitutionIndex is given, place columns are re-encoded
+        as its ids (this copies the three place columns).
+    """
+    meta = read_meta(directory)
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        raise ValueError('No valid corpus cache in %s' % directory)
+    mmap_mode = 'r' if mmap else None
+
+    def load(name):
+        return np.load(path_join(directory, name + '.npy'), mmap_mode=mmap_mode)
+
+    tables = {}
+    for name in TABLES:
+        stacked = load(name)
+        tables[name] = dict((c, stacked[i]) for i, c in enumerate(meta[name]))
+
+    strings = StringTable(_read_lines(path_join(directory, 'strings.txt'),
+                                      meta['num_strings']))
+    index = InstitutionIndex(_read_lines(path_join(directory,
+                                                   'institutions.txt'),
+                                         meta['num_institutions']))
+
+    corpus = FacultyCorpus(tables['people'], tables['education'],
+                           tables['faculty'], load('edu_offsets'),
+                           load('fac_offsets'), strings, index)
+    if institutions is not None:
+        corpus = corpus.with_institutions(institutions)
+    return corpus
+
+
+def cache_path(path, cache_dir=None):
+    """ Location of the cache directory for the record file at `path` """
+    if cache_dir is None:
+        return path + CACHE_SUFFIX
+    return path_join(cache_dir, os.path.basename(path) + CACHE_SUFFIX)
+
+
+def _cache_is_valid(path, directory):
+    """ Check a cache against its source file, refreshing the stored
+        mtime when only the timestamp changed.
+    """
+    meta = read_meta(directory)
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False
+    st = os.stat(path)
+    if meta.get('size') != st.st_size:
+        return False
+    if meta.get('mtime') == st.st_mtime:
+        return True
+    if meta.get('sha1') != file_sha1(path):
+        return False
+    meta['mtime'] = st.st_mtime
+    try:
+        with open(path_join(directory, 'meta.json'), 'w') as fp:
+            json.dump(meta, fp)
+    except (IOError, OSError):
+        pass
+    return True
+
+
+def load_faculty_corpus(path, cache_dir=None, mmap=True, refresh=False,
+                        institutions=None):
+    """ Load a faculty record file as a FacultyCorpus, going through the
+        binary cache.
+
+        Inputs:
+          + path - path to a faculty record file
+          + cache_dir - where to keep the cache (default: next to `path`)
+          + mmap - memory-map the cached arrays instead of reading them
+          + refresh - ignore (and rebuild) any existing cache
+          + institutions - (optional) InstitutionIndex for place ids
+
+        Returns:
+          + FacultyCorpus
+
+        If the cache can't be written (e.g. read-only data directory),
+        the freshly parsed corpus is returned anyway.
+    """
+    directory = cache_path(path, cache_dir)
+    if not refresh and _cache_is_valid(path, directory):
+        return load_corpus(directory, mmap, institutions)
+
+    st = os.stat(path)
+    with open(path, 'rU') as fp:
+        corpus = parse_faculty_corpus(fp)
+    meta = {'source': os.path.basename(path), 'size': st.st_size,
+            'mtime': st.st_mtime, 'sha1': file_sha1(path)}
+    try:
+        save_corpus(corpus, directory, meta)
+    except (IOError, OSError):
+        if institutions is not None:
+            corpus = corpus.with_institutions(institutions)
+        return corpus
+    return load_corpus(directory, mmap, institutions)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Incremental updates of a FacultyCorpus from a new data dump.
+
+`update_corpus()` matches the people of a new (or partial) record file to
+those of an existing corpus by identity (facultyName + email by default)
+and compares the matched rows code-by-code, without decoding strings.
+Only added, removed and changed people are touched; the returned
+`CorpusDiff` says which, and carries small `before`/`after` corpora of
+just those people so that derived data (e.g. a placement network) can be
+patched instead of rebuilt:
+
+    >>> corpus = load_faculty_corpus('dump_2011.txt')
+    >>> corpus, diff = update_corpus(corpus, open('dump_2012.txt', 'rU'))
+    >>> sources, destinations, deltas = placement_delta(diff)
+
+NOTE:  New strings and institutions are added to the existing corpus'
+       StringTable and InstitutionIndex (existing codes don't change).
+"""
+
+import numpy as np
+from university_network.parse.faculty_parser import INDIVIDUAL_FIELDS
+from university_network.parse.faculty_corpus import FacultyCorpus, \
+    parse_faculty_corpus, _take_entries, PLACE_FIELD, YEAR_FIELDS, \
+    EDUCATION_COLUMNS, FACULTY_COLUMNS
+from university_network.parse.career_events import extract_career_events, \
+    placement_edges
+
+IDENTITY = ['facultyName', 'email']
+
+
+class CorpusDiff:
+    """ Differences between a corpus and a new version of it.
+
+        Attributes:
+          + added - indices (into the source) of new people
+          + removed - indices (into the old corpus) of people no longer
+                      present
+          + changed - (old indices, source indices) of people whose
+                      record differs
+          + before - old rows of the removed and changed people
+          + after - new rows of the added and changed people
+    """
+    def __init__(self, added, removed, changed, before, after):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.before = before
+        self.after = after
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed[0])
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+
+def _encode_like(corpus, strings, institutions):
+    """ Re-encode `corpus` with the codes of `strings`/`institutions`
+        (new values are added to them).
+    """
+    remap = strings.remap(corpus.strings)
+    if corpus.institutions is institutions:
+        place_remap = None
+    else:
+        place_remap = institutions.remap(corpus.institutions)
+    tables = []
+    for name in ('people', 'education', 'faculty'):
+        columns = {}
+        for f, col in getattr(corpus, name).iteritems():
+            if f in YEAR_FIELDS:
+                columns[f] = col
+            elif f == PLACE_FIELD:
+                columns[f] = col if place_remap is None else place_remap[col]
+            else:
+                columns[f] = remap[col]
+        tables.append(columns)
+    return FacultyCorpus(tables[0], tables[1], tables[2], corpus.edu_offsets,
+                         corpus.fac_offsets, strings, institutions)
+
+
+def _stack(a, b):
+    """ Append corpus b to corpus a; both must share their string tables """
+    def join(x, y):
+        return dict((f, np.concatenate((x[f], y[f]))) for f in x)
+    return FacultyCorpus(join(a.people, b.people),
+                         join(a.education, b.education),
+                         join(a.faculty, b.faculty),
+                         np.concatenate((a.edu_offsets,
+                                         b.edu_offsets[1:] + a.edu_offsets[-1])),
+                         np.concatenate((a.fac_offsets,
+                                         b.fac_offsets[1:] + a.fac_offsets[-1])),
+                         a.strings, a.institutions)
+
+
+def identity_keys(corpus, fields=IDENTITY):
+    """ One int64 key per person identifying them by `fields`, plus the
+        occurrence number of each key (0 for the first person with that
+        identity, 1 for the second, ...).  Keys are only comparable
+        between corpora sharing a StringTable.
+    """
+    width = np.int64(len(corpus.strings) + 2)  # +MISSING, +NOT_FOUND
+    keys = np.zeros(len(corpus), dtype=np.int64)
+    for f in fields:
+        keys = keys * width + (corpus.people[f].astype(np.int64) + 2)
+
+    order = np.argsort(keys, kind='mergesort')
+    sorted_keys = keys[order]
+    starts = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+    group_start = np.maximum.accumulate(np.where(starts,
+                                                 np.arange(len(keys)), 0))
+    occurrence = np.empty(len(keys), dtype=np.int64)
+    occurrence[order] = np.arange(len(keys)) - group_start
+    return keys, occurrence
+
+
+def _rows_differ(old, new, old_idx, new_idx):
+    """ Boolean array: does person old_idx[k] differ from new_idx[k]?
+        Both corpora must share their string tables.
+    """
+    differ = np.zeros(len(old_idx), dtype=bool)
+    for f in INDIVIDUAL_FIELDS:
+        differ |= old.people[f][old_idx] != new.people[f][new_idx]
+
+    for name, columns in (('education', EDUCATION_COLUMNS),
+                          ('faculty', FACULTY_COLUMNS)):
+        old_offsets, new_offsets = old.offsets(name), new.offsets(name)
+        differ |= np.diff(old_offsets)[old_idx] != np.diff(new_offsets)[new_idx]
+        same = np.flatnonzero(~differ)
+        a, offsets = _take_entries(getattr(old, name), old_offsets,
+                                   old_idx[same])
+        b, _ = _take_entries(getattr(new, name), new_offsets, new_idx[same])
+        mismatch = np.zeros(offsets[-1], dtype=bool)
+        for f in columns:
+            mismatch |= a[f] != b[f]
+        owner = np.repeat(np.arange(len(same)), np.diff(offsets))
+        differ[same] |= np.bincount(owner, weights=mismatch,
+                                    minlength=len(same)) > 0
+    return differ
+
+
+def diff_corpus(corpus, source, partial=False, fields=IDENTITY):
+    """ Compare `corpus` with a new version `source` (a FacultyCorpus
+        encoded with the same string tables, see update_corpus).
+        With partial=True the source only holds added/changed people
+        and nobody is considered removed.
+
+        Returns:
+          + CorpusDiff
+    """
+    # Repeated identities are matched in order: the k-th "John Smith"
+    # of one corpus is the k-th of the other.
+    old_keys, old_occurrence = identity_keys(corpus, fields)
+    new_keys, new_occurrence = identity_keys(source, fields)
+    repeats = np.int64(max(old_occurrence.max() if len(corpus) else 0,
+                           new_occurrence.max() if len(source) else 0) + 1)
+    old_keys = old_keys * repeats + old_occurrence
+    new_keys = new_keys * repeats + new_occurrence
+    _, old_idx, new_idx = np.intersect1d(old_keys, new_keys,
+                                         assume_unique=True,
+                                         return_indices=True)
+    differ = _rows_differ(corpus, source, old_idx, new_idx)
+    changed = (old_idx[differ], new_idx[differ])
+
+    added = np.flatnonzero(~np.in1d(new_keys, new_keys[new_idx]))
+    if partial:
+        removed = np.zeros(0, dtype=np.int64)
+    else:
+        removed = np.flatnonzero(~np.in1d(old_keys, old_keys[old_idx]))
+
+    before = corpus.select(np.sort(np.concatenate((removed, changed[0]))))
+    after = source.select(np.sort(np.concatenate((added, changed[1]))))
+    return CorpusDiff(added, removed, changed, before, after)
+
+
+def update_corpus(corpus, source, partial=False, fields=IDENTITY):
+    """ Apply a new data dump to a corpus.
+
+        Inputs:
+          + corpus - FacultyCorpus (e.g. from load_faculty_corpus)
+          + source - the new records: an open file pointer or a
+                     FacultyCorpus
+          + partial - the source only lists new/changed people; people
+                      missing from it are kept
+          + fields - person fields identifying a record
+
+        Returns:
+          + (updated corpus, CorpusDiff).  Changed people keep their
+            position, removed people are dropped and new people are
+            appended in source order.  If nothing changed, `corpus`
+            itself is returned.
+    """
+    if not isinstance(source, FacultyCorpus):
+        source = parse_faculty_corpus(source, corpus.institutions)
+    source = _encode_like(source, corpus.strings, corpus.institutions)
+    diff = diff_corpus(corpus, source, partial, fields)
+    if not diff:
+        return corpus, diff
+
+    # Stack the old corpus and the new rows, then pick the final order
+    new_rows = np.concatenate((diff.changed[1], diff.added))
+    stacked = _stack(corpus, source.select(new_rows))
+
+    n = len(corpus)
+    order = np.arange(n)
+    order[diff.changed[0]] = n + np.arange(len(diff.changed[0]))
+    keep = np.ones(n, dtype=bool)
+    keep[diff.removed] = False
+    order = np.concatenate((order[keep], n + len(diff.changed[0]) +
+                            np.arange(len(diff.added))))
+    return stacked.select(order), diff
+
+
+def placement_delta(diff):
+    """ Change in placement-network edge weights implied by a CorpusDiff
+        (see placement_edges).
+
+        Returns:
+          + (sources, destinations, deltas) - institution ids and the
+            (signed) change in the number of people on each path;
+            paths with no net change are omitted.
+    """
+    institutions = diff.after.institutions
+    width = np.int64(max(len(institutions), 1))
+    keys, weights = [], []
+    for corpus, sign in ((diff.before, -1), (diff.after, 1)):
+        src, dst, counts = placement_edges(extract_career_events(corpus))
+        keys.append(src.astype(np.int64) * width + dst)
+        weights.append(sign * counts)
+    keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    deltas = np.bincount(inverse, weights=np.concatenate(weights),
+                         minlength=len(keys)).astype(np.int64)
+    nonzero = deltas != 0
+    keys = keys[nonzero]
+    return keys // width, keys % width, deltas[nonzero]
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Columnar (array-backed) storage of faculty records.
+
+A `FacultyCorpus` holds an entire faculty record file as a handful of
+NumPy columns instead of one `faculty_record` object per person.  Every
+string is dictionary-encoded, so each cell is a small integer code:
+`place` columns hold institution ids from an `InstitutionIndex` (which
+may be shared with other parsers and the models), and all other strings
+(names, ranks, degrees, ...) are codes into the corpus' `StringTable`.
+
+    people     - one row per person, columns INDIVIDUAL_FIELDS
+    education  - one row per [Education] entry, columns EDUCATION_COLUMNS
+    faculty    - one row per [Faculty] entry, columns FACULTY_COLUMNS
+
+Entries belonging to person i are rows edu_offsets[i]:edu_offsets[i+1]
+of the education table (likewise fac_offsets for the faculty table).
+Missing values are stored as MISSING.
+
+Example:
+
+    >>> from university_network.parse.faculty_corpus import parse_faculty_corpus
+    >>> corpus = parse_faculty_corpus(open('EXAMPLE.TXT', 'rU'))
+    >>> print corpus[0].phd()
+        ('University of New Mexico', 2006)
+    >>> mask = corpus.people['place'] == corpus.code('MIT', 'place')
+    >>> mit_faculty = corpus.select(mask)
+"""
+
+import numpy as np
+from array import array
+from university_network.parse.faculty_parser import parse_faculty_records, \
+    INDIVIDUAL_FIELDS, EDUCATION_FIELDS, FACULTY_FIELDS
+from university_network.parse.string_table import StringTable, MISSING, \
+    NOT_FOUND, CODE_DTYPE
+from university_network.parse.institution_index import InstitutionIndex
+
+YEAR_DTYPE = np.int32
+OFFSET_DTYPE = np.int64
+
+PLACE_FIELD = 'place'
+YEAR_FIELDS = ['start_year', 'end_year']
+EDUCATION_COLUMNS = EDUCATION_FIELDS + YEAR_FIELDS
+FACULTY_COLUMNS = FACULTY_FIELDS + YEAR_FIELDS
+
+
+def _year(value):
+    return None if value == MISSING else int(value)
+
+
+class corpus_record(object):
+    """ Lightweight view of one person (row) in a FacultyCorpus.
+        Mirrors the accessors of `faculty_record`.
+    """
+    __slots__ = ('corpus', 'index')
+
+    def __init__(self, corpus, index):
+        self.corpus = corpus
+        self.index = index
+
+    def __getitem__(self, key):
+        if key in INDIVIDUAL_FIELDS:
+            c = self.corpus
+            return c.table_for(key).decode(c.people[key][self.index])
+        if key in ('education', 'faculty'):
+            return self.corpus.entries(key, self.index)
+        raise KeyError(key)
+
+    def __getattr__(self, key):
+        if key in INDIVIDUAL_FIELDS or key in ('education', 'faculty'):
+            return self[key]
+        raise AttributeError(key)
+
+    def _range(self, table):
+        offsets = self.corpus.offsets(table)
+        return xrange(offsets[self.index], offsets[self.index+1])
+
+    def phd(self):
+        """ Return location + year of PhD """
+        c = self.corpus
+        phd_code = c.code('PhD')
+        edu = c.education
+        for k in self._range('education'):
+            if edu['degree'][k] == phd_code:
+                return c.institutions.decode(edu['place'][k]), \
+                       _year(edu['end_year'][k])
+        return None, None
+
+    def first_job(self):
+        """ Return location + year of first non-postdoc job """
+        c = self.corpus
+        postdoc_code = c.code('PostDoc')
+        fac = c.faculty
+        for k in self._range('faculty'):
+            if fac['rank'][k] != postdoc_code:
+                return c.institutions.decode(fac['place'][k]), \
+                       _year(fac['start_year'][k])
+        return None, None
+
+    def first_asst_prof(self):
+        """ Return location + year of earliest assistant professorship """
+        c = self.corpus
+        asst_code = c.code('Assistant Professor')
+        fac = c.faculty
+        place, year = None, 3000
+        for k in self._range('faculty'):
+            start = fac['start_year'][k]
+            if fac['rank'][k] == asst_code and start > 0 and start < year:
+                place = c.institutions.decode(fac['place'][k])
+                year = int(start)
+        if place is not None:
+            return place, year
+        return None, None
+
+    def current_job(self, ignore=['PostDoc', 'Emeritus']):
+        """ Return location + year of current (non-postdoc) job """
+        c = self.corpus
+        place = c.people['place'][self.index]
+        current = c.people['current'][self.index]
+
+        if ignore is None:
+            ignore = []
+
+        if place == MISSING or c.strings.decode(current) in ignore:
+            return None, None
+
+        fac = c.faculty
+        for k in self._range('faculty'):
+            if fac['place'][k] == place and fac['rank'][k] == current:
+                return c.institutions.decode(place), _year(fac['start_year'][k])
+        return None, None
+
+    def full_professor(self, titles=['Associate Professor', 'Full Professor']):
+        """ Return when & where person got tenure (see faculty_record) """
+        c = self.corpus
+        codes = [c.code(t) for t in titles]
+        fac = c.faculty
+        for k in self._range('faculty'):
+            if fac['rank'][k] in codes:
+                return c.institutions.decode(fac['place'][k]), \
+                       _year(fac['start_year'][k])
+        return None, None
+
+    def alma_mater(self):
+        """ Return location + year of first degree """
+        c = self.corpus
+        rng = self._range('education')
+        if rng:
+            k = rng[0]
+            return c.institutions.decode(c.education['place'][k]), \
+                   _year(c.education['end_year'][k])
+        return None, None
+
+
+class FacultyCorpus(object):
+    """ Array-backed collection of faculty records.
+
+        Attributes:
+          + people, education, faculty - dicts of column name -> ndarray
+          + edu_offsets, fac_offsets - (n+1)-length arrays indexing the
+            education/faculty tables by person
+          + strings - StringTable for every non-place string column
+          + institutions - InstitutionIndex for the place columns
+    """
+    def __init__(self, people, education, faculty, edu_offsets, fac_offsets,
+                 strings, institutions):
+        self.people = people
+        self.education = education
+        self.faculty = faculty
+        self.edu_offsets = edu_offsets
+        self.fac_offsets = fac_offsets
+        self.strings = strings
+        self.institutions = institutions
+
+    @classmethod
+    def from_records(cls, records, institutions=None):
+        """ Build a corpus from an iterable of faculty_record objects.
+            Places are interned into `institutions` (a new
+            InstitutionIndex if None).
+        """
+        strings = StringTable()
+        if institutions is None:
+            institutions = InstitutionIndex()
+        people = dict((f, array('i')) for f in INDIVIDUAL_FIELDS)
+        education = dict((f, array('i')) for f in EDUCATION_COLUMNS)
+        faculty = dict((f, array('i')) for f in FACULTY_COLUMNS)
+        edu_offsets = array('l', [0])
+        fac_offsets = array('l', [0])
+
+        for rec in records:
+            for f in INDIVIDUAL_FIELDS:
+                table = institutions if f == PLACE_FIELD else strings
+                people[f].append(table.encode(getattr(rec, f, None)))
+            for entries, columns in ((rec.education, education),
+                                     (rec.faculty, faculty)):
+                for entry in entries:
+                    for f in columns:
+                        value = entry.get(f)
+                        if f in YEAR_FIELDS:
+                            columns[f].append(MISSING if value is None else value)
+                        elif f == PLACE_FIELD:
+                            columns[f].append(institutions.encode(value))
+                        else:
+                            columns[f].append(strings.encode(value))
+            edu_offsets.append(edu_offsets[-1] + len(rec.education))
+            fac_offsets.append(fac_offsets[-1] + len(rec.faculty))
+
+        def to_numpy(columns):
+            return dict((f, np.array(columns[f], dtype=YEAR_DTYPE if f in
+                         YEAR_FIELDS else CODE_DTYPE)) for f in columns)
+
+        return cls(to_numpy(people), to_numpy(education), to_numpy(faculty),
+                   np.array(edu_offsets, dtype=OFFSET_DTYPE),
+                   np.array(fac_offsets, dtype=OFFSET_DTYPE), strings,
+                   institutions)
+
+    @classmethod
+    def concatenate(cls, corpora, institutions=None):
+        """ Join several corpora (in order) into one with a merged string
+            table.  Places are remapped into `institutions`; if None and
+            all corpora already share one InstitutionIndex, that index is
+            kept as is.
+        """
+        corpora = list(corpora)
+        shared = None
+        if institutions is None:
+            indices = set(id(c.institutions) for c in corpora)
+            if len(indices) == 1:
+                shared = corpora[0].institutions
+            institutions = shared if shared is not None else InstitutionIndex()
+
+        strings = StringTable()
+        tables = {'people': [], 'education': [], 'faculty': []}
+        edu_offsets = [np.zeros(1, dtype=OFFSET_DTYPE)]
+        fac_offsets = [np.zeros(1, dtype=OFFSET_DTYPE)]
+        edu_total = fac_total = 0  # Rows in the corpora joined so far
+
+        for corpus in corpora:
+            remap = strings.remap(corpus.strings)
+            if corpus.institutions is institutions:
+                place_remap = None
+            else:
+                place_remap = institutions.remap(corpus.institutions)
+            for name in tables:
+                parts = {}
+                for f, col in getattr(corpus, name).iteritems():
+                    if f in YEAR_FIELDS:
+                        parts[f] = col
+                    elif f == PLACE_FIELD:
+                        parts[f] = col if place_remap is None else place_remap[col]
+                    else:
+                        parts[f] = remap[col]
+                tables[name].append(parts)
+            edu_offsets.append(corpus.edu_offsets[1:] + edu_total)
+            fac_offsets.append(corpus.fac_offsets[1:] + fac_total)
+            edu_total += int(corpus.edu_offsets[-1])
+            fac_total += int(corpus.fac_offsets[-1])
+
+        def join(parts, columns):
+            return dict((f, np.concatenate([p[f] for p in parts]) if parts else
+                         np.zeros(0, dtype=YEAR_DTYPE if f in YEAR_FIELDS else
+                                  CODE_DTYPE)) for f in columns)
+
+        return cls(join(tables['people'], INDIVIDUAL_FIELDS),
+                   join(tables['education'], EDUCATION_COLUMNS),
+                   join(tables['faculty'], FACULTY_COLUMNS),
+                   np.concatenate(edu_offsets), np.concatenate(fac_offsets),
+                   strings, institutions)
+
+    def __len__(self):
+        return len(self.edu_offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('Corpus index out of range')
+        return corpus_record(self, i)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield corpus_record(self, i)
+
+    @property
+    def nbytes(self):
+        """ Bytes used by the array columns (string tables excluded) """
+        total = self.edu_offsets.nbytes + self.fac_offsets.nbytes
+        for table in (self.people, self.education, self.faculty):
+            total += sum(col.nbytes for col in table.itervalues())
+        return total
+
+    def table_for(self, field):
+        """ StringTable (or InstitutionIndex) used to encode `field` """
+        return self.institutions if field == PLACE_FIELD else self.strings
+
+    def code(self, value, field=None):
+        """ Code of a string, for vectorized comparisons against the
+            `field` columns (use field='place' for institutions).
+        """
+        return self.table_for(field).get(value)
+
+    def decode(self, codes, field=None):
+        """ Decode an array of `field` codes to a list of strings """
+        return self.table_for(field).decode_all(codes)
+
+    def offsets(self, table):
+        """ Offsets array for the 'education' or 'faculty' table """
+        if table == 'education':
+            return self.edu_offsets
+        elif table == 'faculty':
+            return self.fac_offsets
+        raise ValueError('Unknown table: %s' % table)
+
+    def owners(self, table):
+        """ Person index for every row of the 'education'/'faculty' table """
+        offsets = self.offsets(table)
+        return np.repeat(np.arange(len(self)), np.diff(offsets))
+
+    def entries(self, table, i):
+        """ Education or faculty entries of person i as a list of dicts,
+            in the same form used by `faculty_record`.
+        """
+        offsets = self.offsets(table)
+        columns = getattr(self, table)
+        result = []
+        for k in xrange(offsets[i], offsets[i+1]):
+            entry = {}
+            for f in columns:
+                if f in YEAR_FIELDS:
+                    entry[f] = _year(columns[f][k])
+                else:
+                    entry[f] = self.table_for(f).decode(columns[f][k])
+            result.append(entry)
+        return result
+
+    def with_institutions(self, institutions):
+        """ Return this corpus with its place columns re-encoded as ids of
+            `institutions` (new names are interned).
+        """
+        if institutions is self.institutions:
+            return self
+        remap = institutions.remap(self.institutions)
+        tables = []
+        for name in ('people', 'education', 'faculty'):
+            columns = dict(getattr(self, name))
+            columns[PLACE_FIELD] = remap[columns[PLACE_FIELD]]
+            tables.append(columns)
+        return FacultyCorpus(tables[0], tables[1], tables[2], self.edu_offsets,
+                             self.fac_offsets, self.strings, institutions)
+
+    def select(self, which):
+        """ Return a new corpus containing only the selected people.
+            `which` is a boolean mask or an array of person indices.
+            The string tables are shared with this corpus.
+        """
+        which = np.asarray(which)
+        if which.dtype == bool:
+            which = np.flatnonzero(which)
+        people = dict((f, col[which]) for f, col in self.people.iteritems())
+        education, edu_offsets = _take_entries(self.education,
+                                               self.edu_offsets, which)
+        faculty, fac_offsets = _take_entries(self.faculty,
+                                             self.fac_offsets, which)
+        return FacultyCorpus(people, education, faculty, edu_offsets,
+                             fac_offsets, self.strings, self.institutions)
+
+
+def _take_entries(columns, offsets, which):
+    """ Gather the entry rows owned by the people in `which` """
+    starts = offsets[which]
+    counts = offsets[which + 1] - starts
+    new_offsets = np.zeros(len(which) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum(counts, out=new_offsets[1:])
+    rows = np.repeat(starts - new_offsets[:-1], counts) + \
+           np.arange(new_offsets[-1], dtype=OFFSET_DTYPE)
+    return dict((f, col[rows]) for f, col in columns.iteritems()), new_offsets
+
+
+def parse_faculty_corpus(fp, institutions=None):
+    """ Parse a faculty record file straight into a FacultyCorpus.
+
+        Inputs:
+          + fp - an *open* file pointer containing faculty records.
+          + institutions - (optional) InstitutionIndex to intern places into
+
+        Returns:
+          + FacultyCorpus
+    """
+    return FacultyCorpus.from_records(parse_faculty_records(fp), institutions)
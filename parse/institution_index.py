@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Global interning of institution names.
+
+An `InstitutionIndex` gives every institution a dense integer id.  Share
+one index between the faculty and institution parsers, the network
+builders and the models, and institutions can be passed around as ids
+(and their attributes looked up in arrays) instead of as strings.
+
+    >>> index = InstitutionIndex()
+    >>> institutions = parse_institution_records(inst_fp, index=index)
+    >>> corpus = parse_faculty_corpus(faculty_fp, institutions=index)
+    >>> pi = index.attribute('pi')        # pi[i] is the rank of id i
+    >>> index.get('MIT'), index.decode(2)
+        (2, 'MIT')
+"""
+
+import numpy as np
+from university_network.parse.string_table import StringTable, CODE_DTYPE
+
+
+class AttributeColumn:
+    """ Values of one attribute in an array indexed by id, plus a mask of
+        the ids that have a value.  Both grow geometrically with the ids.
+    """
+    def __init__(self):
+        self.values = None
+        self.present = np.zeros(0, dtype=bool)
+
+    def reserve(self, n):
+        """ Make room for ids 0..n-1 """
+        if n <= len(self.present):
+            return
+        capacity = max(n, 2 * len(self.present), 16)
+        present = np.zeros(capacity, dtype=bool)
+        present[:len(self.present)] = self.present
+        self.present = present
+        if self.values is not None:
+            values = np.zeros(capacity, dtype=self.values.dtype)
+            values[:len(self.values)] = self.values
+            self.values = values
+
+    def set(self, ids, values):
+        ids = np.asarray(ids, dtype=np.int64)
+        values = np.asarray(values)
+        if len(ids) == 0:
+            return
+        # Strings are kept as objects (fixed-width arrays would truncate)
+        dtype = object if values.dtype.kind in 'SUO' else values.dtype
+        self.reserve(int(ids.max()) + 1)
+        if self.values is None:
+            self.values = np.zeros(len(self.present), dtype=dtype)
+        elif np.result_type(self.values.dtype, dtype) != self.values.dtype:
+            self.values = self.values.astype(np.result_type(self.values.dtype,
+                                                            dtype))
+        self.values[ids] = values
+        self.present[ids] = True
+
+    def array(self, n, default):
+        """ Values of ids 0..n-1, `default` where unset (a new array) """
+        self.reserve(n)
+        present = self.present[:n]
+        if self.values is None:
+            return np.full(n, default)
+        values = self.values[:n]
+        if present.all():
+            return values.copy()
+        return np.where(present, values, default)
+
+
+class InstitutionIndex(StringTable):
+    """ Dense integer ids for institution names, plus per-institution
+        attributes (e.g. the columns of an institution records file),
+        each stored as an array indexed by id.
+    """
+    def __init__(self, names=None):
+        StringTable.__init__(self, names)
+        self.attributes = {}
+
+    @property
+    def names(self):
+        return self.strings
+
+    def intern(self, name):
+        """ Id of `name`, assigning a new one if needed """
+        return self.encode(name)
+
+    def ids(self, names, add=True):
+        """ Array of ids for a sequence of names.  With add=False unknown
+            names map to NOT_FOUND.
+        """
+        lookup = self.encode if add else self.get
+        return np.array([lookup(name) for name in names], dtype=CODE_DTYPE)
+
+    def _column(self, field):
+        if field not in self.attributes:
+            self.attributes[field] = AttributeColumn()
+        return self.attributes[field]
+
+    def set_attributes(self, name, values):
+        """ Store a dict of attributes for institution `name` """
+        i = self.encode(name)
+        for field, value in values.iteritems():
+            self._column(field).set([i], [value])
+        return i
+
+    def set_column(self, field, ids, values):
+        """ Store `field` for many institutions at once """
+        self._column(field).set(ids, values)
+
+    def attribute(self, field, default=np.nan):
+        """ Array of `field` values indexed by id (default where unset) """
+        if field not in self.attributes:
+            return np.full(len(self), default)
+        return self.attributes[field].array(len(self), default)
+
+    def rank(self, field='pi'):
+        """ Float array of ranks indexed by id; unranked institutions
+            get NaN.
+        """
+        return self.attribute(field, np.nan).astype(float)
@@ -8,86 +8,198 @@ __email__ = "samfway@gmail.com"
 __status__ = "Development"
 
 """
-Parsing of university record files.  
+Parsing of university record files.
+
+`load_institution_table()` parses a file into typed NumPy columns (the
+type of each column is inferred once, not per cell).  The original
+dict-of-dicts produced by `parse_institution_records()` is available as
+a compatibility view, `InstitutionTable.as_dict()`.
 """
 
 import numpy as np
 from university_network.misc.util import Struct, custom_cast
 
+# Column types tried in order when inferring a schema
+COLUMN_TYPES = [np.int64, np.float64, object]
+INFER_ROWS = 20  # Rows inspected to guess each column's type
 
-def parse_institution_records(fp):
-    """ Parse a university record file.
-        Inputs:
-          + fp - an *open* file pointer containing 
-                 university/institution records.  
-        
-        Yields:
-          + A dictionary linking an institution name 
-            to the attributes stored in the file.
 
-        Example:  
-            >>> institutions = parse_institution_records(X)
-            >>> print institutions['Carnegie Mellon University'].USN2010
-                1
-            >>> print institutions['Harvard University'].pi
-                6.12
-            >>> print institutions['Yale University'].Region
-                'Northeast'
+class InstitutionTable:
+    """ Typed, column-oriented contents of an institution records file.
+
+        Attributes:
+          + names - array of institution names (one per row)
+          + fields - attribute column names, in file order (derived `pi`
+                     variants are appended at the end)
+          + columns - dict field -> ndarray (int64, float64 or object)
+    """
+    def __init__(self, names, fields, columns):
+        self.names = names
+        self.fields = fields
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def as_dict(self):
+        """ Compatibility view: {institution: {field: value}} with plain
+            Python values, as returned by parse_institution_records().
+            Numbers in text columns are cast per cell with custom_cast.
+        """
+        values = []
+        for f in self.fields:
+            col = self.columns[f]
+            if col.dtype == object:
+                values.append([custom_cast(x) for x in col])
+            else:
+                values.append(col.tolist())
+        return dict((name, dict(zip(self.fields, row)))
+                    for name, row in zip(self.names, zip(*values)))
+
+    def to_index(self, index):
+        """ Intern every institution into an InstitutionIndex and store
+            the columns as its attributes.  Returns the ids of the rows.
+        """
+        ids = index.ids(self.names)
+        for f in self.fields:
+            index.set_column(f, ids, self.columns[f].tolist())
+        return ids
+
+
+def infer_column(values, infer_rows=INFER_ROWS):
+    """ Convert a sequence of (stripped) strings to a typed array.
+        The type is guessed from the first `infer_rows` values and
+        widened (int -> float -> object) if the rest don't fit.
+    """
+    types = list(COLUMN_TYPES)
+    sample = values[:infer_rows]
+    while types[0] is not object:
+        try:
+            np.array(sample, dtype=types[0])
+            break
+        except (ValueError, OverflowError):
+            types.pop(0)
+
+    for t in types:
+        try:
+            return np.array(values, dtype=t)
+        except (ValueError, OverflowError):
+            pass
+
+
+def add_pi_variants(table):
+    """ Fill in variations on `pi' with array operations.  """
+    if 'pi' not in table.columns or table.columns['pi'].dtype == object:
+        return
+    pi = table.columns['pi'].astype(float)
+    ranks = np.sort(pi[pi < np.inf])
+    if len(ranks) == 0:
+        return
+
+    delta = np.mean(ranks[1:] - ranks[0:-1])
+    worst_ranking = ranks.max()
+    best_ranking = ranks.min()
+
+    ''' VARIATION #1: `pi_inv' - Inverse of the pi ranking. Lower ranks yield larger numbers. '''
+    table.columns['pi_inv'] = 1. / pi
 
-        NOTE:  Attributes are just the column names in the 
-               institution records file.  
+    ''' VARIATION #2: `pi_rescaled' - Rescaled such that the best school gets 1.0
+                                      and the rest get some epsilon value. '''
+    table.columns['pi_rescaled'] = 1. - (pi-best_ranking)/(worst_ranking-best_ranking+delta)
+
+    for f in ('pi_inv', 'pi_rescaled'):
+        if f not in table.fields:
+            table.fields.append(f)
+
+
+def load_institution_table(fp, index=None, infer_rows=INFER_ROWS):
+    """ Parse a university record file into an InstitutionTable.
+        Inputs:
+          + fp - an *open* file pointer containing
+                 university/institution records.
+          + index - (optional) InstitutionIndex to intern institutions
+                    into (see InstitutionTable.to_index)
+          + infer_rows - number of rows used to infer column types
+
+        As with a dict, if an institution appears more than once only
+        its last row is kept.
     """
-    institutions = {} 
-    detect_header = True
+    header = None
+    rows = []
     for line in fp:
         line = line.strip()
         if not line:  continue  # skip empty lines
 
-        if detect_header:
-            detect_header = False
+        if header is None:
             if not line.startswith('# '):
                 raise ValueError('File does not appear to be a valid '
-                                 'institution records file!') 
-            line = line[2:]  # Remove leading "# "
-            fields = line.split('\t')
-            if 'institution' not in fields:
+                                 'institution records file!')
+            header = [f.strip() for f in line[2:].split('\t')]
+            if 'institution' not in header:
                 raise ValueError('Records file missing `institution` field!')
-            num_fields = len(fields)
-            institution_field_ind = fields.index('institution')
-            info_fields = [f.strip() for i,f in enumerate(fields) if i != institution_field_ind]
-            info_fields_ind = [i for i in xrange(num_fields) if i != institution_field_ind]
         else:
-            fields = line.strip().split('\t')
-            if len(fields) != num_fields:
+            fields = line.split('\t')
+            if len(fields) != len(header):
                 raise ValueError('Missing/extra fields in line: %s' % line)
-            info_values = [custom_cast(fields[i].strip()) for i in info_fields_ind]
-            institution = fields[institution_field_ind].strip()
-            institution_record = dict(zip(info_fields, info_values))
-            institutions[institution] = institution_record
-
-    
-    # Fill in variations on `pi' 
-    ranks = [] 
-    for i in institutions:
-        temp = institutions[i].get('pi', np.inf)
-        if temp < np.inf:
-            ranks.append(temp)
-    ranks = np.array(ranks)
-
-    ranks.sort()
-    delta = np.mean(ranks[1:] - ranks[0:-1])
-    worst_ranking = ranks.max()
-    best_ranking = ranks.min()
-    scale = lambda x: 1. - (x-best_ranking)/(worst_ranking-best_ranking+delta)
+            rows.append(fields)
 
-    ''' VARIATION #1: `pi_inv' - Inverse of the pi ranking. Lower ranks yield larger numbers. ''' 
-    for i in institutions:
-        institutions[i]['pi_inv'] = 1. / institutions[i].get('pi', worst_ranking)
+    if header is None:
+        header = ['institution']
+    institution_field_ind = header.index('institution')
 
-    ''' VARIATION #2: `pi_rescaled' - Rescaled such that the best school gets 1.0
-                                      and the rest get some epsilon value. ''' 
-    for i in institutions:
-        institutions[i]['pi_rescaled'] = scale(institutions[i].get('pi', worst_ranking))
+    # Keep the last row of each institution
+    last_row = {}
+    for r, fields in enumerate(rows):
+        last_row[fields[institution_field_ind].strip()] = r
+    keep = sorted(last_row.itervalues())
+    rows = [rows[r] for r in keep]
 
-    return institutions 
+    raw_columns = zip(*rows) if rows else [()] * len(header)
+    names = np.array([x.strip() for x in raw_columns[institution_field_ind]],
+                     dtype=object)
+    fields, columns = [], {}
+    for i, f in enumerate(header):
+        if i == institution_field_ind:
+            continue
+        fields.append(f)
+        columns[f] = infer_column([x.strip() for x in raw_columns[i]],
+                                  infer_rows)
 
+    table = InstitutionTable(names, fields, columns)
+    add_pi_variants(table)
+    if index is not None:
+        table.to_index(index)
+    return table
+
+
+def parse_institution_records(fp, index=None):
+    """ Parse a university record file.
+        Inputs:
+          + fp - an *open* file pointer containing
+                 university/institution records.
+          + index - (optional) InstitutionIndex. Every institution is
+                    interned and its attributes stored in the index, so
+                    they can be looked up as arrays by id.
+
+        Yields:
+          + A dictionary linking an institution name
+            to the attributes stored in the file.
+
+        Example:
+            >>> institutions = parse_institution_records(X)
+            >>> print institutions['Carnegie Mellon University'].USN2010
+                1
+            >>> print institutions['Harvard University'].pi
+                6.12
+            >>> print institutions['Yale University'].Region
+                'Northeast'
+
+        NOTE:  Attributes are just the column names in the
+               institution records file.  This is the compatibility
+               view of load_institution_table(), which is faster to
+               work with when only a few columns are needed.
+    """
+    return load_institution_table(fp, index).as_dict()
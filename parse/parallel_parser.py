@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Multi-process parsing of large faculty record files.
+
+The file is cut into byte ranges that begin on NEW_RECORD_SYMBOL lines,
+so no record straddles two chunks.  Chunks are parsed on a process pool
+and the results are returned in file order.
+
+    >>> from university_network.parse.parallel_parser import \\
+    ...     parse_faculty_records_parallel
+    >>> records = parse_faculty_records_parallel('EXAMPLE.TXT', workers=4)
+    >>> corpus = parse_faculty_records_parallel('EXAMPLE.TXT', workers=4,
+    ...                                         as_corpus=True)
+"""
+
+import os
+from multiprocessing import Pool, cpu_count
+from university_network.parse.faculty_parser import parse_faculty_records, \
+    NEW_RECORD_SYMBOL
+from university_network.parse.faculty_corpus import FacultyCorpus
+
+
+def record_boundaries(path, num_chunks):
+    """ Split the file at `path` into at most `num_chunks` byte ranges,
+        each starting at the beginning of a record.
+
+        Returns a sorted list of offsets [0, b_1, ..., file_size];
+        chunk i is the range offsets[i]:offsets[i+1].
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as fp:
+        for k in xrange(1, num_chunks):
+            target = size * k // num_chunks
+            if target <= boundaries[-1]:
+                continue
+            fp.seek(target)
+            fp.readline()  # Skip the (probably partial) current line
+            while True:
+                pos = fp.tell()
+                line = fp.readline()
+                if not line:
+                    pos = size
+                    break
+                if line.lstrip().startswith(NEW_RECORD_SYMBOL):
+                    break
+            if boundaries[-1] < pos < size:
+                boundaries.append(pos)
+    boundaries.append(size)
+    return boundaries
+
+
+def _parse_chunk(task):
+    """ Pool worker: parse the records in one byte range """
+    path, start, end, as_corpus = task
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        lines = fp.read(end - start).splitlines()
+    records = parse_faculty_records(lines)
+    if as_corpus:
+        return FacultyCorpus.from_records(records)
+    return list(records)
+
+
+def parse_faculty_records_parallel(path, workers=None, as_corpus=False,
+                                   chunks_per_worker=4, institutions=None):
+    """ Parse a faculty record file on a pool of worker processes.
+
+        Inputs:
+          + path - path to a faculty record file
+          + workers - number of processes (default: one per CPU)
+          + as_corpus - return a FacultyCorpus instead of a list of
+                        faculty_record objects
+          + chunks_per_worker - chunks handed to each worker; more
+                                chunks balance load better
+          + institutions - (optional) InstitutionIndex for the corpus'
+                           place ids
+
+        Returns:
+          + list of faculty_record objects (or a FacultyCorpus), in the
+            order in which they appear in the file.
+    """
+    if workers is None:
+        workers = cpu_count()
+    boundaries = record_boundaries(path, max(1, workers * chunks_per_worker))
+    tasks = [(path, boundaries[i], boundaries[i+1], as_corpus)
+             for i in xrange(len(boundaries) - 1)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        parts = [_parse_chunk(t) for t in tasks]
+    else:
+        pool = Pool(workers)
+        try:
+            parts = pool.map(_parse_chunk, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    if as_corpus:
+        return FacultyCorpus.concatenate(parts, institutions)
+    return [rec for part in parts for rec in part]
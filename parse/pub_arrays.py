@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Typed, memory-mapped parsing of Google Scholar publication files.
+
+`parse_pub_arrays()` reads the same format as `parse_pub_file()` (with the
+same field-order state machine and recovery behavior) but, rather than
+one dict per publication, returns a `PubArrays` object:
+
+  + year, citations, versions - int64 arrays (MISSING where absent)
+  + cluster_id - uint64 array (0 where absent); Scholar cluster ids
+                 don't fit in int64
+  + string fields (Title, URL, ...) - kept as raw bytes in one buffer
+    with (start, end) offsets, and only turned into str when asked for
+
+    >>> pubs = parse_pub_arrays('pub_test/1.txt')
+    >>> pubs.citations.sum()
+    >>> pubs.string('Title', 0)
+        'TESTING_TITLE0'
+
+To use it for a whole faculty list:
+
+    >>> records = parse_pub_records(fac_list, pub_dir, parser=parse_pub_arrays)
+"""
+
+import re
+import os
+import mmap
+import numpy as np
+from array import array
+from university_network.parse.pub_parser import FIELDS, F_TYPE, START
+
+MISSING = -1
+MISSING_CLUSTER = 0
+INT_FIELDS = ['Year', 'Citations', 'Versions', 'Cluster ID']
+INT_ATTRIBUTES = ['year', 'citations', 'versions', 'cluster_id']
+STR_FIELDS = [f for f in FIELDS if f not in INT_FIELDS]
+
+# Lines starting with a field name: (longest such name, rest of line).
+# Lines without a field name are never used by the state machine.
+LINE_RE = re.compile(r'^[ \t\r\f\v]*(%s)[ \t\r\f\v]*([^\n]*)' %
+                     '|'.join(re.escape(f) for f in
+                              sorted(FIELDS, key=len, reverse=True)), re.M)
+
+
+class PubArrays:
+    """ Publications of one faculty member as typed arrays plus an
+        offset-indexed string buffer.
+    """
+    def __init__(self, year, citations, versions, cluster_id, buffer, spans):
+        self.year = year
+        self.citations = citations
+        self.versions = versions
+        self.cluster_id = cluster_id
+        self.buffer = buffer
+        self.spans = spans  # field -> (num_pubs x 2) start/end into buffer
+
+    def __len__(self):
+        return len(self.year)
+
+    def string(self, field, i):
+        """ Value of string `field` for publication i (None if absent) """
+        start, end = self.spans[field][i]
+        if start < 0:
+            return None
+        return str(self.buffer[start:end])
+
+    def strings(self, field):
+        """ All values of string `field`, as a list """
+        return [self.string(field, i) for i in xrange(len(self))]
+
+    def value(self, field, i):
+        """ Value of any field for publication i, as parse_pub_file()
+            would report it.
+        """
+        if field in STR_FIELDS:
+            return self.string(field, i)
+        col = getattr(self, INT_ATTRIBUTES[INT_FIELDS.index(field)])
+        missing = MISSING_CLUSTER if field == 'Cluster ID' else MISSING
+        return None if col[i] == missing else int(col[i])
+
+    def records(self):
+        """ Compatibility view: list of dicts, as from parse_pub_file() """
+        return [dict((f, self.value(f, i)) for f in FIELDS)
+                for i in xrange(len(self))]
+
+
+def _parse_buffer(data):
+    """ Run the parse_pub_file() state machine over a bytes-like buffer """
+    num_fields = len(FIELDS)
+    is_int = [f in INT_FIELDS for f in FIELDS]
+    # For every field: which records set it, and to what
+    owners = [array('l') for f in FIELDS]
+    values = [[] if is_int[i] else array('l') for i in xrange(num_fields)]
+    buf = bytearray()
+    num_records = 0
+
+    for match in LINE_RE.finditer(data):
+        key, value = match.groups()
+
+        if key == START:
+            num_records += 1
+            next_f = 0
+        elif num_records:
+            f = FIELDS[next_f]
+            if not key.startswith(f):
+                continue
+            if key != f:
+                # e.g. "Citations list ..." where "Citations" was expected;
+                # parse_pub_file() fails on the same line.
+                F_TYPE[next_f]((key + ' ' + value)[len(f):].strip())
+        else:
+            continue
+
+        value = value.rstrip()
+        owners[next_f].append(num_records - 1)
+        if is_int[next_f]:
+            values[next_f].append(F_TYPE[next_f](value))
+        else:
+            values[next_f].extend((len(buf), len(buf) + len(value)))
+            buf.extend(value)
+        next_f = (next_f + 1) % num_fields
+
+    arrays, spans = [], {}
+    for i, f in enumerate(FIELDS):
+        rows = np.array(owners[i], dtype=np.int64)
+        if is_int[i]:
+            dtype = np.uint64 if f == 'Cluster ID' else np.int64
+            col = np.empty(num_records, dtype=dtype)
+            col.fill(MISSING_CLUSTER if f == 'Cluster ID' else MISSING)
+            col[rows] = np.array(values[i], dtype=dtype)
+            arrays.append(col)
+        else:
+            col = np.empty((num_records, 2), dtype=np.int64)
+            col.fill(MISSING)
+            col[rows] = np.array(values[i], dtype=np.int64).reshape(-1, 2)
+            spans[f] = col
+    return PubArrays(*(arrays + [bytes(buf), spans]))
+
+
+def parse_pub_arrays(pub_file):
+    """ Extract Google scholar records from a plaintext file into a
+        PubArrays object.  The file is read through mmap.
+    """
+    with open(pub_file, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return _parse_buffer('')
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _parse_buffer(data)
+        finally:
+            data.close()
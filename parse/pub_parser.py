@@ -31,6 +31,9 @@ Citations list http://scholar.google.com/scholar?cites=16259048495598541056&as_s
 
 from university_network.misc.util import Struct
 from os.path import join as path_join
+from collections import Mapping
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 
 FIELDS = ['Title', 'URL', 'Year', 'Citations', 'Versions', 'Cluster ID', 'Citations list', 'Versions list', 'Author line']
 F_TYPE = [str,     str,   int,     int,         int,        int,          str,             str,              str]
@@ -69,7 +72,53 @@ def parse_pub_file(pub_file):
     return records
 
 
-def parse_pub_records(fac_list_file, pub_dir):
+def read_faculty_list(fac_list_file, pub_dir):
+    """ Return [(name, pub_file), ...] for a faculty list file, in file
+        order.  The n-th (non-empty) line refers to <pub_dir>/<n>.txt.
+    """
+    entries = []
+    for line in open(fac_list_file, 'rU'):
+        line = line.strip()
+        if not line: continue
+
+        name = line.split('|')[0]
+        pub_file = path_join(pub_dir, '%d.txt' % len(entries))
+        entries.append((name, pub_file))
+    return entries
+
+
+class LazyPubRecords(Mapping):
+    """ Read-only mapping of faculty name -> publication records that
+        parses a faculty member's file the first time it is accessed.
+    """
+    def __init__(self, entries, parser=parse_pub_file):
+        self.files = dict(entries)
+        self.names = []
+        seen = set()
+        for name, pub_file in entries:
+            if name not in seen:
+                seen.add(name)
+                self.names.append(name)
+        self.parser = parser
+        self.cache = {}
+
+    def __getitem__(self, name):
+        if name not in self.cache:
+            self.cache[name] = self.parser(self.files[name])
+        return self.cache[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.files
+
+
+def parse_pub_records(fac_list_file, pub_dir, workers=None, processes=False,
+                      lazy=False, parser=parse_pub_file):
     """ Parse all publication results.
         
         Input files
@@ -88,18 +137,36 @@ def parse_pub_records(fac_list_file, pub_dir):
                             Citations list http://scholar.google.com/scholar?c...
                              Versions list http://scholar.google.com/scholar?c...
                                Author line JS Park,R Sandhu,GJ Ahn- ACM Transa...
-    """
-    faculty_number = 0
-    faculty_publications = {}
 
-    for line in open(fac_list_file, 'rU'):
-        line = line.strip()
-        if not line: continue 
+        Options
+          - workers: read/parse the files on a pool of this many threads
+                     (file reading is I/O bound, so threads help)
+          - processes: use a process pool instead of threads (for when
+                       parsing, not I/O, is the bottleneck)
+          - lazy: return a LazyPubRecords mapping that parses each file
+                  on first access instead of up front
+          - parser: function used to parse each file, e.g.
+                    pub_arrays.parse_pub_arrays for typed arrays
+
+        The result maps names to records exactly as a sequential pass
+        would (if a name repeats, its last file wins).
+    """
+    entries = read_faculty_list(fac_list_file, pub_dir)
+    if lazy:
+        return LazyPubRecords(entries, parser)
+
+    pub_files = [pub_file for name, pub_file in entries]
+    if workers is None or workers <= 1:
+        results = [parser(f) for f in pub_files]
+    else:
+        pool = (Pool if processes else ThreadPool)(workers)
+        try:
+            results = pool.map(parser, pub_files)
+        finally:
+            pool.close()
+            pool.join()
 
-        name = line.split('|')[0]
-        pub_file = path_join(pub_dir, '%d.txt' % faculty_number)
-        faculty_number += 1
-        faculty_publications[name] = parse_pub_file(pub_file)
-    
+    faculty_publications = {}
+    for (name, pub_file), records in zip(entries, results):
+        faculty_publications[name] = records
     return faculty_publications
-        
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+"""
+Dictionary encoding of strings as dense integer codes.
+"""
+
+import numpy as np
+
+MISSING = -1     # Code/year used for missing values
+NOT_FOUND = -2   # Code returned for strings absent from a table
+CODE_DTYPE = np.int32
+
+
+class StringTable:
+    """ Dictionary encoding of strings as dense integer codes.
+        None is always encoded as MISSING.
+    """
+    def __init__(self, strings=None):
+        self.strings = list(strings) if strings is not None else []
+        self._codes = None
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, value):
+        return value in self._code_map()
+
+    def _code_map(self):
+        if self._codes is None:
+            self._codes = dict((s, i) for i, s in enumerate(self.strings))
+        return self._codes
+
+    def encode(self, value):
+        """ Return the code for value, adding it to the table if needed """
+        if value is None:
+            return MISSING
+        codes = self._code_map()
+        code = codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            codes[value] = code
+            self.strings.append(value)
+        return code
+
+    def get(self, value):
+        """ Return the code for value without modifying the table.
+            Returns NOT_FOUND if the string has never been seen, so
+            comparisons against code arrays are always False.
+        """
+        if value is None:
+            return MISSING
+        return self._code_map().get(value, NOT_FOUND)
+
+    def decode(self, code):
+        """ Return the string for code (None if missing) """
+        if code < 0:
+            return None
+        return self.strings[code]
+
+    def decode_all(self, codes):
+        """ Decode a sequence of codes to a list of strings """
+        return [self.decode(c) for c in codes]
+
+    def remap(self, other):
+        """ Array mapping codes of table `other` onto codes of this table
+            (adding any new strings).  Index with `remap[codes]`; the
+            last slot maps MISSING onto itself.
+        """
+        return np.array([self.encode(s) for s in other.strings] + [MISSING],
+                        dtype=CODE_DTYPE)
@@ -10,9 +10,26 @@ __status__ = "Development"
 """ Unit tests for faculty network parsing. """
 
 from university_network.parse.faculty_parser import parse_faculty_records
-from university_network.parse.institution_parser import parse_institution_records
+from university_network.parse.institution_parser import parse_institution_records, \
+    load_institution_table
 from university_network.parse.pub_parser import parse_pub_records
+from university_network.parse.pub_arrays import parse_pub_arrays
+from university_network.parse.faculty_corpus import parse_faculty_corpus, \
+    FacultyCorpus
+from university_network.parse.corpus_cache import load_faculty_corpus, cache_path
+from university_network.parse.parallel_parser import parse_faculty_records_parallel
+from university_network.parse.institution_index import InstitutionIndex
+from university_network.parse.career_events import extract_career_events, \
+    placement_edges, EVENTS
+from university_network.parse.corpus_update import update_corpus, \
+    placement_delta
+from university_network.misc.synthetic import write_dataset
 
+from os import path as os_path
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from numpy import isnan
 from StringIO import StringIO
 from unittest import TestCase, main
 
@@ -69,6 +86,37 @@ def get_test_records():
 # recordDate  : 10/6/2011""")
 
 
+def get_more_test_records():
+    return StringIO(get_test_records().getvalue() + 
+"""
+
+>>> record 3
+# facultyName : Ann Other
+# email       : ao@mit.edu
+# sex         : F
+# department  : Computer Science
+# place       : MIT
+# current     : Associate Professor
+# [Education]
+# degree      : PhD
+# place       : Stanford University
+# field       : Computer Science
+# years       : 1990-1995
+# [Faculty]
+# rank        : Assistant Professor
+# place       : Yale University
+# years       : 1997-2001
+# [Faculty]
+# rank        : Assistant Professor
+# place       : Cornell University
+# years       : 1995-1997
+# [Faculty]
+# rank        : Associate Professor
+# place       : MIT
+# years       : 2001-2011
+# recordDate  : 10/6/2011""")
+
+
 def get_test_universities():
     return StringIO(
 """
@@ -121,6 +169,185 @@ class parsing_tests(TestCase):
         self.assertEqual(second_record.education[0]['place'], 'University of New Mexico') 
         self.assertEqual(second_record.faculty[1]['rank'], 'Emeritus') 
 
+    def test_corpus(self):
+        records = list(parse_faculty_records(get_test_records()))
+        corpus = parse_faculty_corpus(get_test_records())
+        self.assertEqual(len(corpus), 2)
+        for rec, row in zip(records, corpus):
+            self.assertEqual(row.facultyName, rec.facultyName)
+            self.assertEqual(row['recordDate'], rec['recordDate'])
+            self.assertEqual(row.education, rec.education)
+            self.assertEqual(row.faculty, rec.faculty)
+            self.assertEqual(row.phd(), rec.phd())
+            self.assertEqual(row.first_job(), rec.first_job())
+            self.assertEqual(row.first_asst_prof(), rec.first_asst_prof())
+            self.assertEqual(row.current_job(), rec.current_job())
+            self.assertEqual(row.full_professor(), rec.full_professor())
+            self.assertEqual(row.alma_mater(), rec.alma_mater())
+
+        mask = corpus.people['place'] == corpus.code('Texas A&M', 'place')
+        subset = corpus.select(mask)
+        self.assertEqual(len(subset), 1)
+        self.assertEqual(subset[0].facultyName, 'Bob Roberts')
+        self.assertEqual(subset[0].faculty, records[1].faculty)
+        self.assertEqual(corpus.code('Nowhere'), -2)
+
+    def test_corpus_cache(self):
+        tmp_dir = mkdtemp()
+        try:
+            source = os_path.join(tmp_dir, 'records.txt')
+            with open(source, 'w') as fp:
+                fp.write(get_test_records().getvalue())
+
+            cold = load_faculty_corpus(source)
+            self.assertTrue(os_path.isdir(cache_path(source)))
+            warm = load_faculty_corpus(source)
+            self.assertEqual(warm[1].faculty, cold[1].faculty)
+            self.assertEqual(warm[0].phd(), ('Stanford University', 2000))
+
+            # Changing the source invalidates the cache
+            with open(source, 'a') as fp:
+                fp.write('\n>>> record 3\n# facultyName : New Person\n')
+            updated = load_faculty_corpus(source)
+            self.assertEqual(len(updated), 3)
+            self.assertEqual(updated[2].facultyName, 'New Person')
+        finally:
+            rmtree(tmp_dir)
+
+    def test_parallel_parse(self):
+        tmp_dir = mkdtemp()
+        try:
+            source = os_path.join(tmp_dir, 'records.txt')
+            with open(source, 'w') as fp:
+                for i in xrange(25):
+                    fp.write(get_test_records().getvalue().replace(
+                        'Joe Shmoe', 'Joe Shmoe %d' % i))
+            serial = list(parse_faculty_records(open(source, 'rU')))
+            records = parse_faculty_records_parallel(source, workers=2)
+            self.assertEqual([r.facultyName for r in records],
+                             [r.facultyName for r in serial])
+            self.assertEqual(records[-1].faculty, serial[-1].faculty)
+
+            corpus = parse_faculty_records_parallel(source, workers=2,
+                                                    as_corpus=True)
+            self.assertEqual(len(corpus), 50)
+            self.assertEqual(corpus[48].facultyName, 'Joe Shmoe 24')
+            self.assertEqual(corpus[49].faculty, serial[49].faculty)
+
+            # Empty chunks (blank lines before the first record)
+            with open(source, 'w') as fp:
+                fp.write('\n' * 2000)
+                fp.write(get_test_records().getvalue())
+            corpus = parse_faculty_records_parallel(source, workers=2,
+                                                    as_corpus=True)
+            self.assertEqual(len(corpus), 2)
+            self.assertEqual(corpus[1].faculty,
+                             list(parse_faculty_records(
+                                 get_test_records()))[1].faculty)
+        finally:
+            rmtree(tmp_dir)
+
+    def test_concatenate_empty(self):
+        empty = FacultyCorpus.from_records([])
+        self.assertEqual(len(FacultyCorpus.concatenate([empty, empty])), 0)
+        corpus = parse_faculty_corpus(get_test_records())
+        joined = FacultyCorpus.concatenate([empty, corpus, empty, corpus])
+        self.assertEqual(len(joined), 4)
+        self.assertEqual(joined[3].faculty, corpus[1].faculty)
+        self.assertEqual(joined[2].phd(), corpus[0].phd())
+
+    def test_career_events(self):
+        records = list(parse_faculty_records(get_more_test_records()))
+        events = extract_career_events(parse_faculty_corpus(
+            get_more_test_records()))
+        for i, rec in enumerate(records):
+            for event in EVENTS:
+                self.assertEqual(events.get(event, i), getattr(rec, event)())
+        self.assertEqual(events.get('first_asst_prof', 2),
+                         ('Cornell University', 1995))
+
+        sources, destinations, counts = placement_edges(events)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(events.institutions.decode(sources[0]),
+                         'Stanford University')
+        self.assertEqual(events.institutions.decode(destinations[0]),
+                         'Yale University')
+        self.assertEqual(counts[0], 1)
+
+    def test_corpus_update(self):
+        corpus = parse_faculty_corpus(get_more_test_records())
+        text = get_more_test_records().getvalue()
+        # Drop record 1, move Ann Other's PhD, add a new person
+        text = text[text.index('>>> record 2'):]
+        text = text.replace('# years       : 1990-1995',
+                            '# years       : 1990-1994')
+        text = text.replace('# place       : Stanford University\n'
+                            '# field       : Computer Science\n'
+                            '# years       : 1990-1994',
+                            '# place       : UC Berkeley\n'
+                            '# field       : Computer Science\n'
+                            '# years       : 1990-1994')
+        text += '\n>>> record 4\n# facultyName : New Person\n' \
+                '# email       : np@yale.edu\n# place       : Yale University\n' \
+                '# current     : Assistant Professor\n'
+        fresh = parse_faculty_corpus(StringIO(text))
+
+        old_edges = placement_edges(extract_career_events(corpus))
+        updated, diff = update_corpus(corpus, StringIO(text))
+        self.assertEqual(list(diff.removed), [0])
+        self.assertEqual(list(diff.changed[0]), [2])
+        self.assertEqual(list(diff.added), [2])
+        self.assertEqual(len(diff.before), 2)
+        self.assertEqual(len(updated), len(fresh))
+        for row, rec in zip(updated, fresh):
+            self.assertEqual(row.facultyName, rec.facultyName)
+            self.assertEqual(row.education, rec.education)
+            self.assertEqual(row.faculty, rec.faculty)
+
+        # Patching the old edges gives the edges of the new corpus
+        names = corpus.institutions.decode
+        weights = {}
+        for s, d, w in zip(*old_edges):
+            weights[names(s), names(d)] = w
+        for s, d, w in zip(*placement_delta(diff)):
+            weights[names(s), names(d)] = weights.get((names(s), names(d)), 0) + w
+        weights = dict((k, w) for k, w in weights.iteritems() if w)
+        names = fresh.institutions.decode
+        expected = dict(((names(s), names(d)), w) for s, d, w in
+                        zip(*placement_edges(extract_career_events(fresh))))
+        self.assertEqual(weights, expected)
+        self.assertEqual(weights, {('UC Berkeley', 'Yale University'): 1})
+
+        # Nothing to do the second time around
+        again, diff = update_corpus(updated, StringIO(text))
+        self.assertTrue(again is updated)
+        self.assertFalse(diff)
+
+        # A partial dump never removes anybody
+        partial, diff = update_corpus(corpus, StringIO(text), partial=True)
+        self.assertEqual(len(partial), 4)
+        self.assertEqual(partial[0].facultyName, 'Joe Shmoe')
+
+    def test_synthetic_data(self):
+        tmp_dir = mkdtemp()
+        try:
+            paths = write_dataset(tmp_dir, 200, pub_people=20)
+            records = list(parse_faculty_records(open(paths['faculty'], 'rU')))
+            self.assertEqual(len(records), 200)
+            institutions = parse_institution_records(
+                open(paths['institutions'], 'rU'))
+            self.assertEqual(len(institutions), 10)
+            for rec in records:
+                self.assertTrue(rec.phd()[0] in institutions)
+                self.assertTrue(rec.place in institutions)
+            pubs = parse_pub_records(paths['fac_list'], paths['pub_dir'])
+            self.assertEqual(len(pubs), 20)  # one entry per (unique) name
+            self.assertEqual(open(paths['faculty']).read(),
+                             open(write_dataset(mkdtemp(dir=tmp_dir), 200,
+                                                pub_people=0)['faculty']).read())
+        finally:
+            rmtree(tmp_dir)
+
     def test_uni_parse(self):
         X = get_test_universities()
         institutions = parse_institution_records(X)
@@ -132,12 +359,84 @@ class parsing_tests(TestCase):
         self.assertEqual(institutions['Stanford University']['pi_rescaled'], 1.)
         self.assertEqual(institutions['MIT']['u'], 3)
 
+    def test_uni_table(self):
+        table = load_institution_table(get_test_universities())
+        self.assertEqual(len(table), 9)
+        self.assertEqual(table['u'].dtype.kind, 'i')
+        self.assertEqual(table['pi'].dtype.kind, 'f')
+        self.assertEqual(table['Region'].dtype, object)
+        self.assertEqual(list(table.names[:2]), ['Stanford University', 'UC Berkeley'])
+        self.assertEqual(table['pi_rescaled'][0], 1.)
+        self.assertTrue((table['pi_inv'] == 1. / table['pi']).all())
+
+        # Columns that stop fitting the inferred type are widened
+        X = StringIO(get_test_universities().getvalue() + '\n10\t11\t4.5\t.\tSouth\tRice')
+        table = load_institution_table(X, infer_rows=3)
+        self.assertEqual(table['USN2010'].dtype.kind, 'f')
+        self.assertEqual(table['NRC95'].dtype, object)
+        self.assertEqual(table.as_dict()['Rice']['NRC95'], '.')
+        self.assertEqual(table.as_dict()['MIT']['NRC95'], 2)
+
+    def test_institution_index(self):
+        index = InstitutionIndex()
+        institutions = parse_institution_records(get_test_universities(), index)
+        corpus = parse_faculty_corpus(get_more_test_records(), index)
+        self.assertTrue(corpus.institutions is index)
+        self.assertEqual(len(index), 12)  # 9 ranked + 3 only in records
+
+        mit = index.get('MIT')
+        self.assertEqual(index.decode(mit), 'MIT')
+        self.assertEqual(index.rank('pi')[mit], institutions['MIT']['pi'])
+        self.assertTrue(isnan(index.rank('pi')[index.get('Texas A&M')]))
+        self.assertEqual(corpus.people['place'][2], mit)
+        self.assertEqual(index.attribute('Region')[mit],
+                         institutions['MIT']['Region'])
+
+        # Attribute arrays grow with the index
+        new = index.intern('New School')
+        self.assertTrue(isnan(index.rank('pi')[new]))
+        index.set_attributes('New School', {'pi': 0.5, 'Region': 'West'})
+        self.assertEqual(index.rank('pi')[new], 0.5)
+        self.assertEqual(index.attribute('Region', None)[new], 'West')
+        self.assertEqual(len(index.attribute('NRC95')), len(index))
+
+        events = extract_career_events(corpus)
+        self.assertEqual(events.place['phd'][2], index.get('Stanford University'))
+
     def test_pub_parse(self):
         records = parse_pub_records('./pub_test/faclist.txt', './pub_test/')
         self.assertEqual(records['Per Son'][0]['Title'], 'TESTING_TITLE0')
         self.assertEqual(records['Per Son'][1]['Title'], 'TESTING_TITLE1')
         self.assertEqual(records['Per Son'][1]['Citations'], 321)
         self.assertEqual(len(records['A.A. Ron']), 0)
+
+        for kwargs in [{'workers': 2}, {'workers': 2, 'processes': True}]:
+            self.assertEqual(parse_pub_records('./pub_test/faclist.txt',
+                                               './pub_test/', **kwargs),
+                             records)
+
+        lazy = parse_pub_records('./pub_test/faclist.txt', './pub_test/',
+                                 lazy=True)
+        self.assertEqual(list(lazy), ['Per Son', 'A.A. Ron'])
+        self.assertEqual(len(lazy.cache), 0)
+        self.assertEqual(lazy['Per Son'], records['Per Son'])
+        self.assertEqual(len(lazy.cache), 1)
+        self.assertEqual(dict(lazy), records)
+
+    def test_pub_arrays(self):
+        pubs = parse_pub_arrays('./pub_test/0.txt')
+        self.assertEqual(len(pubs), 2)
+        self.assertEqual(list(pubs.year), [2000, 2001])
+        self.assertEqual(pubs.citations.sum(), 321)
+        self.assertEqual(pubs.cluster_id[1], 16259048495598541056)
+        self.assertEqual(pubs.string('Title', 1), 'TESTING_TITLE1')
+        self.assertEqual(pubs.strings('Author line')[1], 'SF Way, PER SON - NATURE')
+
+        records = parse_pub_records('./pub_test/faclist.txt', './pub_test/')
+        typed = parse_pub_records('./pub_test/faclist.txt', './pub_test/',
+                                  parser=parse_pub_arrays)
+        for name in records:
+            self.assertEqual(typed[name].records(), records[name])
     
 
 if __name__ == '__main__':
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+""" Report cold (parse + write cache) and warm (cached) load times for a
+    faculty record file.
+
+    Usage: python benchmark_cache.py RECORD_FILE [--repeat N]
+"""
+
+import argparse
+from time import time
+from university_network.parse.faculty_parser import parse_faculty_records
+from university_network.parse.corpus_cache import load_faculty_corpus
+
+
+def time_call(func, *args, **kwargs):
+    start = time()
+    result = func(*args, **kwargs)
+    return time() - start, result
+
+
+def benchmark_cache(path, repeat=3):
+    """ Returns a dict of timings (seconds) for loading `path` """
+    def plain_parse():
+        with open(path, 'rU') as fp:
+            return sum(1 for _ in parse_faculty_records(fp))
+
+    parse_time, num_records = time_call(plain_parse)
+    cold_time, _ = time_call(load_faculty_corpus, path, refresh=True)
+    warm_times = [time_call(load_faculty_corpus, path)[0]
+                  for _ in xrange(repeat)]
+    return {'records': num_records,
+            'parse_faculty_records': parse_time,
+            'cold': cold_time,
+            'warm': min(warm_times)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', help='faculty record file')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    r = benchmark_cache(args.path, args.repeat)
+    print '%d records' % r['records']
+    print 'parse_faculty_records: %8.4f s' % r['parse_faculty_records']
+    print 'cold (parse + cache) : %8.4f s' % r['cold']
+    print 'warm (cached)        : %8.4f s' % r['warm']
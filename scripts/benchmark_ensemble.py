@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+""" Compare configuration-model ensemble throughput (samples/sec) of a
+    loop over generate_adjacency_matrix() with generate_ensemble().
+
+    Usage: python benchmark_ensemble.py [--nodes 200] [--stubs 5000]
+                                        [--samples 1000] [--output f.json]
+"""
+
+import json
+import argparse
+import numpy as np
+from time import time
+from university_network.models.configuration_models import ConfigurationModel
+
+
+def degree_sequence(nodes, stubs, rng):
+    """ Heavy-tailed degree sequence with `stubs` stubs in total """
+    weights = rng.pareto(1.5, nodes) + 1.
+    return np.bincount(rng.choice(nodes, stubs, p=weights / weights.sum()),
+                       minlength=nodes)
+
+
+def benchmark_ensemble(nodes, stubs, samples, batch_size=None, seed=0):
+    """ Returns a dict: method -> samples/sec """
+    rng = np.random.RandomState(seed)
+    cm = ConfigurationModel(degree_sequence(nodes, stubs, rng),
+                            degree_sequence(nodes, stubs, rng), rnd_seed=seed)
+
+    def loop():
+        for _ in xrange(samples):
+            cm.generate_adjacency_matrix()
+
+    def stacked():
+        cm.generate_ensemble(samples, batch_size)
+
+    def iterator():
+        for rows, cols in cm.generate_ensemble(samples, batch_size,
+                                               as_iterator=True):
+            pass
+
+    rates = {}
+    for name, func in (('loop', loop), ('stacked', stacked),
+                       ('iterator', iterator)):
+        start = time()
+        func()
+        rates[name] = samples / (time() - start)
+    return rates
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=200)
+    parser.add_argument('--stubs', type=int, default=5000)
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    rates = benchmark_ensemble(args.nodes, args.stubs, args.samples,
+                               args.batch_size, args.seed)
+    for name in ('loop', 'stacked', 'iterator'):
+        print '%-10s %10.1f samples/s  (%.1fx)' % (name, rates[name],
+                                                   rates[name] / rates['loop'])
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({'nodes': args.nodes, 'stubs': args.stubs,
+                       'samples': args.samples, 'samples_per_sec': rates},
+                      fp, indent=2, sort_keys=True)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+
+__author__ = "Sam Way"
+__copyright__ = "Copyright 2014, The Clauset Lab"
+__license__ = "BSD"
+__maintainer__ = "Sam Way"
+__email__ = "samfway@gmail.com"
+__status__ = "Development"
+
+""" Benchmark the faculty, institution and publication parsers (and their
+    faster variants) on synthetic data sets of increasing size.
+
+    For every parser and size this reports records/sec, load latency
+    (time until the first record is usable; the full load time for
+    parsers that return everything at once) and peak memory.  Every
+    measurement runs in a fresh child process, so peak RSS is not
+    polluted by earlier runs.  Results are written as JSON; pass an
+    older results file as --baseline to flag slowdowns.
+
+    Usage: python benchmark_parsers.py [--people 1000 10000 100000]
+                                       [--output parsers.json]
+                                       [--baseline old.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import numpy as np
+from multiprocessing import Process, Queue, cpu_count
+from university_network.misc.synthetic import write_dataset
+from university_network.parse.faculty_parser import parse_faculty_records
+from university_network.parse.faculty_corpus import parse_faculty_corpus
+from university_network.parse.parallel_parser import \
+    parse_faculty_records_parallel
+from university_network.parse.corpus_cache import load_faculty_corpus
+from university_network.parse.institution_parser import \
+    parse_institution_records, load_institution_table
+from university_network.parse.pub_parser import parse_pub_records
+from university_network.parse.pub_arrays import parse_pub_arrays
+
+RESULTS_VERSION = 1
+
+
+def _faculty_records(paths, options):
+    start = time.time()
+    with open(paths['faculty'], 'rU') as fp:
+        records = parse_faculty_records(fp)
+        count = 0
+        for rec in records:
+            if count == 0:
+                latency = time.time() - start
+            count += 1
+    return count, latency if count else None
+
+
+def _faculty_corpus(paths, options):
+    with open(paths['faculty'], 'rU') as fp:
+        return len(parse_faculty_corpus(fp)), None
+
+
+def _faculty_parallel(paths, options):
+    corpus = parse_faculty_records_parallel(paths['faculty'],
+                                            workers=options.workers,
+                                            as_corpus=True)
+    return len(corpus), None
+
+
+def _faculty_cache_cold(paths, options):
+    corpus = load_faculty_corpus(paths['faculty'], cache_dir=paths['cache'],
+                                 refresh=True)
+    return len(corpus), None
+
+
+def _faculty_cache_warm(paths, options):
+    corpus = load_faculty_corpus(paths['faculty'], cache_dir=paths['cache'])
+    return len(corpus), None
+
+
+def _institution_records(paths, options):
+    with open(paths['institutions'], 'rU') as fp:
+        return len(parse_institution_records(fp)), None
+
+
+def _institution_table(paths, options):
+    with open(paths['institutions'], 'rU') as fp:
+        return len(load_institution_table(fp)), None
+
+
+def _count_pubs(records):
+    return sum(len(pubs) for pubs in records.itervalues())
+
+
+def _pub_records(paths, options):
+    records = parse_pub_records(paths['fac_list'], paths['pub_dir'])
+    return _count_pubs(records), None
+
+
+def _pub_threads(paths, options):
+    records = parse_pub_records(paths['fac_list'], paths['pub_dir'],
+                                workers=options.workers)
+    return _count_pubs(records), None
+
+
+def _pub_lazy(paths, options):
+    start = time.time()
+    records = parse_pub_records(paths['fac_list'], paths['pub_dir'],
+                                lazy=True)
+    latency = None
+    count = 0
+    for name in records:
+        count += len(records[name])
+        if latency is None:
+            latency = time.time() - start
+    return count, latency
+
+
+def _pub_arrays(paths, options):
+    records = parse_pub_records(paths['fac_list'], paths['pub_dir'],
+                                parser=parse_pub_arrays)
+    return _count_pubs(records), None
+
+
+# (name, function); warm cache runs must follow the cold ones
+BENCHMARKS = [
+    ('parse_faculty_records', _faculty_records),
+    ('parse_faculty_corpus', _faculty_corpus),
+    ('parse_faculty_records_parallel', _faculty_parallel),
+    ('load_faculty_corpus_cold', _faculty_cache_cold),
+    ('load_faculty_corpus_warm', _faculty_cache_warm),
+    ('parse_institution_records', _institution_records),
+    ('load_institution_table', _institution_table),
+    ('parse_pub_records', _pub_records),
+    ('parse_pub_records_threads', _pub_threads),
+    ('parse_pub_records_lazy', _pub_lazy),
+    ('parse_pub_records_arrays', _pub_arrays),
+]
+
+
+def _max_rss():
+    """ Peak resident set size of this process, in bytes """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure(func, paths, options, queue):
+    """ Child process: run one benchmark and report on `queue` """
+    try:
+        baseline = _max_rss()
+        start = time.time()
+        records, latency = func(paths, options)
+        seconds = time.time() - start
+        queue.put({'records': records,
+                   'seconds': seconds,
+                   'latency': seconds if latency is None else latency,
+                   'peak_rss': _max_rss(),
+                   'rss_increase': _max_rss() - baseline})
+    except Exception as e:
+        queue.put({'error': '%s: %s' % (type(e).__name__, e)})
+
+
+def run_once(func, paths, options):
+    """ Run one benchmark in a child process and return its report """
+    queue = Queue()
+    child = Process(target=_measure, args=(func, paths, options, queue))
+    child.start()
+    report = queue.get()
+    child.join()
+    return report
+
+
+def run_benchmark(name, func, paths, options):
+    """ Best-of-`options.repeat` timing (and worst memory) of one
+        benchmark, as a JSON-ready dict.
+    """
+    reports = [run_once(func, paths, options) for _ in xrange(options.repeat)]
+    errors = [r['error'] for r in reports if 'error' in r]
+    if errors:
+        return {'benchmark': name, 'error': errors[0]}
+    seconds = min(r['seconds'] for r in reports)
+    records = reports[0]['records']
+    return {'benchmark': name,
+            'records': records,
+            'seconds': seconds,
+            'records_per_sec': records / seconds if seconds > 0 else None,
+            'latency_seconds': min(r['latency'] for r in reports),
+            'peak_rss_mb': max(r['peak_rss'] for r in reports) / 2.**20,
+            'rss_increase_mb': max(r['rss_increase'] for r in reports) / 2.**20}
+
+
+def benchmark_parsers(options):
+    """ Generate data sets and run every selected benchmark on them.
+        Returns the results document (a dict).
+    """
+    data_dir = options.data_dir or tempfile.mkdtemp(prefix='bench_parsers')
+    results = []
+    try:
+        for num_people in options.people:
+            directory = os.path.join(data_dir, 'people_%d' % num_people)
+            start = time.time()
+            paths = write_dataset(directory, num_people,
+                                  pubs_per_person=options.pubs_per_person,
+                                  pub_people=min(num_people,
+                                                 options.pub_people),
+                                  seed=options.seed)
+            paths['cache'] = os.path.join(directory, 'cache')
+            print '%d people: data written in %.1f s' % (num_people,
+                                                         time.time() - start)
+
+            for name, func in BENCHMARKS:
+                if options.only and options.only not in name:
+                    continue
+                r = run_benchmark(name, func, paths, options)
+                r['people'] = num_people
+                results.append(r)
+                if 'error' in r:
+                    print '  %-32s FAILED (%s)' % (name, r['error'])
+                else:
+                    print '  %-32s %12.0f rec/s %9.4f s latency %8.1f MB' % \
+                          (name, r['records_per_sec'] or 0,
+                           r['latency_seconds'], r['peak_rss_mb'])
+    finally:
+        if not options.data_dir:
+            shutil.rmtree(data_dir)
+
+    return {'version': RESULTS_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'machine': {'platform': platform.platform(),
+                        'python': platform.python_version(),
+                        'numpy': np.__version__,
+                        'cpus': cpu_count()},
+            'settings': {'repeat': options.repeat,
+                         'workers': options.workers,
+                         'pubs_per_person': options.pubs_per_person,
+                         'pub_people': options.pub_people,
+                         'seed': options.seed},
+            'results': results}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """ Return (benchmark, people, old rate, new rate) for every result
+        more than `tolerance` slower than in `baseline`.
+    """
+    old = dict(((r['benchmark'], r['people']), r['records_per_sec'])
+               for r in baseline['results'] if r.get('records_per_sec'))
+    slower = []
+    for r in results['results']:
+        key = (r['benchmark'], r['people'])
+        rate = r.get('records_per_sec')
+        if key in old and rate and rate < old[key] * (1. - tolerance):
+            slower.append(key + (old[key], rate))
+    return slower
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--people', type=int, nargs='+',
+                        default=[1000, 10000, 100000],
+                        help='data set sizes (number of faculty records)')
+    parser.add_argument('--pub-people', type=int, default=2000,
+                        help='people with publication files (at most)')
+    parser.add_argument('--pubs-per-person', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help='run benchmarks whose name contains '
+                        'this string')
+    parser.add_argument('--data-dir', help='keep generated data here')
+    parser.add_argument('--output', default='benchmark_parsers.json')
+    parser.add_argument('--baseline', help='earlier results to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed fractional slowdown vs. baseline')
+    options = parser.parse_args()
+
+    results = benchmark_parsers(options)
+    with open(options.output, 'w') as fp:
+        json.dump(results, fp, indent=2, sort_keys=True)
+    print 'Results written to %s' % options.output
+
+    if options.baseline:
+        with open(options.baseline) as fp:
+            slower = compare(results, json.load(fp), options.tolerance)
+        for name, people, old_rate, rate in slower:
+            print 'REGRESSION: %s (%d people) %.0f -> %.0f rec/s' % \
+                  (name, people, old_rate, rate)
+        sys.exit(1 if slower else 0)
@@ -8,41 +8,75 @@ __email__ = "samfway@gmail.com"
 __status__ = "Development"
 
 from university_network.misc.util import add_weighted_edge
-from university_network.parse.faculty_parser import parse_faculty_records
+from university_network.parse.faculty_corpus import parse_faculty_corpus
+from university_network.parse.career_events import extract_career_events, \
+    placement_edges
+from university_network.parse.corpus_update import placement_delta
+from university_network.parse.institution_parser import \
+    parse_institution_records
+from university_network.parse.institution_index import InstitutionIndex
 import networkx as nx
 import matplotlib.pyplot as plt
 
 
-def load(faculty_fp):
+def load(faculty_fp, institutions=None, ids=False):
     """ Create weighted, directed graph where edges (A->B) are the number 
         of PhDs from school A who got their first non-postdoc job at B. 
+
+        Places are interned into `institutions` (an InstitutionIndex);
+        with ids=True the nodes are institution ids instead of names.
     """ 
     G = nx.DiGraph()
-    add_edges(G, faculty_fp)
+    add_edges(G, faculty_fp, institutions, ids)
     return G
 
 
-def add_edges(G, faculty_fp):
+def add_edges(G, faculty_fp, institutions=None, ids=False):
     """  Load a network of faculty placement where...
          +  NODES are institutions.
          +  An EDGE between institution A and B indicates that
             a PhD from A got their first non-postdoc position at B. 
          +  The weight of the edges is simply the number of individuals
             with the same career path (PhD from A, first job at B)
+
+         Only people with a valid current job are counted; this skips
+         postdocs and emeriti.
     """ 
-    for rec in parse_faculty_records(faculty_fp):
-        phd_loc, phd_year = rec.phd()
-        job_loc, job_year = rec.first_job()
-        cur_loc, cur_year = rec.current_job()
+    corpus = parse_faculty_corpus(faculty_fp, institutions)
+    add_event_edges(G, extract_career_events(corpus), ids)
+
+
+def add_event_edges(G, events, ids=False):
+    """ Add placement edges computed from CareerEvents arrays.
+        Nodes are institution names, or ids if ids=True.
+    """
+    sources, destinations, counts = placement_edges(events)
+    if not ids:
+        sources = events.institutions.decode_all(sources)
+        destinations = events.institutions.decode_all(destinations)
+    for s, d, w in zip(sources, destinations, counts):
+        add_weighted_edge(G, (s, d), weight=float(w))
+
 
-        if cur_loc is None:
-            continue  # Make sure they have a valid current job.
-                      # This skips postdocs and emeriti.
+def update_edges(G, diff, ids=False):
+    """ Patch a placement network built from an old corpus so it matches
+        the corpus returned by update_corpus() along with `diff`.
+        Edges whose weight drops to zero are removed, as are nodes left
+        without any edges.
+    """
+    institutions = diff.after.institutions
+    sources, destinations, deltas = placement_delta(diff)
+    if not ids:
+        sources = institutions.decode_all(sources)
+        destinations = institutions.decode_all(destinations)
+    touched = set()
+    for s, d, w in zip(sources, destinations, deltas):
+        add_weighted_edge(G, (s, d), weight=float(w))
+        if G[s][d]['weight'] <= 0:
+            G.remove_edge(s, d)
+            touched.update((s, d))
+    G.remove_nodes_from([v for v in touched if G.degree(v) == 0])
 
-        if phd_loc is not None and phd_loc != '.' \
-           and job_loc is not None and job_loc != '.':
-            add_weighted_edge(G, (phd_loc, job_loc))
-        
 
 if __name__ == '__main__':
     inst_fp = open('/Users/samway/Documents/Work/ClausetLab/faculty_network/data'
@@ -50,7 +84,9 @@ if __name__ == '__main__':
     facu_fp = open('/Users/samway/Documents/Work/ClausetLab/faculty_network/data/'
                    'allFaculty_BS_CS_HS-shortform_txt/allFaculty_CS_n5762_19-Apr-'
                    '2012-shortform.txt', 'rU')
-    G = load(inst_fp, facu_fp)
+    index = InstitutionIndex()
+    parse_institution_records(inst_fp, index=index)
+    G = load(facu_fp, index)
     
     grab = ['Stanford University', 'UC Berkeley', 'MIT', 'California Institute of Technology',
             'Harvard University', 'Cornell University', 'Carnegie Mellon University', 